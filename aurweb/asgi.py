@@ -13,10 +13,10 @@ from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from jinja2 import TemplateNotFound
 from prometheus_client import multiprocess
-from sqlalchemy import and_, or_
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.authentication import AuthenticationMiddleware
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 import aurweb.captcha  # noqa: F401
 import aurweb.config
@@ -24,10 +24,9 @@ import aurweb.filters  # noqa: F401
 import aurweb.logging
 import aurweb.pkgbase.util as pkgbaseutil
 import aurweb.sentry
-from aurweb import logging, prometheus, util
+from aurweb import http_client, logging, prometheus, terms, util
 from aurweb.auth import BasicAuthBackend
-from aurweb.db import get_engine, query
-from aurweb.models import AcceptedTerm, Term
+from aurweb.db import get_engine
 from aurweb.packages.util import get_pkg_or_base
 from aurweb.prometheus import instrumentator
 from aurweb.redis import redis_connection
@@ -85,6 +84,11 @@ async def app_startup():
     get_engine()
 
 
+@app.on_event("shutdown")
+async def app_shutdown():
+    await http_client.close_session()
+
+
 def child_exit(server, worker):  # pragma: no cover
     """This function is required for gunicorn customization
     of prometheus multiprocessing."""
@@ -187,23 +191,8 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> Respon
         return render_template(request, "errors/detail.html", context, exc.status_code)
 
 
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next: typing.Callable):
-    """This middleware adds the CSP, XCTO, XFO and RP security
-    headers to the HTTP response associated with request.
-
-    CSP: Content-Security-Policy
-    XCTO: X-Content-Type-Options
-    RP: Referrer-Policy
-    XFO: X-Frame-Options
-    """
-    try:
-        response = await util.error_or_result(call_next, request)
-    except Exception as exc:
-        return await internal_server_error(request, exc)
-
-    # Add CSP header.
-    request.user.nonce
+def _content_security_policy() -> str:
+    """Build the Content-Security-Policy header value."""
     csp = "default-src 'self';"
     script_hosts = ["https://cdnjs.cloudflare.com", "https://cdn.jsdelivr.net"]
     css_hosts = [
@@ -222,66 +211,116 @@ async def add_security_headers(request: Request, call_next: typing.Callable):
     csp += "style-src 'self' 'unsafe-inline' " + " ".join(css_hosts) + ";"
 
     # Fonts.
-    csp += "font-src 'self' " + ".".join(font_hosts) + ";"
+    csp += "font-src 'self' " + " ".join(font_hosts) + ";"
 
     # Images.
     csp += "img-src 'self' " + " ".join(img_hosts) + ";"
 
-    response.headers["Content-Security-Policy"] = csp
-
-    # Add XTCO header.
-    xcto = "nosniff"
-    response.headers["X-Content-Type-Options"] = xcto
-
-    # Add Referrer Policy header.
-    rp = "same-origin"
-    response.headers["Referrer-Policy"] = rp
-
-    # Add X-Frame-Options header.
-    xfo = "SAMEORIGIN"
-    response.headers["X-Frame-Options"] = xfo
-
-    return response
-
-
-@app.middleware("http")
-async def check_terms_of_service(request: Request, call_next: typing.Callable):
-    """This middleware function redirects authenticated users if they
-    have any outstanding Terms to agree to."""
-    if request.user.is_authenticated() and request.url.path != "/tos":
-        unaccepted = (
-            query(Term)
-            .join(AcceptedTerm)
-            .filter(
-                or_(
-                    AcceptedTerm.UsersID != request.user.ID,
-                    and_(
-                        AcceptedTerm.UsersID == request.user.ID,
-                        AcceptedTerm.TermsID == Term.ID,
-                        AcceptedTerm.Revision < Term.Revision,
-                    ),
-                )
-            )
-        )
-        if query(Term).count() > unaccepted.count():
-            return RedirectResponse("/tos", status_code=int(http.HTTPStatus.SEE_OTHER))
+    return csp
+
 
-    return await util.error_or_result(call_next, request)
+# Security headers added to every HTTP response, encoded once.
+#
+# CSP: Content-Security-Policy
+# XCTO: X-Content-Type-Options
+# RP: Referrer-Policy
+# XFO: X-Frame-Options
+SECURITY_HEADERS = [
+    (b"content-security-policy", _content_security_policy().encode()),
+    (b"x-content-type-options", b"nosniff"),
+    (b"referrer-policy", b"same-origin"),
+    (b"x-frame-options", b"SAMEORIGIN"),
+]
 
 
-@app.middleware("http")
-async def id_redirect_middleware(request: Request, call_next: typing.Callable):
+def id_redirect(request: Request) -> typing.Optional[Response]:
+    """Redirect requests carrying an `id` query parameter to
+    {path}/{id}, preserving the rest of the query string."""
     id = request.query_params.get("id")
+    if id is None:
+        return None
+
+    # Preserve query string.
+    qs = []
+    for k, v in request.query_params.items():
+        if k != "id":
+            qs.append(f"{k}={quote_plus(str(v))}")
+    qs = str() if not qs else "?" + "&".join(qs)
+
+    path = request.url.path.rstrip("/")
+    return RedirectResponse(f"{path}/{id}{qs}")
 
-    if id is not None:
-        # Preserve query string.
-        qs = []
-        for k, v in request.query_params.items():
-            if k != "id":
-                qs.append(f"{k}={quote_plus(str(v))}")
-        qs = str() if not qs else "?" + "&".join(qs)
 
-        path = request.url.path.rstrip("/")
-        return RedirectResponse(f"{path}/{id}{qs}")
+def terms_redirect(request: Request) -> typing.Optional[Response]:
+    """Redirect authenticated users to /tos if they have any
+    outstanding Terms to agree to."""
+    if not request.user.is_authenticated() or request.url.path == "/tos":
+        return None
+
+    if terms.needs_acceptance(request.session, request.user.ID):
+        return RedirectResponse("/tos", status_code=int(http.HTTPStatus.SEE_OTHER))
+
+    return None
+
+
+class AurwebMiddleware:
+    """
+    aurweb's HTTP middleware, implemented as a single pure ASGI app.
+
+    For every HTTP request, in order:
+    1. Redirect `?id=` requests to their path-based equivalent
+    2. Redirect users with outstanding Terms of Service to /tos
+    3. Pass the request through to the application
+
+    Every response is given the SECURITY_HEADERS, and uncaught
+    exceptions raised by the application are rendered by
+    internal_server_error.
+
+    This must be installed inside of SessionMiddleware and
+    AuthenticationMiddleware, as it relies on `request.session`
+    and `request.user`.
+    """
 
-    return await util.error_or_result(call_next, request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                message["headers"] = list(message.get("headers", [])) + SECURITY_HEADERS
+            await send(message)
+
+        request = Request(scope, receive)
+
+        response = None
+        if b"id=" in scope["query_string"]:
+            response = id_redirect(request)
+        if response is None:
+            response = terms_redirect(request)
+        if response is not None:
+            return await response(scope, receive, send_wrapper)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except RuntimeError as exc:
+            if started:
+                raise
+            logger.error(f"RuntimeError: {exc}")
+            status_code = http.HTTPStatus.INTERNAL_SERVER_ERROR
+            response = JSONResponse({"error": str(exc)}, status_code=status_code)
+            await response(scope, receive, send_wrapper)
+        except Exception as exc:
+            if started:
+                raise
+            response = await internal_server_error(request, exc)
+            await response(scope, receive, send_wrapper)
+
+
+app.add_middleware(AurwebMiddleware)
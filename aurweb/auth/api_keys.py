@@ -0,0 +1,75 @@
+"""
+API key authentication with a Redis-backed principal cache.
+
+Resolving an API key normally costs a hash, an ApiKeys query and a lazy
+User load. Successful lookups are cached in Redis by key hash, mapping to
+the owning User.ID, for at most API_KEY_TTL seconds and never past the
+key's ExpireTS. Deleting a key must call `invalidate` so that the key
+stops working on every worker immediately.
+"""
+import hashlib
+from typing import Optional
+
+from aurweb import db, time
+from aurweb.models.api_key import ApiKey
+from aurweb.models.user import User
+from aurweb.redis import redis_connection
+
+# Maximum number of seconds a resolved API key is cached for.
+API_KEY_TTL = 300
+
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def _cache_key(key_hash: str) -> str:
+    return f"apikey:{key_hash}"
+
+
+def get_user(api_key: str) -> Optional[User]:
+    """
+    Resolve a plaintext API key to its owning User.
+
+    :param api_key: Plaintext API key
+    :return: User instance, or None if the key is invalid or expired
+    """
+    key_hash = hash_api_key(api_key)
+    redis = redis_connection()
+
+    user_id = redis.get(_cache_key(key_hash))
+    if user_id is not None:
+        # Session.get() is served from the identity map when possible.
+        user = db.get_session().get(User, int(user_id))
+        if user is not None:
+            return user
+
+    record = (
+        db.query(User)
+        .join(ApiKey, ApiKey.UserID == User.ID)
+        .filter(ApiKey.KeyHash == key_hash)
+        .with_entities(User, ApiKey.ExpireTS)
+        .first()
+    )
+    if record is None:
+        return None
+
+    user, expire_ts = record
+    ttl = API_KEY_TTL
+    if expire_ts is not None:
+        ttl = min(ttl, expire_ts - time.utcnow())
+        if ttl <= 0:
+            return None
+
+    redis.set(_cache_key(key_hash), user.ID, ex=ttl)
+    return user
+
+
+def invalidate(*key_hashes: str) -> None:
+    """
+    Drop cached principals for the given API key hashes.
+
+    :param key_hashes: ApiKey.KeyHash values
+    """
+    if key_hashes:
+        redis_connection().delete(*[_cache_key(h) for h in key_hashes])
@@ -18,6 +18,7 @@ from sqlalchemy.orm import (
 
 import aurweb.config
 import aurweb.util
+from aurweb.users import ssh_keys
 
 # Some types we don't get access to in this module.
 Base = NewType("Base", "aurweb.models.declarative_base.Base")
@@ -90,6 +91,7 @@ def get_session(engine: Engine = None) -> Session:
             sessionmaker(autocommit=True, autoflush=False, bind=engine)
         )
         _sessions[dbname] = Session()
+        ssh_keys.watch(_sessions[dbname])
 
     return _sessions.get(dbname)
 
@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 
+import os
 import shlex
 import sys
 
 import aurweb.config
-from aurweb import db
-from aurweb.models.ssh_pub_key import SSHPubKey
+from aurweb.git import keyindex
 
 git_serve_cmd = "/usr/bin/aurweb-git-serve"
 ssh_opts = "restrict"
@@ -26,6 +26,33 @@ def format_command(env_vars, command, ssh_opts, ssh_key):
     return msg
 
 
+def lookup_db(pubkey):
+    # The ORM is only imported when the key index can't be used, as
+    # importing it takes most of this command's run time.
+    from aurweb import db
+    from aurweb.models.ssh_pub_key import SSHPubKey
+    from aurweb.models.user import User
+
+    # Look up the key's user along with the key.
+    with db.begin():
+        user = (
+            db.query(SSHPubKey)
+            .join(User)
+            .with_entities(
+                User.Username, User.Suspended, User.Passwd, User.AccountTypeID
+            )
+            .filter(SSHPubKey.PubKey == pubkey)
+            .first()
+        )
+
+    # If we couldn't find the SSH key for the current user, or the user is
+    # suspended or doesn't have a password set.
+    if user is None or user.Suspended or user.Passwd == "":
+        return None
+
+    return (user.Username, user.AccountTypeID > 1)
+
+
 def main():
     keytype = sys.argv[1]
     keytext = sys.argv[2]
@@ -34,22 +61,20 @@ def main():
 
     pubkey = keytype + " " + keytext
 
-    with db.begin():
-        ssh_key = db.query(SSHPubKey).filter(SSHPubKey.PubKey == pubkey).first()
-
-    # If we couldn't find the SSH key for the current user.
-    if ssh_key is None:
-        exit(1)
-
-    # If the user is suspended or doesn't have a password set.
-    user = ssh_key.User
+    # Answer from the key index when it's enabled and has been built.
+    index = keyindex.path()
+    if index is not None and os.path.exists(index):
+        user = keyindex.lookup(index, keytype, keytext)
+    else:
+        user = lookup_db(pubkey)
 
-    if user.Suspended or user.Passwd == "":
+    if user is None:
         exit(1)
 
+    username, privileged = user
     env_vars = {
-        "AUR_USER": user.Username,
-        "AUR_PRIVILEGED": "1" if user.AccountTypeID > 1 else "0",
+        "AUR_USER": username,
+        "AUR_PRIVILEGED": "1" if privileged else "0",
     }
 
     print(format_command(env_vars, git_serve_cmd, ssh_opts, pubkey))
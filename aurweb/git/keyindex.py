@@ -0,0 +1,83 @@
+"""
+Index of the SSH public keys allowed to use the git interface.
+
+sshd runs aurweb-git-auth on every connection attempt, so looking keys
+up should be cheap. When [auth] keys-index is set, aurweb keeps a text
+file there with one line per usable key, and aurweb-git-auth answers
+from it without importing the ORM or connecting to the database.
+
+Each line holds, separated by tabs, the key's SHA256 fingerprint (as
+stored in SSHPubKeys.Fingerprint), its type, the username it belongs
+to and whether that user is privileged. Keys of suspended users and of
+users without a password are left out.
+
+This module is imported by aurweb-git-auth, so it must only depend on
+the standard library and aurweb.config. The index is rebuilt by
+aurweb.users.ssh_keys.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+from typing import Iterable, Optional, Tuple
+
+import aurweb.config
+
+
+def path() -> Optional[str]:
+    """Return the path of the index, or None if it is disabled."""
+    return aurweb.config.get_with_fallback("auth", "keys-index", None) or None
+
+
+def fingerprint(keytext: str) -> Optional[str]:
+    """Return the SHA256 fingerprint of a base64 encoded public key, in
+    the format of `ssh-keygen -l` without its 'SHA256:' prefix."""
+    try:
+        blob = base64.b64decode(keytext, validate=True)
+    except binascii.Error:
+        return None
+    return base64.b64encode(hashlib.sha256(blob).digest()).decode().rstrip("=")
+
+
+def lookup(index: str, keytype: str, keytext: str) -> Optional[Tuple[str, bool]]:
+    """Look up a public key in the index at `index`.
+
+    :return: (username, privileged) of the key's user, or None if the
+             key may not be used
+    """
+    fp = fingerprint(keytext)
+    if fp is None:
+        return None
+
+    prefix = f"{fp}\t"
+    with open(index) as f:
+        for line in f:
+            if line.startswith(prefix):
+                _, entry_type, username, privileged = line.rstrip("\n").split("\t")
+                if entry_type != keytype:
+                    return None
+                return (username, privileged == "1")
+
+    return None
+
+
+def write(index: str, entries: Iterable[Tuple[str, str, str, bool]]) -> None:
+    """Atomically replace the index at `index`.
+
+    :param entries: (keytype, keytext, username, privileged) of each
+                    usable key
+    """
+    directory = os.path.dirname(index) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".keys-index.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            for keytype, keytext, username, privileged in entries:
+                fp = fingerprint(keytext)
+                if fp is not None:
+                    f.write(f"{fp}\t{keytype}\t{username}\t{int(privileged)}\n")
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, index)
+    except BaseException:
+        os.unlink(tmp)
+        raise
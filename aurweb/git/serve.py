@@ -9,13 +9,16 @@ import time
 
 import sentry_sdk
 from sentry_sdk import push_scope
+from sqlalchemy import and_, exists, or_, select, update
 
 import aurweb.config
 import aurweb.exceptions
 import aurweb.sentry
-from aurweb import db
+from aurweb import db, pulls
+from aurweb.models.ban import Ban
 from aurweb.models.package_base import PackageBase
 from aurweb.models.package_comaintainer import PackageComaintainer
+from aurweb.models.user import User
 
 git_shell_cmd = "/usr/bin/git-shell"
 git_update_cmd = "/usr/bin/aurweb-git-update"
@@ -26,25 +29,49 @@ maintenance_exc = aurweb.config.get_with_fallback(
 ).split()
 
 
-def log_ssh_login(user, remote_addr):
-    conn = aurweb.db.Connection()
-
-    now = int(time.time())
-    conn.execute(
-        "UPDATE Users SET LastSSHLogin = ?, "
-        + "LastSSHLoginIPAddress = ? WHERE Username = ?",
-        [now, remote_addr, user],
+def lookup_access(remote_addr, user, pkgbase_name=None):
+    """Look up everything serve() needs from the database at once.
+
+    :param remote_addr: Client IP address
+    :param user: Name of the user running the command
+    :param pkgbase_name: Name of the package base the command operates
+                         on, if any
+    :return: Row of (banned, pkgbase_id, can_write): whether
+             `remote_addr` is banned, the ID of the package base (None
+             if it doesn't exist) and whether `user` maintains or
+             co-maintains it
+    """
+    user_id = select(User.ID).where(User.Username == user).scalar_subquery()
+    pkgbase_id = (
+        select(PackageBase.ID).where(PackageBase.Name == pkgbase_name).scalar_subquery()
     )
 
-    conn.commit()
-    conn.close()
+    can_write = or_(
+        exists().where(
+            and_(PackageBase.Name == pkgbase_name, PackageBase.MaintainerUID == user_id)
+        ),
+        exists().where(
+            and_(
+                PackageComaintainer.PackageBaseID == pkgbase_id,
+                PackageComaintainer.UsersID == user_id,
+            )
+        ),
+    )
 
+    statement = select(
+        exists().where(Ban.IPAddress == remote_addr).label("banned"),
+        pkgbase_id.label("pkgbase_id"),
+        can_write.label("can_write"),
+    )
+    return db.get_session().execute(statement).one()
 
-def bans_match(remote_addr):
-    conn = aurweb.db.Connection()
 
-    cur = conn.execute("SELECT COUNT(*) FROM Bans WHERE IPAddress = ?", [remote_addr])
-    return cur.fetchone()[0] > 0
+def log_ssh_login(user, remote_addr):
+    db.get_session().execute(
+        update(User)
+        .where(User.Username == user)
+        .values(LastSSHLogin=int(time.time()), LastSSHLoginIPAddress=remote_addr)
+    )
 
 
 def die(msg):
@@ -80,20 +107,15 @@ def serve(action, cmdargv, username, privileged, remote_addr):  # noqa: C901
         if remote_addr not in maintenance_exc:
             raise aurweb.exceptions.MaintenanceException
 
-    if bans_match(remote_addr):
-        raise aurweb.exceptions.BannedException
-
-    log_ssh_login(username, remote_addr)
-
     # Convert Git pack commands into a single argument.
     if action == "git" and cmdargv[1] in ("upload-pack", "receive-pack"):
         action = action + "-" + cmdargv[1]
         del cmdargv[1]
 
-    # Handle Git pack commands.
-    if action == "git-upload-pack" or action == "git-receive-pack":
-        checkarg(cmdargv, "path")
+    pack_command = action in ("git-upload-pack", "git-receive-pack")
+    pkgbase_name = None
 
+    if pack_command and len(cmdargv) == 2:
         # Parse Git path.
         path = cmdargv[1].rstrip("/")
 
@@ -106,33 +128,27 @@ def serve(action, cmdargv, username, privileged, remote_addr):  # noqa: C901
         # Current Package Base details.
         pkgbase_name = path[1:-4]
 
+    # Check for bans, log the login and look up the package base in a
+    # single transaction on one connection.
+    with db.begin():
+        access = lookup_access(remote_addr, username, pkgbase_name)
+        if access.banned:
+            raise aurweb.exceptions.BannedException
+
+        log_ssh_login(username, remote_addr)
+
+    # Handle Git pack commands.
+    if pack_command:
+        checkarg(cmdargv, "path")
+
         # Check if specified repository matches the repo regex.
         if not re.match(aurweb.config.git_repo_regex, pkgbase_name):
             raise aurweb.exceptions.InvalidRepositoryNameException(pkgbase_name)
 
-        # Database entry for the pkgbase.
-        with db.begin():
-            pkgbase = (
-                db.query(PackageBase).filter(PackageBase.Name == pkgbase_name).first()
-            )
-
         # Check if we have write access to the current package (when said
         # package already exists).
-        if action == "git-receive-pack" and pkgbase is not None:
-
-            # Get the list of comaintainers for the current package.
-            with db.begin():
-                comaintainers = (
-                    db.query(PackageComaintainer)
-                    .filter(PackageComaintainer.PackageBaseID == pkgbase.ID)
-                    .all()
-                )
-                comaintainer_names = [
-                    comaintainer.User.Username for comaintainer in comaintainers
-                ]
-                write_users = comaintainer_names + [pkgbase.Maintainer.Username]
-
-            if not privileged and username not in write_users:
+        if action == "git-receive-pack" and access.pkgbase_id is not None:
+            if not privileged and not access.can_write:
                 raise aurweb.exceptions.PermissionDeniedException(username)
 
         if not os.access(git_update_cmd, os.R_OK | os.X_OK):
@@ -153,9 +169,8 @@ def serve(action, cmdargv, username, privileged, remote_addr):  # noqa: C901
 
         # If we're cloning and the pkgbase exists, update the clone counter for
         # the pkgbase.
-        if action == "git-upload-pack" and pkgbase is not None:
-            with db.begin():
-                pkgbase.NumGitPulls += 1
+        if action == "git-upload-pack" and access.pkgbase_id is not None:
+            pulls.increment(access.pkgbase_id)
 
         # Run the requested command.
         subprocess.run([git_shell_cmd, "-c", f"{action} '{git_repo_path}'"])
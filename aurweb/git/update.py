@@ -5,15 +5,26 @@ import re
 import subprocess
 import sys
 import time
+from collections import Counter
 
 import pygit2
 from makedeb_srcinfo import ParsingError, SrcinfoParser
 from sentry_sdk import push_scope
+from sqlalchemy import delete, insert, select, update
 
 import aurweb.config
-from aurweb import db
+from aurweb import db, homepage, schema
 from aurweb.git.serve import die_unknown_error, set_sentry_context
-from aurweb.models.dependency_type import DependencyType
+from aurweb.models.dependency_type import (
+    CHECKDEPENDS,
+    CHECKDEPENDS_ID,
+    DEPENDS,
+    DEPENDS_ID,
+    MAKEDEPENDS,
+    MAKEDEPENDS_ID,
+    OPTDEPENDS,
+    OPTDEPENDS_ID,
+)
 from aurweb.models.license import License
 from aurweb.models.package import Package
 from aurweb.models.package_base import PackageBase
@@ -23,13 +34,32 @@ from aurweb.models.package_license import PackageLicense
 from aurweb.models.package_notification import PackageNotification
 from aurweb.models.package_relation import PackageRelation
 from aurweb.models.package_source import PackageSource
-from aurweb.models.relation_type import RelationType
+from aurweb.models.relation_type import (
+    CONFLICTS,
+    CONFLICTS_ID,
+    PROVIDES,
+    PROVIDES_ID,
+    REPLACES,
+    REPLACES_ID,
+)
 from aurweb.models.user import User
-
-notify_cmd = "/usr/bin/aurweb-notify"
+from aurweb.pkgbase import git as pkgbasegit
+from aurweb.scripts.notify import UpdateNotification
 
 max_blob_size = aurweb.config.getint("update", "max-blob-size")
 
+DEPENDENCY_TYPES = (
+    (DEPENDS, DEPENDS_ID),
+    (MAKEDEPENDS, MAKEDEPENDS_ID),
+    (CHECKDEPENDS, CHECKDEPENDS_ID),
+    (OPTDEPENDS, OPTDEPENDS_ID),
+)
+RELATION_TYPES = (
+    (CONFLICTS, CONFLICTS_ID),
+    (PROVIDES, PROVIDES_ID),
+    (REPLACES, REPLACES_ID),
+)
+
 
 def get_version(pkgver, pkgrel, epoch):
     if epoch is not None:
@@ -76,9 +106,149 @@ def create_pkgbase(pkgbase_name, user):
     return pkgbase
 
 
-def save_metadata(srcinfo, user):  # noqa: C901
+def parse_metadata(srcinfo):
+    """
+    Collect the metadata rows shared by every pkgname in `srcinfo`.
+
+    :return: (sources, dependencies, relations, licenses), where the first
+             three are lists of column dicts lacking PackageID
+    """
+    sources = []
+    for distro, arch in srcinfo.get_extended_variable("source"):
+        source_var = srcinfo.construct_extended_variable_name(distro, "source", arch)
+
+        for source in srcinfo.get_variable(source_var):
+            sources.append({"Source": source, "SourceArch": arch, "SourceDist": distro})
+
+    dependencies = []
+    for deptype, dep_id in DEPENDENCY_TYPES:
+        for distro, arch in srcinfo.get_extended_variable(deptype):
+            dep_var = srcinfo.construct_extended_variable_name(distro, deptype, arch)
+
+            for dep in srcinfo.get_variable(dep_var):
+                depname, depdesc = srcinfo.split_dep_description(dep)
+                depname, depcond, depver = srcinfo.split_dep_condition(depname)
+
+                if depcond is not None and depver is not None:
+                    depcondition = depcond + depver
+                else:
+                    depcondition = None
+
+                dependencies.append(
+                    {
+                        "DepTypeID": dep_id,
+                        "DepName": depname,
+                        "DepDesc": depdesc,
+                        "DepCondition": depcondition,
+                        "DepArch": arch,
+                        "DepDist": distro,
+                    }
+                )
+
+    relations = []
+    for reltype, rel_id in RELATION_TYPES:
+        for distro, arch in srcinfo.get_extended_variable(reltype):
+            rel_var = srcinfo.construct_extended_variable_name(distro, reltype, arch)
+
+            for rel in srcinfo.get_variable(rel_var):
+                relname, reldesc = srcinfo.split_dep_description(rel)
+                relname, relcond, relver = srcinfo.split_dep_condition(relname)
+
+                if relcond is not None and relver is not None:
+                    relcondition = relcond + relver
+                else:
+                    relcondition = None
+
+                relations.append(
+                    {
+                        "RelTypeID": rel_id,
+                        "RelName": relname,
+                        "RelCondition": relcondition,
+                        "RelArch": arch,
+                        "RelDist": distro,
+                    }
+                )
+
+    # PackageLicenses is keyed on (PackageID, LicenseID).
+    licenses = list(dict.fromkeys(srcinfo.get_variable("license")))
+
+    return sources, dependencies, relations, licenses
+
+
+def get_license_ids(names):
+    """Return a mapping of casefolded license names to Licenses.ID,
+    creating any licenses that haven't been recorded yet.
+
+    Licenses.Name is unique regardless of case, so names differing only
+    in case share a license."""
+    if not names:
+        return {}
+
+    license_ids = {
+        name.casefold(): license_id
+        for name, license_id in db.query(License)
+        .filter(License.Name.in_(names))
+        .with_entities(License.Name, License.ID)
+    }
+    missing = {}
+    for name in names:
+        missing.setdefault(name.casefold(), name)
+    created = [
+        db.create(License, Name=name)
+        for key, name in missing.items()
+        if key not in license_ids
+    ]
+    if created:
+        db.get_session().flush()
+        license_ids.update({record.Name.casefold(): record.ID for record in created})
+    return license_ids
+
+
+def sync_rows(table, rows, package_ids):
+    """
+    Make the rows of metadata `table` belonging to `package_ids` equal
+    to `rows`, only writing the rows of packages whose rows differ.
+
+    Rows are compared on every column. A package's rows are left alone
+    when they are all wanted; otherwise they are all deleted and the
+    wanted ones inserted, since deleting single rows by value would
+    also delete rows that only differ from them in case or trailing
+    spaces under the tables' case-insensitive collation.
+
+    :param table: PackageSources, PackageDepends, PackageRelations or
+                  PackageLicenses
+    :param rows: Wanted rows as column dicts, including PackageID
+    :param package_ids: IDs of the packages whose rows are synced
+    """
+    columns = [column.name for column in table.columns]
+    package_id = columns.index("PackageID")
+    session = db.get_session()
+
+    current = Counter(
+        tuple(record)
+        for record in session.execute(
+            select(*table.columns).where(table.c.PackageID.in_(package_ids))
+        )
+    )
+    wanted = Counter(tuple(row.get(name) for name in columns) for row in rows)
+
+    stale = {key[package_id] for key in current if current[key] > wanted[key]}
+    if stale:
+        session.execute(table.delete().where(table.c.PackageID.in_(stale)))
+
+    # Rows of packages with stale rows are all inserted again; other
+    # packages only get the copies they are missing.
+    inserts = [
+        dict(zip(columns, key))
+        for key, count in wanted.items()
+        for _ in range(count if key[package_id] in stale else count - current[key])
+    ]
+    if inserts:
+        session.execute(table.insert(), inserts)
+
+
+def save_metadata(srcinfo, user):
     pkgbase = srcinfo.get_variable("pkgbase")[0]
-    pkgname = srcinfo.get_variable("pkgname")
     pkgver = srcinfo.get_variable("pkgver")[0]
     pkgrel = srcinfo.get_variable("pkgrel")[0]
     epoch = srcinfo.get_variable("epoch")
@@ -96,13 +266,20 @@ def save_metadata(srcinfo, user):  # noqa: C901
     else:
         url = None
 
-    # Set up the DB for this package.
+    version = get_version(pkgver, pkgrel, epoch)
+    sources, dependencies, relations, licenses = parse_metadata(srcinfo)
+
+    session = db.get_session()
+
+    # Everything below is written in a single transaction, so a push either
+    # updates all of its metadata or none of it. Only rows that differ from
+    # the stored metadata are written.
     with db.begin():
         db_pkgbase = db.query(PackageBase).filter(PackageBase.Name == pkgbase).first()
 
         was_orphan = db_pkgbase.MaintainerUID is None
 
-        # Update package base details and delete current packages.
+        # Update package base details.
         now = int(time.time())
 
         db_pkgbase.ModifiedTS = now
@@ -115,160 +292,218 @@ def save_metadata(srcinfo, user):  # noqa: C901
         if was_orphan:
             db_pkgbase.MaintainerUID = user.ID
 
-        # Delete all current metadata associated with each pkgname belonging to
-        # this pkgbase.
-        for pkgname in db_pkgbase.packages:
+        # Bring the pkgbase's packages in line with the pkgnames in .SRCINFO.
+        # Packages that are kept retain their IDs.
+        packages = {
+            record.Name: record
+            for record in db.query(Package)
+            .filter(Package.PackageBaseID == db_pkgbase.ID)
+            .with_entities(
+                Package.ID,
+                Package.Name,
+                Package.Version,
+                Package.Description,
+                Package.URL,
+            )
+        }
+        pkgnames = srcinfo.get_variable("pkgname")
+
+        removed_ids = [
+            record.ID for name, record in packages.items() if name not in pkgnames
+        ]
+        if removed_ids:
             for table in (
                 PackageSource,
                 PackageDependency,
                 PackageRelation,
                 PackageLicense,
             ):
-                matches = db.query(table).filter(table.PackageID == pkgname.ID).all()
+                session.execute(delete(table).where(table.PackageID.in_(removed_ids)))
+            session.execute(delete(Package).where(Package.ID.in_(removed_ids)))
+
+        changed_ids = [
+            record.ID
+            for name, record in packages.items()
+            if name in pkgnames
+            and (record.Version, record.Description, record.URL)
+            != (version, pkgdesc, url)
+        ]
+        if changed_ids:
+            session.execute(
+                update(Package)
+                .where(Package.ID.in_(changed_ids))
+                .values(Version=version, Description=pkgdesc, URL=url)
+            )
 
-                for match in matches:
-                    db.delete(match)
+        package_ids = {
+            name: record.ID for name, record in packages.items() if name in pkgnames
+        }
+        for pkgname in pkgnames:
+            if pkgname not in package_ids:
+                result = session.execute(
+                    insert(Package).values(
+                        PackageBaseID=db_pkgbase.ID,
+                        Name=pkgname,
+                        Version=version,
+                        Description=pkgdesc,
+                        URL=url,
+                    )
+                )
+                package_ids[pkgname] = result.inserted_primary_key[0]
+
+        # Every pkgname shares the same metadata.
+        license_ids = get_license_ids(licenses)
+        license_rows = [
+            {"LicenseID": license_id}
+            for license_id in dict.fromkeys(
+                license_ids[name.casefold()] for name in licenses
+            )
+        ]
+
+        for table, rows in (
+            (schema.PackageSources, sources),
+            (schema.PackageDepends, dependencies),
+            (schema.PackageRelations, relations),
+            (schema.PackageLicenses, license_rows),
+        ):
+            sync_rows(
+                table,
+                [
+                    dict(row, PackageID=package_id)
+                    for package_id in package_ids.values()
+                    for row in rows
+                ],
+                list(package_ids.values()),
+            )
 
-        # Delete all pkgnames associated with the pkgbase.
-        for pkgname in db_pkgbase.packages:
-            db.delete(pkgname)
+        # Add user to notification list on adoption (if they aren't already).
+        if was_orphan:
+            is_notified = db.query(
+                db.query(PackageNotification)
+                .filter(PackageNotification.PackageBaseID == db_pkgbase.ID)
+                .filter(PackageNotification.UserID == user.ID)
+                .exists()
+            ).scalar()
 
-    # Create each specified pkgname.
-    version = get_version(pkgver, pkgrel, epoch)
+            if not is_notified:
+                db.create(
+                    PackageNotification, PackageBaseID=db_pkgbase.ID, UserID=user.ID
+                )
 
-    for pkg in srcinfo.get_variable("pkgname"):
-        with db.begin():
-            db_pkgname = db.create(
-                Package,
-                PackageBaseID=db_pkgbase.ID,
-                Name=pkg,
-                Version=version,
-                Description=pkgdesc,
-                URL=url,
-            )
 
-        # Add package sources.
-        with db.begin():
-            for distro, arch in srcinfo.get_extended_variable("source"):
-                source_var = srcinfo.construct_extended_variable_name(
-                    distro, "source", arch
-                )
+def update_notify(user, pkgbase):
+    UpdateNotification(user.ID, pkgbase.ID).enqueue()
+
+
+def count_commits(repo, target):
+    """Return the number of commits reachable from `target` in `repo`."""
+    return sum(1 for commit in repo.walk(target))
+
+
+def read_object_headers(repo, oids):
+    """
+    Return the type and size of each object in `oids`, reading only the
+    object headers rather than inflating the objects.
+
+    pygit2 doesn't expose git_odb_read_header(), so this is done with a
+    single `git cat-file --batch-check` call.
+
+    :param repo: pygit2.Repository
+    :param oids: Iterable of hex object IDs
+    :return: Dict mapping hex object IDs to (type, size)
+    """
+    oids = list(oids)
+    if not oids:
+        return {}
+
+    proc = subprocess.run(
+        ["git", "cat-file", "--batch-check"],
+        input="".join(f"{oid}\n" for oid in oids),
+        cwd=repo.path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Objects that aren't in the repository, such as submodule commits,
+    # are reported as "<oid> missing" and left out.
+    headers = {}
+    for line in proc.stdout.splitlines():
+        fields = line.split()
+        if len(fields) == 3:
+            headers[fields[0]] = (fields[1], int(fields[2]))
+    return headers
+
+
+def lint_srcinfo(metadata_raw):
+    """
+    Parse and lint a .SRCINFO file.
+
+    Checks that depend on the rest of the commit's tree aren't made here;
+    instead, the files the .SRCINFO refers to are returned so the caller
+    can check them against each commit.
+
+    :param metadata_raw: .SRCINFO contents
+    :return: (srcinfo, error, required_files), where error is None for a
+             valid .SRCINFO and required_files is a list of
+             (variable name, value, path) tuples
+    """
+    try:
+        srcinfo = SrcinfoParser(metadata_raw)
+    except ParsingError as exc:
+        return None, str(exc), []
 
-                for source in srcinfo.get_variable(source_var):
-                    db.create(
-                        PackageSource,
-                        PackageID=db_pkgname.ID,
-                        Source=source,
-                        SourceArch=arch,
-                        SourceDist=distro,
-                    )
+    pkgbase = srcinfo.get_variable("pkgbase")[0]
+    pkgname = srcinfo.get_variable("pkgname")
+    epoch = srcinfo.get_variable("epoch")
 
-        # Add package dependencies.
-        with db.begin():
-            for deptype in ("depends", "makedepends", "checkdepends", "optdepends"):
-                dep_id = (
-                    db.query(DependencyType)
-                    .filter(DependencyType.Name == deptype)
-                    .first()
-                    .ID
-                )
+    if len(epoch) == 1:
+        epoch = epoch[0]
+    else:
+        epoch = None
 
-                for distro, arch in srcinfo.get_extended_variable(deptype):
-                    dep_var = srcinfo.construct_extended_variable_name(
-                        distro, deptype, arch
-                    )
+    # pkgbase.
+    if not re.match(aurweb.config.git_repo_regex, pkgbase):
+        return srcinfo, "Invalid .SRCINFO, invalid pkgbase: {:s}".format(pkgbase), []
 
-                    for dep in srcinfo.get_variable(dep_var):
-                        depname, depdesc = srcinfo.split_dep_description(dep)
-                        depname, depcond, depver = srcinfo.split_dep_condition(depname)
-
-                        if depcond is not None and depver is not None:
-                            depcondition = depcond + depver
-                        else:
-                            depcondition = None
-
-                        db.create(
-                            PackageDependency,
-                            PackageID=db_pkgname.ID,
-                            DepTypeID=dep_id,
-                            DepName=depname,
-                            DepDesc=depdesc,
-                            DepCondition=depcondition,
-                            DepArch=arch,
-                            DepDist=distro,
-                        )
-
-        # Add package relations (conflicts, provides, replaces).
-        with db.begin():
-            for reltype in ("conflicts", "provides", "replaces"):
-                rel_id = (
-                    db.query(RelationType)
-                    .filter(RelationType.Name == reltype)
-                    .first()
-                    .ID
-                )
+    # pkgname.
+    for pkg in pkgname:
+        if not re.match(r"[a-z0-9][a-z0-9\.+_-]*$", pkg):
+            return srcinfo, f"Invalid pkgname {pkg}.", []
 
-                for distro, arch in srcinfo.get_extended_variable(reltype):
-                    rel_var = srcinfo.construct_extended_variable_name(
-                        distro, reltype, arch
-                    )
+    # epoch.
+    if epoch is not None and not epoch.isdigit():
+        return srcinfo, "invalid epoch: {:s}".format(epoch), []
 
-                    for rel in srcinfo.get_variable(rel_var):
-                        relname, reldesc = srcinfo.split_dep_description(rel)
-                        relname, relcond, relver = srcinfo.split_dep_condition(relname)
-
-                        if relcond is not None and relver is not None:
-                            relcondition = relcond + relver
-                        else:
-                            relcondition = None
-
-                        db.create(
-                            PackageRelation,
-                            PackageID=db_pkgname.ID,
-                            RelTypeID=rel_id,
-                            RelName=relname,
-                            RelCondition=relcondition,
-                            RelArch=arch,
-                            RelDist=distro,
-                        )
-
-        # Add package licenses.
-        for license_name in srcinfo.get_variable("license"):
-            db_license = db.query(License).filter(License.Name == license_name).first()
-
-            # If the current license name hasn't been recorded in the
-            # Licenses table yet.
-            if not db_license:
-                with db.begin():
-                    db_license = db.create(License, Name=license_name)
-
-            # Create the package license rows.
-            with db.begin():
-                db.create(
-                    PackageLicense, PackageID=db_pkgname.ID, LicenseID=db_license.ID
-                )
+    required_files = []
 
-    # Add user to notification list on adoption (if they aren't already).
-    if was_orphan:
-        with db.begin():
-            current_notification_length = len(
-                db.query(PackageNotification)
-                .filter(PackageNotification.PackageBaseID == db_pkgbase.ID)
-                .filter(PackageNotification.UserID == user.id)
-                .all()
+    # Check for the presence of maintainer scripts.
+    maintainer_scripts = ("preinst", "postinst", "prerm", "postrm")
+
+    for script_type in maintainer_scripts:
+        scripts = srcinfo.get_extended_variable(script_type)
+
+        for distro, arch in scripts:
+            script_name = srcinfo.construct_extended_variable_name(
+                distro, script_type, arch
             )
+            script = srcinfo.get_variable(script_name)[0]
+            required_files.append((script_name, script, os.path.normpath(script)))
 
-            is_notified = current_notification_length == 1
+    # Check sources.
+    source_vars = srcinfo.get_extended_variable("source")
 
-            if not is_notified:
-                db.create(
-                    PackageNotification, PackageBaseID=db_pkgbase.ID, UserID=user.ID
-                )
+    for distro, arch in source_vars:
+        source_name = srcinfo.construct_extended_variable_name(distro, "source", arch)
 
+        for source in srcinfo.get_variable(source_name):
+            if len(source) > 8000:
+                return srcinfo, f"Source entry for {source_name} is too long.", []
 
-def update_notify(user, pkgbase):
-    # Execute the notification script.
-    subprocess.Popen((notify_cmd, "update", str(user.ID), str(pkgbase.ID)))
+            if "://" not in source and "lp:" not in source:
+                required_files.append((source_name, source, source))
+
+    return srcinfo, None, required_files
 
 
 def die(msg):
@@ -314,35 +549,48 @@ def _main():  # noqa: C901
         die("pushing to a branch other than master is restricted")
 
     # Detect and deny non-fast-forwards.
-    if sha1_old != "0" * 40 and not allow_overwrite:
+    fast_forward = True
+    if sha1_old != "0" * 40:
         walker = repo.walk(sha1_old, pygit2.GIT_SORT_TOPOLOGICAL)
         walker.hide(sha1_new)
-        if next(walker, None) is not None:
+        fast_forward = next(walker, None) is None
+        if not fast_forward and not allow_overwrite:
             die("denying non-fast-forward (you should pull first)")
 
     # Prepare the walker that validates new commits.
     walker = repo.walk(sha1_new, pygit2.GIT_SORT_TOPOLOGICAL)
     if sha1_old != "0" * 40:
         walker.hide(sha1_old)
+    commits = list(walker)
+    new_commits = len(commits)
+
+    # Most blobs are shared between commits; read the header of each
+    # distinct one once.
+    headers = read_object_headers(
+        repo, {treeobj.hex for commit in commits for treeobj in commit.tree}
+    )
+    srcinfo_cache = {}
 
     # Validate all new commits.
-    for commit in walker:
+    for commit in commits:
         for fname in (".SRCINFO", "PKGBUILD"):
             if fname not in commit.tree:
                 die_commit("missing {:s}".format(fname), str(commit.id))
 
         for treeobj in commit.tree:
-            blob = repo[treeobj.id]
+            obj_type, obj_size = headers.get(treeobj.hex, (treeobj.type_str, 0))
 
-            if isinstance(blob, pygit2.Tree):
+            if obj_type == "tree":
                 die_commit(
                     "the repository must not contain subdirectories", str(commit.id)
                 )
 
-            if not isinstance(blob, pygit2.Blob):
-                die_commit("not a blob object: {:s}".format(treeobj), str(commit.id))
+            if obj_type != "blob":
+                die_commit(
+                    "not a blob object: {:s}".format(treeobj.name), str(commit.id)
+                )
 
-            if blob.size > max_blob_size:
+            if obj_size > max_blob_size:
                 die_commit(
                     "maximum blob size ({:s}) exceeded".format(
                         size_humanize(max_blob_size)
@@ -350,77 +598,30 @@ def _main():  # noqa: C901
                     str(commit.id),
                 )
 
-        # Read the SRCINFO file.
-        try:
-            metadata_raw = repo[commit.tree[".SRCINFO"].id].data.decode()
-            srcinfo = SrcinfoParser(metadata_raw)
-        except ParsingError as exc:
-            die_commit(str(exc), str(commit.id))
+        # Parse and lint the SRCINFO file, once per distinct blob.
+        srcinfo_id = commit.tree[".SRCINFO"].hex
+        if srcinfo_id not in srcinfo_cache:
+            srcinfo_cache[srcinfo_id] = lint_srcinfo(repo[srcinfo_id].data.decode())
+        srcinfo, error, required_files = srcinfo_cache[srcinfo_id]
+
+        if error is not None:
+            die_commit(error, str(commit.id))
+
+        for name, value, path in required_files:
+            if path not in commit.tree:
+                die_commit(f"Missing {name} file {value}.", str(commit.id))
 
         pkgbase = srcinfo.get_variable("pkgbase")[0]
         pkgname = srcinfo.get_variable("pkgname")
         pkgver = srcinfo.get_variable("pkgver")[0]
         pkgrel = srcinfo.get_variable("pkgrel")[0]
         epoch = srcinfo.get_variable("epoch")
-        arch = srcinfo.get_variable("arch")
 
         if len(epoch) == 1:
             epoch = epoch[0]
         else:
             epoch = None
 
-        # Now lint the SRCINFO file.
-        # pkgbase.
-        if not re.match(aurweb.config.git_repo_regex, pkgbase):
-            die_commit(
-                "Invalid .SRCINFO, invalid pkgbase: {:s}".format(pkgbase),
-                str(commit.id),
-            )
-
-        # pkgname.
-        for pkg in pkgname:
-            if not re.match(r"[a-z0-9][a-z0-9\.+_-]*$", pkg):
-                die_commit(f"Invalid pkgname {pkg}.", str(commit.id))
-
-        # epoch.
-        if epoch is not None and not epoch.isdigit():
-            die_commit("invalid epoch: {:s}".format(epoch), str(commit.id))
-
-        # Check for the presence of maintainer scripts.
-        maintainer_scripts = ("preinst", "postinst", "prerm", "postrm")
-
-        for script_type in maintainer_scripts:
-            scripts = srcinfo.get_extended_variable(script_type)
-
-            for distro, arch in scripts:
-                script_name = srcinfo.construct_extended_variable_name(
-                    distro, script_type, arch
-                )
-                script = srcinfo.get_variable(script_name)[0]
-
-                if os.path.normpath(script) not in commit.tree:
-                    die_commit(f"Missing {script_name} file {script}.", str(commit.id))
-
-        # Check sources.
-        source_vars = srcinfo.get_extended_variable("source")
-
-        for distro, arch in source_vars:
-            source_name = srcinfo.construct_extended_variable_name(
-                distro, "source", arch
-            )
-
-            for source in srcinfo.get_variable(source_name):
-                if len(source) > 8000:
-                    die_commit(
-                        f"Source entry for {source_name} is too long.", str(commit.id)
-                    )
-
-                if "://" not in source and "lp:" not in source:
-                    if source not in commit.tree:
-                        die_commit(
-                            f"Missing {source_name} file {source}.", str(commit.id)
-                        )
-
     # Display a warning if .SRCINFO is unchanged.
     if sha1_old not in ("0000000000000000000000000000000000000000", sha1_new):
         srcinfo_id_old = repo[sha1_old].tree[".SRCINFO"].id
@@ -444,9 +645,13 @@ def _main():  # noqa: C901
     else:
         version_updated = True
 
-    # Read .SRCINFO from the HEAD commit.
-    metadata_raw = repo[repo[sha1_new].tree[".SRCINFO"].id].data.decode()
-    srcinfo = SrcinfoParser(metadata_raw)
+    # Read .SRCINFO from the HEAD commit, which was parsed above unless no
+    # new commits were pushed.
+    srcinfo_id = repo[sha1_new].tree[".SRCINFO"].hex
+    if srcinfo_id in srcinfo_cache:
+        srcinfo = srcinfo_cache[srcinfo_id][0]
+    else:
+        srcinfo = SrcinfoParser(repo[srcinfo_id].data.decode())
 
     pkgbase = srcinfo.get_variable("pkgbase")[0]
     pkgname = srcinfo.get_variable("pkgname")
@@ -500,6 +705,23 @@ def _main():  # noqa: C901
         if not repo.references.get(tag_name):
             repo.references.create(tag_name, sha1_new)
 
+    # Update the package base's commit count. Fast-forwards only add the
+    # commits validated above; history rewrites and restores are recounted.
+    with db.begin():
+        if sha1_old == "0" * 40:
+            db_pkgbase.NumCommits = new_commits
+        elif fast_forward and sha1_old != sha1_new:
+            db_pkgbase.NumCommits += new_commits
+        else:
+            db_pkgbase.NumCommits = count_commits(repo, sha1_new)
+
+    # The homepage lists recently updated packages.
+    homepage.invalidate_updates()
+
+    # Add this push's commits to the cached commit statistics while
+    # they are at hand, rather than on the next view of the git page.
+    pkgbasegit.update_commit_stats(db_pkgbase.Name, repo, str(sha1_new))
+
     # Send package update notifications.
     update_notify(user, db_pkgbase)
 
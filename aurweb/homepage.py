@@ -0,0 +1,113 @@
+"""
+Cached homepage package listings.
+
+The homepage lists the most recently updated and the most popular
+packages. Both are cached in Redis as the few fields the homepage
+renders, so a homepage view costs one Redis round trip per block.
+
+The updates block is invalidated when a package is pushed or deleted;
+the popular block is refreshed by aurweb-popupdate, after popularity
+has been recalculated. CACHE_TTL bounds how stale either block can get
+through any other change, such as a maintainer disowning a package.
+"""
+from typing import Callable, Dict, List
+
+import orjson
+
+from aurweb import db
+from aurweb.models import Package, PackageBase
+from aurweb.packages.search import PackageSearch
+from aurweb.redis import redis_connection
+
+UPDATES_KEY = "homepage:updates"
+POPULAR_KEY = "homepage:popular"
+
+# Maximum number of seconds a cached block is served for.
+CACHE_TTL = 3600
+
+# Number of packages listed in each block.
+LIMIT = 10
+
+
+def _as_dict(record) -> Dict[str, str]:
+    return {
+        "Name": record.Name,
+        "Version": record.Version,
+        "Description": record.Description,
+    }
+
+
+def _query_updates() -> List[Dict[str, str]]:
+    pkgbases = (
+        db.query(PackageBase.ID)
+        .filter(PackageBase.PackagerUID.isnot(None))
+        .order_by(PackageBase.ModifiedTS.desc())
+        .limit(LIMIT)
+    )
+    ids = [pkgbase_id for (pkgbase_id,) in pkgbases]
+
+    # List each package base with the version and description of its
+    # first package.
+    records = {}
+    for record in (
+        db.query(Package)
+        .join(PackageBase)
+        .with_entities(
+            Package.PackageBaseID,
+            PackageBase.Name,
+            Package.Version,
+            Package.Description,
+        )
+        .filter(Package.PackageBaseID.in_(ids))
+        .order_by(Package.ID)
+    ):
+        records.setdefault(record.PackageBaseID, record)
+
+    return [_as_dict(records[id]) for id in ids if id in records]
+
+
+def _query_popular() -> List[Dict[str, str]]:
+    search = PackageSearch()
+    search.sort_by("p")
+
+    # If for any reason a popular package isn't owned by anyone, we don't want
+    # to recommend it on the front page, as there might be a concerning reason
+    # why it was orphaned.
+    query = (
+        search.results()
+        .filter(PackageBase.MaintainerUID.isnot(None))
+        .with_entities(Package.Name, Package.Version, Package.Description)
+        .limit(LIMIT)
+    )
+    return [_as_dict(record) for record in query]
+
+
+def _store(key: str, fn: Callable) -> List[Dict[str, str]]:
+    records = fn()
+    redis_connection().set(key, orjson.dumps(records), ex=CACHE_TTL)
+    return records
+
+
+def _get(key: str, fn: Callable) -> List[Dict[str, str]]:
+    data = redis_connection().get(key)
+    if data is not None:
+        return orjson.loads(data)
+    return _store(key, fn)
+
+
+def package_updates() -> List[Dict[str, str]]:
+    """Return the most recently updated package bases."""
+    return _get(UPDATES_KEY, _query_updates)
+
+
+def popular_packages() -> List[Dict[str, str]]:
+    """Return the most popular packages that have a maintainer."""
+    return _get(POPULAR_KEY, _query_popular)
+
+
+def invalidate_updates() -> None:
+    redis_connection().delete(UPDATES_KEY)
+
+
+def refresh_popular() -> None:
+    _store(POPULAR_KEY, _query_popular)
@@ -0,0 +1,48 @@
+"""
+A long-lived aiohttp client session shared by a worker's requests.
+
+Creating a ClientSession per request sets up a new connection pool each
+time, so no upstream connection is ever reused. get_session() returns
+one session per event loop instead; it is closed on application
+shutdown by close_session().
+
+The session leaves response bodies as they were sent (no automatic
+decompression), as it is meant for proxying them on unchanged.
+"""
+import asyncio
+
+import aiohttp
+
+# Maximum number of simultaneous upstream connections.
+CONNECTION_LIMIT = 100
+
+# Upstream connection timeout in seconds. Reads are not timed out;
+# clones of large repositories can take a while.
+CONNECT_TIMEOUT = 30
+
+# Module-private session and the event loop it belongs to.
+_session = None
+_loop = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    global _session, _loop
+
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _loop is not loop:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=CONNECTION_LIMIT),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT),
+            auto_decompress=False,
+        )
+        _loop = loop
+
+    return _session
+
+
+async def close_session() -> None:
+    global _session, _loop
+
+    if _session is not None and _loop is asyncio.get_running_loop():
+        await _session.close()
+    _session = _loop = None
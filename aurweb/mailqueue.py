@@ -0,0 +1,248 @@
+"""
+Persistent queue of email notifications.
+
+Request handlers and the git update hook used to deliver notifications
+themselves, so a slow mail server held up web requests and pushes, and
+failed deliveries were only logged. Instead, notifications are now
+enqueued (see Notification.enqueue()) and aurweb-notifyd delivers them.
+
+A notification's state is captured when it is constructed, so the
+queue stores that state rather than the arguments it was constructed
+with; a DeleteNotification, for instance, can't be constructed anymore
+once its package base has been deleted. Jobs are kept in Redis:
+
+    mailqueue:jobs       hash of job payloads by job ID
+    mailqueue:queue      sorted set of job IDs by the time they are due
+    mailqueue:claimed    sorted set of job IDs being delivered, by the
+                         time they were claimed
+    mailqueue:progress   hash of the number of messages of a job that
+                         have been delivered, by job ID
+    mailqueue:attempts   hash of the number of failed attempts to
+                         deliver a job, by job ID
+
+A job's ID is the digest of its payload, so a notification that is
+enqueued again while an identical one is still pending is dropped.
+
+Recipients who opted into digests (Users.DigestNotify) get some
+notifications in a daily summary instead. Those notifications are kept
+until aurweb-digest queues the summaries, see collect_digests():
+
+    mailqueue:digest-events      hash of notification payloads by ID
+    mailqueue:digest-recipients  set of "<lang>\t<email>" of recipients
+                                 with pending notifications
+    mailqueue:digest:<lang>\t<email>
+                                 list of the IDs of a recipient's
+                                 pending notifications
+"""
+import hashlib
+import importlib
+import json
+import time
+from typing import List, Optional, Tuple
+
+from aurweb import logging
+from aurweb.redis import redis_connection
+
+logger = logging.get_logger(__name__)
+
+JOBS_KEY = "mailqueue:jobs"
+QUEUE_KEY = "mailqueue:queue"
+CLAIMED_KEY = "mailqueue:claimed"
+PROGRESS_KEY = "mailqueue:progress"
+ATTEMPTS_KEY = "mailqueue:attempts"
+DIGEST_EVENTS_KEY = "mailqueue:digest-events"
+DIGEST_RECIPIENTS_KEY = "mailqueue:digest-recipients"
+DIGEST_KEY_PREFIX = "mailqueue:digest:"
+
+# Failed deliveries are retried after BACKOFF * 2 ** (attempts - 1)
+# seconds, at most MAX_BACKOFF seconds, until MAX_ATTEMPTS attempts
+# have failed.
+BACKOFF = 30
+MAX_BACKOFF = 3600
+MAX_ATTEMPTS = 10
+
+# Claimed jobs not finished within this many seconds are assumed to
+# belong to a worker which died, and are queued again.
+CLAIM_TIMEOUT = 600
+
+
+def dumps(notification) -> str:
+    """Serialize `notification` into a job payload."""
+    cls = notification.__class__
+    return json.dumps(
+        {
+            "class": f"{cls.__module__}:{cls.__qualname__}",
+            "state": vars(notification),
+        },
+        sort_keys=True,
+    )
+
+
+def loads(payload: str):
+    """Deserialize a job payload into the notification it holds."""
+    from aurweb.scripts.notify import Notification
+
+    data = json.loads(payload)
+    module, _, name = data["class"].partition(":")
+    cls = getattr(importlib.import_module(module), name)
+    if not (isinstance(cls, type) and issubclass(cls, Notification)):
+        raise TypeError(f"{data['class']} is not a notification")
+
+    notification = cls.__new__(cls)
+    notification.__dict__.update(data["state"])
+    return notification
+
+
+def enqueue(notification) -> bool:
+    """Queue `notification` for delivery.
+
+    :return: False if an identical notification was already queued
+    """
+    payload = dumps(notification)
+    job_id = hashlib.sha256(payload.encode()).hexdigest()
+
+    redis = redis_connection()
+    if not redis.hsetnx(JOBS_KEY, job_id, payload):
+        return False
+    redis.zadd(QUEUE_KEY, {job_id: time.time()})
+    return True
+
+
+def add_to_digests(notification, recipients: List[Tuple[str, str]]) -> None:
+    """Add `notification` to the next digest of each of `recipients`.
+
+    :param recipients: (email, language) of each recipient
+    """
+    payload = dumps(notification)
+    event_id = hashlib.sha256(payload.encode()).hexdigest()
+
+    # The transaction makes the event and its recipients appear at once
+    # to collect_digests().
+    pipeline = redis_connection().pipeline()
+    pipeline.hset(DIGEST_EVENTS_KEY, event_id, payload)
+    for to, lang in recipients:
+        member = f"{lang}\t{to}"
+        pipeline.sadd(DIGEST_RECIPIENTS_KEY, member)
+        pipeline.rpush(DIGEST_KEY_PREFIX + member, event_id)
+    pipeline.execute()
+
+
+def collect_digests() -> int:
+    """Queue a digest for each recipient with pending notifications.
+
+    :return: Number of digests queued
+    """
+    from aurweb.scripts.notify import DigestNotification
+
+    redis = redis_connection()
+
+    # Notifications added before this point are in the lists of all of
+    # their recipients, which are emptied below, so they can be deleted
+    # at the end. Later ones may still be in lists left for next time.
+    events = redis.hkeys(DIGEST_EVENTS_KEY)
+
+    count = 0
+    for member in redis.smembers(DIGEST_RECIPIENTS_KEY):
+        key = DIGEST_KEY_PREFIX.encode() + member
+        pipeline = redis.pipeline()
+        pipeline.lrange(key, 0, -1)
+        pipeline.delete(key)
+        pipeline.srem(DIGEST_RECIPIENTS_KEY, member)
+        event_ids = list(dict.fromkeys(pipeline.execute()[0]))
+        if not event_ids:
+            continue
+
+        payloads = [
+            payload.decode()
+            for payload in redis.hmget(DIGEST_EVENTS_KEY, event_ids)
+            if payload is not None
+        ]
+        lang, _, to = member.decode().partition("\t")
+        enqueue(DigestNotification(to, lang, payloads))
+        count += 1
+
+    if events:
+        redis.hdel(DIGEST_EVENTS_KEY, *events)
+    return count
+
+
+def claim(limit: int) -> List[str]:
+    """Claim up to `limit` jobs which are due.
+
+    Several workers may claim jobs at once; each job is claimed by only
+    one of them.
+
+    :return: IDs of the claimed jobs
+    """
+    redis = redis_connection()
+    now = time.time()
+    claimed = []
+    for job_id in redis.zrangebyscore(QUEUE_KEY, "-inf", now, start=0, num=limit):
+        if redis.zrem(QUEUE_KEY, job_id):
+            redis.zadd(CLAIMED_KEY, {job_id: now})
+            claimed.append(job_id.decode())
+    return claimed
+
+
+def payload(job_id: str) -> Optional[str]:
+    """Return the payload of job `job_id`."""
+    value = redis_connection().hget(JOBS_KEY, job_id)
+    return value.decode() if value is not None else None
+
+
+def progress(job_id: str) -> int:
+    """Return the number of messages of job `job_id` already delivered."""
+    return int(redis_connection().hget(PROGRESS_KEY, job_id) or 0)
+
+
+def set_progress(job_id: str, delivered: int) -> None:
+    """Record that the first `delivered` messages of `job_id` were delivered."""
+    redis_connection().hset(PROGRESS_KEY, job_id, delivered)
+
+
+def complete(job_id: str) -> None:
+    """Remove job `job_id` from the queue."""
+    pipeline = redis_connection().pipeline()
+    pipeline.zrem(CLAIMED_KEY, job_id)
+    pipeline.hdel(JOBS_KEY, job_id)
+    pipeline.hdel(PROGRESS_KEY, job_id)
+    pipeline.hdel(ATTEMPTS_KEY, job_id)
+    pipeline.execute()
+
+
+def retry(job_id: str) -> bool:
+    """Schedule job `job_id` to be retried after a failed attempt.
+
+    :return: False if the job was dropped after MAX_ATTEMPTS attempts
+    """
+    redis = redis_connection()
+    attempts = redis.hincrby(ATTEMPTS_KEY, job_id, 1)
+    if attempts >= MAX_ATTEMPTS:
+        logger.error(f"Dropping notification {job_id} after {attempts} attempts.")
+        complete(job_id)
+        return False
+
+    delay = min(BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+    pipeline = redis.pipeline()
+    pipeline.zrem(CLAIMED_KEY, job_id)
+    pipeline.zadd(QUEUE_KEY, {job_id: time.time() + delay})
+    pipeline.execute()
+    return True
+
+
+def recover() -> int:
+    """Queue jobs claimed more than CLAIM_TIMEOUT seconds ago again.
+
+    :return: Number of jobs queued again
+    """
+    redis = redis_connection()
+    stale = redis.zrangebyscore(CLAIMED_KEY, "-inf", time.time() - CLAIM_TIMEOUT)
+    for job_id in stale:
+        if redis.zrem(CLAIMED_KEY, job_id):
+            redis.zadd(QUEUE_KEY, {job_id: time.time()})
+    return len(stale)
+
+
+def size() -> int:
+    """Return the number of jobs queued or being delivered."""
+    return redis_connection().hlen(JOBS_KEY)
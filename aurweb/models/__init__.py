@@ -23,6 +23,7 @@ from .relation_type import RelationType  # noqa: F401
 from .request_type import RequestType  # noqa: F401
 from .session import Session  # noqa: F401
 from .ssh_pub_key import SSHPubKey  # noqa: F401
+from .statistic import Statistic  # noqa: F401
 from .term import Term  # noqa: F401
 from .tu_vote import TUVote  # noqa: F401
 from .tu_voteinfo import TUVoteInfo  # noqa: F401
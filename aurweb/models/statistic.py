@@ -0,0 +1,8 @@
+from aurweb import schema
+from aurweb.models.declarative import Base
+
+
+class Statistic(Base):
+    __table__ = schema.Statistics
+    __tablename__ = __table__.name
+    __mapper_args__ = {"primary_key": [__table__.c.Name]}
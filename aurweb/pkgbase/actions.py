@@ -2,7 +2,7 @@ from typing import List
 
 from fastapi import Request
 
-from aurweb import db, logging, util
+from aurweb import db, homepage, logging, util
 from aurweb.auth import creds
 from aurweb.models import PackageBase
 from aurweb.models.package_comaintainer import PackageComaintainer
@@ -73,7 +73,7 @@ def pkgbase_disown_instance(request: Request, pkgbase: PackageBase) -> None:
         with db.begin():
             pkgbase.Maintainer = None
 
-    util.apply_all(notifs, lambda n: n.send())
+    util.apply_all(notifs, lambda n: n.enqueue())
 
 
 def pkgbase_adopt_instance(request: Request, pkgbase: PackageBase) -> None:
@@ -81,7 +81,7 @@ def pkgbase_adopt_instance(request: Request, pkgbase: PackageBase) -> None:
         pkgbase.Maintainer = request.user
 
     notif = notify.AdoptNotification(request.user.ID, pkgbase.ID)
-    notif.send()
+    notif.enqueue()
 
 
 def pkgbase_delete_instance(
@@ -94,6 +94,7 @@ def pkgbase_delete_instance(
     with db.begin():
         update_closure_comment(pkgbase, DELETION_ID, comments)
         db.delete(pkgbase)
+    homepage.invalidate_updates()
 
     return notifs
 
@@ -134,6 +135,7 @@ def pkgbase_merge_instance(
         for pkg in pkgbase.packages:
             db.delete(pkg)
         db.delete(pkgbase)
+    homepage.invalidate_updates()
 
     # Log this out for accountability purposes.
     logger.info(
@@ -141,5 +143,5 @@ def pkgbase_merge_instance(
         f"'{pkgbasename}' into '{target.Name}'."
     )
 
-    # Send notifications.
-    util.apply_all(notifs, lambda n: n.send())
+    # Queue notifications.
+    util.apply_all(notifs, lambda n: n.enqueue())
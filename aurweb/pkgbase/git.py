@@ -0,0 +1,203 @@
+"""
+Git repository helpers for the package base git pages.
+
+Each process keeps a bounded LRU pool of open repository handles, so
+that browsing a repository doesn't re-read its refs and pack indexes on
+every request. A handle is reopened once its master branch has moved.
+
+Commit statistics for a repository are cached in Redis, stamped with
+the HEAD they were computed for. When HEAD has moved forward since,
+only the commits between the old and the new HEAD are walked and added
+to the cached statistics; a rewritten history is walked in full.
+
+The cache holds the commit times of the last year rather than the
+week, month and year counts themselves, so counts stay accurate as
+commits age out of each period without walking the history again.
+
+A commit's diff against its parent never changes, so rendered diffs are
+cached by commit OID alone.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+import pygit2
+
+from aurweb import config, time
+from aurweb.redis import redis_connection
+
+# Maximum number of repository handles kept open per process.
+POOL_SIZE = 64
+
+# Maximum number of seconds statistics are cached for without being read.
+STATS_TTL = 7 * 86400
+
+# Periods (in days) commits are counted over.
+PERIODS = {
+    "past_week_commits": 7,
+    "past_month_commits": 31,
+    "past_year_commits": 365,
+}
+
+DAY = 86400
+
+# Maximum number of seconds a rendered diff is cached for.
+DIFF_TTL = 30 * DAY
+
+
+# Module-private pool of open repositories; see open_repository().
+_pool: "OrderedDict[str, Tuple[pygit2.Repository, Optional[pygit2.Oid]]]" = (
+    OrderedDict()
+)
+
+
+def _branch_target(repo: pygit2.Repository) -> Optional[pygit2.Oid]:
+    ref = repo.references.get("refs/heads/master")
+    return ref.target if ref is not None else None
+
+
+def open_repository(name: str) -> pygit2.Repository:
+    """Return a handle to the repository of package base `name`.
+
+    Handles are pooled; the least recently used one is dropped once
+    POOL_SIZE repositories are open.
+    """
+    path = f"{config.git_repo_path}/{name}"
+
+    entry = _pool.pop(path, None)
+    if entry is not None and _branch_target(entry[0]) != entry[1]:
+        # The branch has moved since the handle was opened.
+        entry = None
+
+    if entry is None:
+        repo = pygit2.Repository(path)
+        entry = (repo, _branch_target(repo))
+
+    _pool[path] = entry
+    while len(_pool) > POOL_SIZE:
+        _pool.popitem(last=False)
+
+    return entry[0]
+
+
+def _stats_key(name: str) -> str:
+    return f"git-stats:{name}"
+
+
+def _diff_key(oid: str) -> str:
+    return f"git-diff:{oid}"
+
+
+def _walk(
+    repo: pygit2.Repository, head: str, hide: Optional[str], stats: Dict[str, Any]
+) -> None:
+    since = time.utcnow() - max(PERIODS.values()) * DAY
+
+    walker = repo.walk(head)
+    if hide is not None:
+        walker.hide(hide)
+
+    for commit in walker:
+        stats["total"] += 1
+        committers = stats["committers"]
+        committers[commit.author.name] = committers.get(commit.author.name, 0) + 1
+        if commit.commit_time >= since:
+            stats["times"].append(commit.commit_time)
+
+    stats["head"] = head
+    stats["times"] = [t for t in stats["times"] if t >= since]
+
+
+def update_commit_stats(
+    name: str, repo: pygit2.Repository, head: str
+) -> Dict[str, Any]:
+    """Bring the cached commit statistics of `name` up to `head`.
+
+    :param name: Package base name
+    :param repo: The package base's repository
+    :param head: Hex OID of the commit to compute statistics for
+    :return: The cached record: head, total, committers and times
+    """
+    redis = redis_connection()
+    key = _stats_key(name)
+
+    data = redis.get(key)
+    stats = orjson.loads(data) if data is not None else None
+    if stats is not None and stats["head"] == head:
+        return stats
+
+    old_head = stats["head"] if stats is not None else None
+    if (
+        old_head is None
+        or old_head not in repo
+        or not repo.descendant_of(head, old_head)
+    ):
+        # No usable statistics; walk the whole history.
+        stats, old_head = {"total": 0, "committers": {}, "times": []}, None
+
+    _walk(repo, head, old_head, stats)
+    redis.set(key, orjson.dumps(stats), ex=STATS_TTL)
+    return stats
+
+
+def commit_stats(name: str, repo: pygit2.Repository, head: str) -> Dict[str, Any]:
+    """Return commit statistics of `name` at `head`.
+
+    :return: Dict holding the total number of commits, the number of
+             commits made in each of PERIODS and the number of commits
+             made by each committer, sorted by name
+    """
+    stats = update_commit_stats(name, repo, head)
+
+    now = time.utcnow()
+    output = {
+        "total": stats["total"],
+        "committers": dict(sorted(stats["committers"].items())),
+    }
+    for period, days in PERIODS.items():
+        since = now - days * DAY
+        output[period] = sum(1 for t in stats["times"] if t >= since)
+    return output
+
+
+def find_commit(
+    repo: pygit2.Repository, head: pygit2.Oid, commit_hash: str
+) -> Optional[pygit2.Commit]:
+    """Look up `commit_hash` in `repo`.
+
+    :param head: OID of the branch the commit must be reachable from
+    :param commit_hash: Full or abbreviated hex OID of the commit
+    :return: The commit, or None if it does not exist or is not
+             reachable from `head`
+    """
+    try:
+        commit = repo.get(commit_hash)
+    except ValueError:
+        # Not a hex OID, or an ambiguous prefix.
+        return None
+
+    if not isinstance(commit, pygit2.Commit):
+        return None
+
+    if commit.id != head and not repo.descendant_of(head, commit.id):
+        return None
+
+    return commit
+
+
+def commit_diff(repo: pygit2.Repository, commit: pygit2.Commit) -> str:
+    """Return the patch between `commit` and its first parent."""
+    if not commit.parent_ids:
+        # This is the first commit; there is no parent to diff against.
+        return "No diff found."
+
+    redis = redis_connection()
+    key = _diff_key(commit.id.hex)
+
+    diff = redis.get(key)
+    if diff is not None:
+        return diff.decode()
+
+    diff = repo.diff(commit.parent_ids[0], commit.id).patch or str()
+    redis.set(key, diff, ex=DIFF_TTL)
+    return diff
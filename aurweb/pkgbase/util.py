@@ -95,8 +95,8 @@ def remove_comaintainers(pkgbase: PackageBase, usernames: List[str]) -> None:
     with db.begin():
         rotate_comaintainers(pkgbase)
 
-    # Send out notifications.
-    util.apply_all(notifications, lambda n: n.send())
+    # Queue notifications.
+    util.apply_all(notifications, lambda n: n.enqueue())
 
 
 def latest_priority(pkgbase: PackageBase) -> int:
@@ -182,8 +182,8 @@ def add_comaintainers(
     # Move along: add all `users` as new `pkgbase` comaintainers.
     util.apply_all(users, add_comaint)
 
-    # Send out notifications.
-    util.apply_all(notifications, lambda n: n.send())
+    # Queue notifications.
+    util.apply_all(notifications, lambda n: n.enqueue())
 
 
 def rotate_comaintainers(pkgbase: PackageBase) -> None:
@@ -0,0 +1,75 @@
+"""
+Coalesced git pull counters.
+
+Every HTTP clone and SSH upload-pack counts a pull for its package base.
+Rather than writing each pull to the package base's row, which made the
+busiest read path a write path and popular rows lock hotspots, pulls
+are counted in a Redis hash. aurweb-pullflush periodically adds the
+pending counts to PackageBases.NumGitPulls in a single transaction.
+
+The number of pulls of a package base is its stored NumGitPulls plus
+its pending count; see count().
+"""
+from sqlalchemy import bindparam, update
+
+from aurweb import db, schema
+from aurweb.models import PackageBase
+from aurweb.redis import redis_connection
+
+# Redis hash of pending pull counts by package base ID.
+REDIS_KEY = "git-pulls"
+
+# Pending pull counts being flushed to the database.
+FLUSH_KEY = "git-pulls:flushing"
+
+
+def increment(pkgbase_id: int) -> None:
+    """Count a pull of package base `pkgbase_id`."""
+    redis_connection().hincrby(REDIS_KEY, pkgbase_id, 1)
+
+
+def pending(pkgbase_id: int) -> int:
+    """Return the number of pulls of `pkgbase_id` not yet flushed."""
+    pipeline = redis_connection().pipeline()
+    pipeline.hget(REDIS_KEY, pkgbase_id)
+    pipeline.hget(FLUSH_KEY, pkgbase_id)
+    return sum(int(value) for value in pipeline.execute() if value is not None)
+
+
+def count(pkgbase: PackageBase) -> int:
+    """Return the number of times `pkgbase` has been pulled."""
+    return pkgbase.NumGitPulls + pending(pkgbase.ID)
+
+
+def flush() -> int:
+    """Add pending pull counts to PackageBases.NumGitPulls.
+
+    Pending counts are first moved aside to FLUSH_KEY, so that pulls
+    counted meanwhile are left for the next flush. Counts left there by
+    a failed flush are flushed before any new ones.
+
+    :return: Number of package bases updated
+    """
+    redis = redis_connection()
+    if not redis.exists(FLUSH_KEY):
+        if not redis.exists(REDIS_KEY):
+            return 0
+        redis.rename(REDIS_KEY, FLUSH_KEY)
+
+    counts = [
+        {"pkgbase_id": int(pkgbase_id), "pulls": int(pulls)}
+        for pkgbase_id, pulls in redis.hgetall(FLUSH_KEY).items()
+    ]
+
+    if counts:
+        table = schema.PackageBases
+        with db.begin():
+            db.get_session().execute(
+                update(table)
+                .where(table.c.ID == bindparam("pkgbase_id"))
+                .values(NumGitPulls=table.c.NumGitPulls + bindparam("pulls")),
+                counts,
+            )
+
+    redis.delete(FLUSH_KEY)
+    return len(counts)
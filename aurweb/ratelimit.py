@@ -1,36 +1,150 @@
+import math
+import os
+from typing import List, Optional, Tuple
+
 from fastapi import Request
-from redis.client import Pipeline
+from redis import Redis
 
-from aurweb import config, db, logging, time
+from aurweb import config, db, logging, time, util
 from aurweb.models import ApiRateLimit
 from aurweb.redis import redis_connection
+from aurweb.shm import SHM_DIR, SharedTable
 
 logger = logging.get_logger(__name__)
 
+# Atomic sliding window counter, evaluated in a single Redis round trip.
+#
+# Each bucket is tracked with two keys: a window key holding
+# "{window start}:{previous window's count}" (legacy values hold only the
+# window start) and a counter of requests in the current window. The
+# previous window's count is weighted by how much of it still overlaps
+# the sliding window, which smooths out bursts at window boundaries.
+#
+# KEYS: (window key, counter key) for each bucket.
+# ARGV: now, followed by the window length of each bucket.
+# Returns the estimated number of requests in the window for each bucket.
+SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local results = {}
+for i = 1, #KEYS / 2 do
+    local window_key = KEYS[2 * i - 1]
+    local requests_key = KEYS[2 * i]
+    local window = tonumber(ARGV[i + 1])
+
+    local start, previous = nil, 0
+    local value = redis.call("GET", window_key)
+    if value then
+        local s, p = string.match(value, "^(%d+):?(%d*)$")
+        start = tonumber(s)
+        previous = tonumber(p) or 0
+    end
+    local requests = tonumber(redis.call("GET", requests_key)) or 0
+
+    if not start or now - start >= 2 * window then
+        start, previous, requests = now, 0, 0
+    elseif now - start >= window then
+        start, previous, requests = start + window, requests, 0
+    end
+    requests = requests + 1
+
+    local weight = (window - (now - start)) / window
+    results[i] = math.floor(previous * weight) + requests
+
+    local window_value = string.format("%d:%d", start, previous)
+    redis.call("SET", window_key, window_value, "EX", 2 * window)
+    redis.call("SET", requests_key, requests, "EX", 2 * window)
+end
+return results
+"""
+
+# Module-private registered Lua script; see _sliding_window().
+_script = None
+
+
+def _sliding_window(redis: Redis):
+    global _script
+    if _script is None:
+        _script = redis.register_script(SLIDING_WINDOW_LUA)
+    return _script
+
+
+# Module-private shared memory table; see _shm_table().
+_table = None
+
+
+def _shm_table() -> SharedTable:
+    """Return this host's shared memory rate limit table.
+
+    Records hold (window start, previous window's count, current window's
+    count), mirroring the keys used by SLIDING_WINDOW_LUA. The table is
+    named after the database so that instances sharing a host do not
+    share limits.
+    """
+    global _table
+    if _table is None:
+        path = os.path.join(SHM_DIR, f"aurweb-ratelimit-{db.name()}")
+        _table = SharedTable(path, "qII")
+    return _table
+
+
+def _buckets(host: str, endpoint: Optional[str]) -> List[Tuple[str, int, int]]:
+    """Return (key suffix, request limit, window length) for each rate
+    limit bucket `host` is subject to for a request to `endpoint`.
 
-def _update_ratelimit_redis(request: Request, pipeline: Pipeline):
+    The global [ratelimit] request_limit/window_length bucket always
+    applies. When `{endpoint}_request_limit` is configured, an additional
+    bucket with that limit (and `{endpoint}_window_length`, defaulting
+    to the global window length) applies to `endpoint` alone.
+    """
+    limit = config.getint("ratelimit", "request_limit")
     window_length = config.getint("ratelimit", "window_length")
-    now = time.utcnow()
-    time_to_delete = now - window_length
+    buckets = [(host, limit, window_length)]
 
-    host = request.client.host
-    window_key = f"ratelimit-ws:{host}"
-    requests_key = f"ratelimit:{host}"
+    if endpoint:
+        endpoint_limit = config.get_with_fallback(
+            "ratelimit", f"{endpoint}_request_limit", None
+        )
+        if endpoint_limit is not None:
+            endpoint_window = config.get_with_fallback(
+                "ratelimit", f"{endpoint}_window_length", window_length
+            )
+            buckets.append(
+                (f"{endpoint}:{host}", int(endpoint_limit), int(endpoint_window))
+            )
 
-    pipeline.get(window_key)
-    window = pipeline.execute()[0]
+    return buckets
 
-    if not window or int(window.decode()) < time_to_delete:
-        pipeline.set(window_key, now)
-        pipeline.expire(window_key, window_length)
 
-        pipeline.set(requests_key, 1)
-        pipeline.expire(requests_key, window_length)
+def _update_ratelimit_redis(buckets: List[Tuple[str, int, int]]) -> List[int]:
+    keys, args = [], [time.utcnow()]
+    for suffix, limit, window_length in buckets:
+        keys += [f"ratelimit-ws:{suffix}", f"ratelimit:{suffix}"]
+        args.append(window_length)
 
-        pipeline.execute()
-    else:
-        pipeline.incr(requests_key)
-        pipeline.execute()
+    redis = redis_connection()
+    return _sliding_window(redis)(keys=keys, args=args, client=redis)
+
+
+def _update_ratelimit_shm(buckets: List[Tuple[str, int, int]]) -> List[int]:
+    now = time.utcnow()
+    table = _shm_table()
+
+    results = []
+    for suffix, _, window_length in buckets:
+
+        def slide(record: Optional[Tuple[int, int, int]]):
+            start, previous, requests = record or (now, 0, 0)
+            if now - start >= 2 * window_length:
+                start, previous, requests = now, 0, 0
+            elif now - start >= window_length:
+                start, previous, requests = start + window_length, requests, 0
+            return (start + 2 * window_length, (start, previous, requests + 1))
+
+        start, previous, requests = table.update(suffix, now, slide)
+        weight = (window_length - (now - start)) / window_length
+        results.append(math.floor(previous * weight) + requests)
+
+    return results
 
 
 def _update_ratelimit_db(request: Request):
@@ -54,53 +168,32 @@ def _update_ratelimit_db(request: Request):
     return record
 
 
-def update_ratelimit(request: Request, pipeline: Pipeline):
-    """Update the ratelimit stored in Redis or the database depending
-    on AUR_CONFIG's [options] cache setting.
-
-    This Redis-capable function is slightly different than most. If Redis
-    is not configured to use a real server, this function instead uses
-    the database to persist tracking of a particular host.
-
-    :param request: FastAPI request
-    :param pipeline: redis.client.Pipeline
-    :returns: ApiRateLimit record when Redis cache is not configured, else None
-    """
-    if config.getboolean("ratelimit", "cache"):
-        return _update_ratelimit_redis(request, pipeline)
-    return _update_ratelimit_db(request)
-
-
-def check_ratelimit(request: Request):
+def check_ratelimit(request: Request, endpoint: str = None):
     """Increment and check to see if request has exceeded their rate limit.
 
+    When [ratelimit] cache is enabled, every bucket is updated with one
+    atomic Redis script call. Otherwise, when [ratelimit] shared_memory
+    is enabled, buckets are tracked in a shared memory table local to
+    this host. Failing both, the database is used to track the global
+    limit alone.
+
     :param request: FastAPI request
+    :param endpoint: Optional endpoint name used for per-endpoint limits
     :returns: True if the request host has exceeded the rate limit else False
     """
-    redis = redis_connection()
-    pipeline = redis.pipeline()
-
-    record = update_ratelimit(request, pipeline)
-
-    # Get cache value, else None.
     host = request.client.host
-    pipeline.get(f"ratelimit:{host}")
-    requests = pipeline.execute()[0]
-
-    # Take into account the split paths. When Redis is used, a
-    # valid cache value will be returned which must be converted
-    # to an int. Otherwise, use the database record returned
-    # by update_ratelimit.
-    if not config.getboolean("ratelimit", "cache"):
-        # If we got nothing from pipeline.get, we did not use
-        # the Redis path of logic: use the DB record's count.
-        requests = record.Requests
+    buckets = _buckets(host, endpoint)
+
+    if config.getboolean("ratelimit", "cache"):
+        requests = _update_ratelimit_redis(buckets)
+    elif util.strtobool(config.get_with_fallback("ratelimit", "shared_memory", "0")):
+        requests = _update_ratelimit_shm(buckets)
     else:
-        # Otherwise, just case Redis results over to an int.
-        requests = int(requests.decode())
+        requests = [_update_ratelimit_db(request).Requests]
 
-    limit = config.getint("ratelimit", "request_limit")
-    exceeded_ratelimit = requests > limit
+    exceeded_ratelimit = any(
+        count > limit for count, (_, limit, _) in zip(requests, buckets)
+    )
     if exceeded_ratelimit:
         logger.debug(f"{host} has exceeded the ratelimit.")
 
@@ -12,7 +12,9 @@ from sqlalchemy import and_, or_
 
 import aurweb.config
 from aurweb import cookies, db, defaults, l10n, logging, models, util
-from aurweb.auth import account_type_required, requires_auth, requires_guest
+from aurweb.auth import account_type_required
+from aurweb.auth import api_keys as api_key_cache
+from aurweb.auth import requires_auth, requires_guest
 from aurweb.captcha import get_captcha_salts
 from aurweb.exceptions import ValidationError
 from aurweb.l10n import get_translator_for_request
@@ -21,6 +23,7 @@ from aurweb.models.api_key import ApiKey
 from aurweb.models.ssh_pub_key import get_fingerprint
 from aurweb.models.user import generate_resetkey
 from aurweb.pkgbase import actions as pkgbase_actions
+from aurweb.scripts import popupdate
 from aurweb.scripts.notify import ResetKeyNotification, WelcomeNotification
 from aurweb.templates import make_context, make_variable_context, render_template
 from aurweb.users import update, validate
@@ -111,7 +114,7 @@ async def passreset_post(
     with db.begin():
         user.ResetKey = resetkey
 
-    ResetKeyNotification(user.ID).send()
+    ResetKeyNotification(user.ID).enqueue()
 
     # Render ?step=confirm.
     return RedirectResponse(
@@ -213,6 +216,7 @@ def make_account_form_context(
         context["cn"] = args.get("CN", user.CommentNotify)
         context["un"] = args.get("UN", user.UpdateNotify)
         context["on"] = args.get("ON", user.OwnershipNotify)
+        context["dn"] = args.get("DN", user.DigestNotify)
         context["inactive"] = args.get("J", user.InactivityTS != 0)
     else:
         context["username"] = args.get("U", str())
@@ -231,6 +235,7 @@ def make_account_form_context(
         context["cn"] = args.get("CN", True)
         context["un"] = args.get("UN", False)
         context["on"] = args.get("ON", True)
+        context["dn"] = args.get("DN", False)
         context["inactive"] = args.get("J", False)
 
     context["password"] = args.get("P", str())
@@ -283,6 +288,7 @@ async def account_register_post(
     CN: bool = Form(default=False),
     UN: bool = Form(default=False),
     ON: bool = Form(default=False),
+    DN: bool = Form(default=False),
     captcha: str = Form(default=None),
     captcha_salt: str = Form(...),
 ):
@@ -337,6 +343,7 @@ async def account_register_post(
             CommentNotify=CN,
             UpdateNotify=UN,
             OwnershipNotify=ON,
+            DigestNotify=DN,
             ResetKey=resetkey,
             AccountType=atype,
         )
@@ -357,7 +364,7 @@ async def account_register_post(
             )
 
     # Send a reset key notification to the new user.
-    WelcomeNotification(user.ID).send()
+    WelcomeNotification(user.ID).enqueue()
 
     context["complete"] = True
     context["user"] = user
@@ -423,6 +430,7 @@ async def account_edit_post(
     CN: bool = Form(default=False),  # Comment Notify
     UN: bool = Form(default=False),  # Update Notify
     ON: bool = Form(default=False),  # Owner Notify
+    DN: bool = Form(default=False),  # Digest Notify
     T: int = Form(default=None),
     passwd: str = Form(default=str()),
 ):
@@ -516,10 +524,12 @@ async def account_delete_post(
 
     # Delete any API keys associated with the account.
     api_keys = db.query(ApiKey).filter(ApiKey.UserID == user.ID).all()
+    key_hashes = [key.KeyHash for key in api_keys]
 
     with db.begin():
         for key in api_keys:
             db.delete(key)
+    api_key_cache.invalidate(*key_hashes)
 
     # Delete any sessions associated with the account.
     sessions = db.query(models.Session).filter(models.Session.UsersID == user.ID).all()
@@ -543,8 +553,14 @@ async def account_delete_post(
         db.query(models.PackageVote).filter(models.PackageVote.UsersID == user.ID).all()
     )
 
-    for vote in votes:
-        db.delete(vote)
+    removed = [(vote.PackageBase, vote.VoteTS) for vote in votes]
+    with db.begin():
+        for vote in votes:
+            db.delete(vote)
+
+    # Update NumVotes/Popularity of the packages the user voted for.
+    for pkgbase, vote_ts in removed:
+        popupdate.remove_vote(pkgbase, vote_ts)
 
     # Finally, delete the account.
     db.delete(user)
@@ -622,8 +638,10 @@ async def api_key_delete(request: Request, api_key_id: int):
     if api_key is None:
         return Response(status_code=HTTPStatus.FORBIDDEN)
 
+    key_hash = api_key.KeyHash
     with db.begin():
         db.delete(api_key)
+    api_key_cache.invalidate(key_hash)
 
 
 @router.post("/api-keys/create")
@@ -1,13 +1,11 @@
 import functools
-import hashlib
 
 import orjson
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
 
-from aurweb import config, db, time
-from aurweb.models.account_type import TRUSTED_USER_ID
-from aurweb.models.api_key import ApiKey
-from aurweb.models.package import Package
+from aurweb import config, db, statistics, time
+from aurweb.auth import api_keys
 from aurweb.models.package_base import PackageBase
 from aurweb.models.package_comment import PackageComment
 from aurweb.models.package_notification import PackageNotification
@@ -15,26 +13,24 @@ from aurweb.models.package_request import CLOSED_ID, PENDING_ID, PackageRequest
 from aurweb.models.request_type import RequestType
 from aurweb.models.user import User
 from aurweb.packages.util import get_pkg_or_base
-from aurweb.routers.html import get_number_of_commits
 from aurweb.scripts.rendercomment import update_comment_render
 from aurweb.templates import make_context, render_template
 
 router = APIRouter()
 
+# Most comments /api/list-comments returns per request; clients page
+# through longer histories with its after parameter.
+MAX_COMMENTS = 1000
+
 
 class MissingJsonKeyException(Exception):
     pass
 
 
 # Helpful functions.
-def hash_api_key(api_key):
-    return hashlib.sha256(api_key.encode()).hexdigest()
-
-
 def get_user_from_api_key(request):
-    api_key = hash_api_key(request.headers["Authorization"])
-
-    return db.query(ApiKey).filter(ApiKey.KeyHash == api_key).first().User
+    """Return the User resolved by `auth_required` for this request."""
+    return request.state.api_user
 
 
 def get_json_item(body, *args):
@@ -61,18 +57,19 @@ def auth_required(func):
                 "msg": "No API key was provided.",
             }
 
-        # If so, make sure it exists.
-        hashed_api_key = hash_api_key(api_key)
-        db_api_key = db.query(ApiKey).filter(ApiKey.KeyHash == hashed_api_key).first()
+        # If so, make sure it exists and hasn't expired.
+        user = api_keys.get_user(api_key)
 
-        if db_api_key is None:
+        if user is None:
             return {
                 "type": "error",
                 "code": "err_invalid_api_key",
                 "msg": "Invalid API key.",
             }
 
-        # If all checks out, continue with processing the request.
+        # If all checks out, continue with processing the request as the
+        # key's owner.
+        request.state.api_user = user
         return await func(request, *args, **kwargs)
 
     return wrapper
@@ -107,31 +104,13 @@ async def api(request: Request):
 
 @router.get("/api/meta")
 async def api_meta():
-    packages = db.query(Package).count()
-    orphan_packages = (
-        db.query(PackageBase)
-        .filter(PackageBase.MaintainerUID == None)  # noqa: E711
-        .count()
-    )
-    users = db.query(User).count()
-    maintainers = db.query(PackageBase).group_by(PackageBase.MaintainerUID).count()
-    trusted_users = db.query(User).filter(User.AccountTypeID == TRUSTED_USER_ID).count()
-    commits = get_number_of_commits()
-
     return {
         "ssh_key_fingerprints": {
             "ED25519": config.get("fingerprints", "Ed25519"),
             "ECDSA": config.get("fingerprints", "ECDSA"),
             "RSA": config.get("fingerprints", "RSA"),
         },
-        "statistics": {
-            "packages": packages,
-            "orphan_packages": orphan_packages,
-            "package_commits": commits,
-            "users": users,
-            "maintainers": maintainers,
-            "trusted_users": trusted_users,
-        },
+        "statistics": statistics.get(),
     }
 
 
@@ -250,24 +229,55 @@ async def post_comment(request: Request, pkgbase_name: str):
 
 
 @router.get("/api/list-comments/{pkgbase_name}")
-async def get_comments(pkgbase_name: str):
+async def get_comments(
+    pkgbase_name: str,
+    after: int = Query(default=0),
+    since: int = Query(default=0),
+    limit: int = Query(default=MAX_COMMENTS),
+):
+    """List a package base's comments, oldest first.
+
+    :param after: Only list comments with an ID greater than this; pass
+                  the ID of the last comment of a page to get the next
+    :param since: Only list comments made at or after this timestamp
+    :param limit: List at most this many comments (at most
+                  MAX_COMMENTS)
+    """
     pkgbase = get_pkg_or_base(pkgbase_name, PackageBase)
-    comments = (
+
+    # The page is read up front so that no database connection is held
+    # while a client reads the response; only its encoding is streamed.
+    rows = (
         db.query(PackageComment)
-        .filter(PackageComment.PackageBaseID == pkgbase.ID)
+        .join(User, User.ID == PackageComment.UsersID, isouter=True)
+        .filter(
+            PackageComment.PackageBaseID == pkgbase.ID,
+            PackageComment.ID > after,
+            PackageComment.CommentTS >= since,
+        )
+        .order_by(PackageComment.ID)
+        .with_entities(
+            PackageComment.ID,
+            PackageComment.CommentTS,
+            PackageComment.Comments,
+            PackageComment.RenderedComment,
+            User.Username,
+        )
+        .limit(min(max(limit, 1), MAX_COMMENTS))
         .all()
     )
 
-    result = []
-
-    for comment in comments:
-        result += [
-            {
-                "date": comment.CommentTS,
-                "msg": comment.Comments,
-                "msg_rendered": comment.RenderedComment,
-                "user": comment.User.Username,
+    async def stream():
+        yield b"["
+        for i, row in enumerate(rows):
+            comment = {
+                "id": row.ID,
+                "date": row.CommentTS,
+                "msg": row.Comments,
+                "msg_rendered": row.RenderedComment,
+                "user": row.Username,
             }
-        ]
+            yield (b"," if i else b"") + orjson.dumps(comment)
+        yield b"]"
 
-    return result
+    return StreamingResponse(stream(), media_type="application/json")
@@ -395,7 +395,7 @@ async def packages_delete(
         f"following package bases: {str(deleted_bases)}."
     )
 
-    util.apply_all(notifs, lambda n: n.send())
+    util.apply_all(notifs, lambda n: n.enqueue())
     return (True, ["The selected packages have been deleted."])
 
 
@@ -1,12 +1,24 @@
 from http import HTTPStatus
+from itertools import islice
+from typing import List, Tuple
 
-import aiohttp
-import pygit2
 from fastapi import APIRouter, Form, HTTPException, Query, Request, Response
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
 from sqlalchemy import and_
-
-from aurweb import config, db, l10n, logging, templates, time, util
+from starlette.background import BackgroundTask
+
+from aurweb import (
+    config,
+    db,
+    defaults,
+    http_client,
+    l10n,
+    logging,
+    pulls,
+    templates,
+    time,
+    util,
+)
 from aurweb.auth import creds, requires_auth
 from aurweb.exceptions import InvariantError, ValidationError
 from aurweb.models import Package, PackageBase
@@ -19,12 +31,12 @@ from aurweb.models.request_type import DELETION_ID, MERGE_ID, ORPHAN_ID
 from aurweb.packages.requests import update_closure_comment
 from aurweb.packages.util import get_pkg_or_base, get_pkgbase_comment
 from aurweb.pkgbase import actions
+from aurweb.pkgbase import git as pkgbasegit
 from aurweb.pkgbase import util as pkgbaseutil
 from aurweb.pkgbase import validate
 from aurweb.scripts import notify, popupdate
 from aurweb.scripts.rendercomment import update_comment_render_fastapi
 from aurweb.templates import make_variable_context, render_template
-from aurweb.util import get_current_time
 
 logger = logging.get_logger(__name__)
 router = APIRouter()
@@ -429,7 +441,7 @@ async def pkgbase_vote(request: Request, name: str):
             db.create(PackageVote, User=request.user, PackageBase=pkgbase, VoteTS=now)
 
         # Update NumVotes/Popularity.
-        popupdate.run_single(pkgbase)
+        popupdate.add_vote(pkgbase, now)
 
     return RedirectResponse(f"/pkgbase/{name}", status_code=HTTPStatus.SEE_OTHER)
 
@@ -442,11 +454,12 @@ async def pkgbase_unvote(request: Request, name: str):
     vote = pkgbase.package_votes.filter(PackageVote.UsersID == request.user.ID).first()
     has_cred = request.user.has_credential(creds.PKGBASE_VOTE)
     if has_cred and vote:
+        vote_ts = vote.VoteTS
         with db.begin():
             db.delete(vote)
 
         # Update NumVotes/Popularity.
-        popupdate.run_single(pkgbase)
+        popupdate.remove_vote(pkgbase, vote_ts)
 
     return RedirectResponse(f"/pkgbase/{name}", status_code=HTTPStatus.SEE_OTHER)
 
@@ -686,8 +699,8 @@ async def pkgbase_request_post(
         merge_into=merge_into or None,
     )
 
-    # Send the notification now that we're out of the DB scope.
-    notif.send()
+    # Queue the notification now that we're out of the DB scope.
+    notif.enqueue()
 
     auto_orphan_age = config.getint("options", "auto_orphan_age")
     auto_delete_age = config.getint("options", "auto_delete_age")
@@ -705,12 +718,12 @@ async def pkgbase_request_post(
         notif = notify.RequestCloseNotification(
             request.user.ID, pkgreq.ID, pkgreq.status_display()
         )
-        notif.send()
+        notif.enqueue()
         logger.debug(f"New request #{pkgreq.ID} is marked for auto-orphan.")
     elif type == "deletion" and is_maintainer and outdated:
         # This request should be auto-accepted.
         notifs = actions.pkgbase_delete_instance(request, pkgbase, comments=comments)
-        util.apply_all(notifs, lambda n: n.send())
+        util.apply_all(notifs, lambda n: n.enqueue())
         logger.debug(f"New request #{pkgreq.ID} is marked for auto-deletion.")
 
     # Redirect the submitting user to /packages.
@@ -767,7 +780,7 @@ async def pkgbase_delete_post(
                 pkgreq.ClosureComment = comments
 
     notifs = actions.pkgbase_delete_instance(request, pkgbase, comments=comments)
-    util.apply_all(notifs, lambda n: n.send())
+    util.apply_all(notifs, lambda n: n.enqueue())
     return RedirectResponse("/packages", status_code=HTTPStatus.SEE_OTHER)
 
 
@@ -886,7 +899,7 @@ async def repology_check(
 # Git routes.
 def get_git_file(pkgbase, filename):
     # Get the needed git information.
-    repo = pygit2.Repository(f"/aurweb/aur.git/{pkgbase}")
+    repo = pkgbasegit.open_repository(pkgbase)
     branch = repo.revparse_single("master")
 
     # Get the requested file.
@@ -905,50 +918,30 @@ def get_git_file(pkgbase, filename):
 
 
 @router.get("/pkgbase/{name}/git")
-async def git_info(request: Request, name: str):
+async def git_info(
+    request: Request,
+    name: str,
+    O: int = Query(default=defaults.O),  # noqa: E741
+    PP: int = Query(default=defaults.PP),
+):
     pkg = get_pkg_or_base(name, Package)
     pkgbase = pkg.PackageBase
     context = pkgbaseutil.make_context(request, pkgbase)
 
     # Get the needed git information.
-    repo = pygit2.Repository(f"/aurweb/aur.git/{name}")
+    repo = pkgbasegit.open_repository(name)
 
     # Return an error if we couldn't find the branch.
     branch = repo.revparse_single("master")
     commit = repo.revparse_single(branch.hex)
 
-    # Get the number of commits in the last week, month, and year.
-    time = get_current_time()
-    day_seconds = 86400  # Number of seconds in a year.
-    one_week_back = time - (day_seconds * 7)
-    one_month_back = time - (day_seconds * 31)
-    one_year_back = time - (day_seconds * 365)
-
-    past_week_commits = 0
-    past_month_commits = 0
-    past_year_commits = 0
-    commits = []
-    committers = {}
-
-    for i in repo.walk(branch.hex):
-        commits += [i]
-
-        if i.author.name not in committers:
-            committers[i.author.name] = 1
-        else:
-            committers[i.author.name] += 1
+    # Commit counts and committers are cached per HEAD.
+    stats = pkgbasegit.commit_stats(name, repo, branch.hex)
 
-        if i.commit_time >= one_week_back:
-            past_week_commits += 1
-
-        if i.commit_time >= one_month_back:
-            past_month_commits += 1
-
-        if i.commit_time >= one_year_back:
-            past_year_commits += 1
-
-    # Sort the committers list by number of commits.
-    committers = dict(sorted(committers.items(), key=lambda item: item[0]))
+    # Only walk as far as the requested page of the commit log.
+    O, PP = util.sanitize_params(O, PP)
+    O, PP = max(O, 0), defaults.fallback_pp(PP)
+    commits = list(islice(repo.walk(branch.id), O, O + PP))
 
     # Get the tree for the latest commit.
     tree = [file.name for file in branch.tree]
@@ -957,12 +950,18 @@ async def git_info(request: Request, name: str):
     context["pkgbase"] = pkgbase
     context["commit"] = commit
     context["files"] = [file.name for file in commit.tree]
-    context["past_week_commits"] = past_week_commits
-    context["past_month_commits"] = past_month_commits
-    context["past_year_commits"] = past_year_commits
+    context["past_week_commits"] = stats["past_week_commits"]
+    context["past_month_commits"] = stats["past_month_commits"]
+    context["past_year_commits"] = stats["past_year_commits"]
     context["commits"] = commits
-    context["committers"] = committers
+    context["committers"] = stats["committers"]
     context["tree"] = tree
+    context["git_pulls"] = pulls.count(pkgbase)
+    context["q"] = dict(request.query_params)
+    context["O"] = O
+    context["PP"] = PP
+    context["total"] = stats["total"]
+    context["prefix"] = f"/pkgbase/{name}/git"
 
     return render_template(request, "pkgbase/git.html", context)
 
@@ -995,7 +994,7 @@ async def git_commit(request: Request, name: str, commit_hash: str):
     context = pkgbaseutil.make_context(request, pkgbase)
 
     # Get the needed git information.
-    repo = pygit2.Repository(f"/aurweb/aur.git/{name}")
+    repo = pkgbasegit.open_repository(name)
 
     # Return an error if we couldn't find the branch.
     branch = repo.revparse_single("master")
@@ -1007,25 +1006,12 @@ async def git_commit(request: Request, name: str, commit_hash: str):
             status_code=int(HTTPStatus.TEMPORARY_REDIRECT),
         )
 
-    # Scan the branch for the requested commit.
-    requested_commit = None
-
-    for commit in repo.walk(branch.id):
-        if commit.id.hex == commit_hash:
-            requested_commit = commit
-
-    # If we couldn't find the requested commit, return an error.
+    # Only serve commits on the branch.
+    requested_commit = pkgbasegit.find_commit(repo, branch.id, commit_hash)
     if requested_commit is None:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND)
 
-    # Get the diff between the parent commit and the requested one.
-    try:
-        diff = repo.diff(
-            requested_commit.parents[0].id.hex, requested_commit.id.hex
-        ).patch
-    # If this is the first commit, there will be no parent commit.
-    except IndexError:
-        diff = "No diff found."
+    diff = pkgbasegit.commit_diff(repo, requested_commit)
 
     context["pkg"] = pkg
     context["pkgbase"] = pkgbase
@@ -1036,43 +1022,64 @@ async def git_commit(request: Request, name: str, commit_hash: str):
     return render_template(request, "pkgbase/git/commit.html", context)
 
 
+# Internal Smartgit instance clone requests are forwarded to.
+CLONE_UPSTREAM = "http://nginx/internal-git"
+
+# Size of the chunks clone bodies are forwarded in.
+CLONE_CHUNK_SIZE = 64 * 1024
+
+# Hop-by-hop headers, which apply to a single connection and are not
+# forwarded by the clone proxy.
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+def _forwarded_headers(headers) -> List[Tuple[str, str]]:
+    return [
+        (key, value)
+        for key, value in headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    ]
+
+
 # Special routes for HTTP Git clone requests. We use this so we can count the
 # number of pulls.
 @router.get("/{pkg}/info/refs")
 @router.get("/{pkg}/HEAD")
 @router.get("/{pkg}/objects/{object:path}")
 @router.post("/{pkg}/git-upload-pack")
-async def clone(request: Request, response: Response, pkg: str):
+async def clone(request: Request, pkg: str):
     if pkg.endswith(".git"):
         pkg = pkg.removesuffix(".git")
 
     # If this route is the start of the request, add a counter to the number of pulls.
     if request.url.path.startswith(f"/{pkg}/info/refs"):
         pkgbase = get_pkg_or_base(pkg, PackageBase)
+        pulls.increment(pkgbase.ID)
+
+    # Forward the route to our internal Smartgit instance. Request and
+    # response bodies are streamed through in chunks rather than read
+    # into memory, so a clone's memory use doesn't grow with its size.
+    body = request.stream() if request.method == "POST" else None
+    upstream = await http_client.get_session().request(
+        request.method,
+        f"{CLONE_UPSTREAM}{request.url.path}",
+        params=request.query_params.multi_items(),
+        headers=_forwarded_headers(request.headers),
+        data=body,
+    )
 
-        with db.begin():
-            pkgbase.NumGitPulls += 1
-
-    # Forward the route to our internal Smartgit instance.
-    new_path = f"http://nginx/internal-git{request.url.path}"
-    request_body = await request.body()
-
-    # Generate a query param string.
-    if len(request.query_params) > 0:
-        items = []
-
-        for key, value in request.query_params.items():
-            items += [f"{key}={value}"]
-
-        query = "?" + "&".join(items)
-        new_path += query
-
-    async with aiohttp.ClientSession() as session:
-        methods = {"GET": session.get, "POST": session.post}
-
-        async with methods[request.method](
-            new_path, headers=request.headers, data=request_body
-        ) as response:
-            response_body = await response.read()
-            response_headers = dict(response.headers)
-            return Response(content=response_body, headers=response_headers)
+    return StreamingResponse(
+        upstream.content.iter_chunked(CLONE_CHUNK_SIZE),
+        status_code=upstream.status,
+        headers=dict(_forwarded_headers(upstream.headers)),
+        background=BackgroundTask(upstream.release),
+    )
@@ -94,6 +94,6 @@ async def request_close_post(
     notify_ = notify.RequestCloseNotification(
         request.user.ID, pkgreq.ID, pkgreq.status_display()
     )
-    notify_.send()
+    notify_.enqueue()
 
     return RedirectResponse("/requests", status_code=HTTPStatus.SEE_OTHER)
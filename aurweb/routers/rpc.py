@@ -81,7 +81,8 @@ async def rpc(
     rpc = RPC(version=v, type=type)
 
     # If ratelimit was exceeded, return a 429 Too Many Requests.
-    if check_ratelimit(request):
+    endpoint = f"rpc_{type}".replace("-", "_") if type else None
+    if check_ratelimit(request, endpoint):
         return JSONResponse(
             rpc.error("Rate limit reached"),
             status_code=int(HTTPStatus.TOO_MANY_REQUESTS),
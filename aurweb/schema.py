@@ -18,7 +18,7 @@ from sqlalchemy import (
     Text,
     text,
 )
-from sqlalchemy.dialects.mysql import BIGINT, DECIMAL, INTEGER, TINYINT
+from sqlalchemy.dialects.mysql import BIGINT, DECIMAL, DOUBLE, INTEGER, TINYINT
 from sqlalchemy.ext.compiler import compiles
 
 
@@ -102,6 +102,7 @@ Users = Table(
     Column("CommentNotify", TINYINT(1), nullable=False, server_default=text("1")),
     Column("UpdateNotify", TINYINT(1), nullable=False, server_default=text("0")),
     Column("OwnershipNotify", TINYINT(1), nullable=False, server_default=text("1")),
+    Column("DigestNotify", TINYINT(1), nullable=False, server_default=text("0")),
     Column("SSOAccountID", String(255), nullable=True, unique=True),
     Index("UsersAccountTypeID", "AccountTypeID"),
     mysql_engine="InnoDB",
@@ -164,12 +165,19 @@ PackageBases = Table(
         nullable=False,
         server_default=text("0"),
     ),
+    # Popularity as of PopularityTS, kept at full precision so that it
+    # can be decayed to the current time without accumulating rounding.
+    Column("PopularityScore", DOUBLE, nullable=False, server_default=text("0")),
+    Column(
+        "PopularityTS", BIGINT(unsigned=True), nullable=False, server_default=text("0")
+    ),
     Column("OutOfDateTS", BIGINT(unsigned=True)),
     Column("FlaggerComment", Text, nullable=False),
     Column("SubmittedTS", BIGINT(unsigned=True), nullable=False),
     Column("ModifiedTS", BIGINT(unsigned=True), nullable=False),
     Column("RepologyCheck", TINYINT(unsigned=True), nullable=False, default=0),
     Column("NumGitPulls", BIGINT(unsigned=True), nullable=False, default=0),
+    Column("NumCommits", BIGINT(unsigned=True), nullable=False, default=0),
     Column(
         "FlaggerUID", ForeignKey("Users.ID", ondelete="SET NULL")
     ),  # who flagged the package out-of-date?
@@ -586,3 +594,15 @@ ApiRateLimit = Table(
     mysql_charset="utf8mb4",
     mysql_collate="utf8mb4_general_ci",
 )
+
+
+# Site-wide statistics snapshot, see aurweb.statistics
+Statistics = Table(
+    "Statistics",
+    metadata,
+    Column("Name", String(64), primary_key=True),
+    Column("Value", BIGINT(unsigned=True), nullable=False),
+    mysql_engine="InnoDB",
+    mysql_charset="utf8mb4",
+    mysql_collate="utf8mb4_general_ci",
+)
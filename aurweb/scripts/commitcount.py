@@ -0,0 +1,37 @@
+"""
+Seed PackageBases.NumCommits from the package Git repositories.
+
+aurweb-git-update keeps commit counts current as packages are pushed;
+this only needs to be run once, after the NumCommits column is added.
+"""
+import os
+
+import pygit2
+
+import aurweb.config
+from aurweb import db
+from aurweb.git.update import count_commits
+from aurweb.models.package_base import PackageBase
+
+
+def main():
+    db.get_engine()
+
+    with db.begin():
+        for pkgbase in db.query(PackageBase):
+            path = os.path.join(aurweb.config.git_repo_path, pkgbase.Name)
+            if not os.path.isdir(path):
+                continue
+
+            repo = pygit2.Repository(path)
+            branch = repo.references.get("refs/heads/master")
+
+            # The branch won't exist for the repository if there haven't been
+            # any commits to it yet.
+            pkgbase.NumCommits = (
+                0 if branch is None else count_commits(repo, branch.target)
+            )
+
+
+if __name__ == "__main__":
+    main()
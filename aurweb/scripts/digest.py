@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+Queue the notification digests of users who opted into them, see
+aurweb.mailqueue.
+"""
+from aurweb import mailqueue
+
+
+def main():
+    mailqueue.collect_digests()
+
+
+if __name__ == "__main__":
+    main()
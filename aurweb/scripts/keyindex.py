@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Rebuild aurweb-git-auth's SSH key index, see aurweb.git.keyindex.
+"""
+from aurweb import db
+from aurweb.users import ssh_keys
+
+
+def main():
+    with db.get_engine().connect() as conn:
+        ssh_keys.rebuild(conn)
+
+
+if __name__ == "__main__":
+    main()
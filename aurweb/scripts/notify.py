@@ -2,9 +2,9 @@
 
 import email.mime.text
 import email.utils
-import smtplib
 import sys
 import textwrap
+from typing import Iterator, List, Tuple
 
 from sqlalchemy import and_, or_
 
@@ -12,7 +12,7 @@ import aurweb.config
 import aurweb.db
 import aurweb.filters
 import aurweb.l10n
-from aurweb import db, logging
+from aurweb import db, logging, mailqueue
 from aurweb.models import PackageBase, User
 from aurweb.models.package_comaintainer import PackageComaintainer
 from aurweb.models.package_comment import PackageComment
@@ -20,6 +20,7 @@ from aurweb.models.package_notification import PackageNotification
 from aurweb.models.package_request import PackageRequest
 from aurweb.models.request_type import RequestType
 from aurweb.models.tu_vote import TUVote
+from aurweb.smtp import Mailer
 
 logger = logging.get_logger(__name__)
 
@@ -34,6 +35,17 @@ def headers_reply(thread_id):
     return {"In-Reply-To": thread_id, "References": thread_id}
 
 
+def split_digest(query) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """Split recipients queried with their DigestNotify setting into
+    those emailed right away and those who get the notification in
+    their next digest."""
+    recipients, digest_recipients = [], []
+    for u in query:
+        target = digest_recipients if u.DigestNotify else recipients
+        target.append((u.Email, u.LangPreference))
+    return recipients, digest_recipients
+
+
 class Notification:
     def get_refs(self):
         return ()
@@ -44,6 +56,9 @@ class Notification:
     def get_cc(self):
         return []
 
+    def get_digest_recipients(self):
+        return []
+
     def get_body_fmt(self, lang):
         body = ""
         for line in self.get_body(lang).splitlines():
@@ -55,60 +70,76 @@ class Notification:
             body += "\n" + "[%d] %s" % (i + 1, ref)
         return body.rstrip()
 
-    def _send(self) -> None:
-        sender = aurweb.config.get("notifications", "sender")
-        reply_to = aurweb.config.get("notifications", "reply-to")
+    def get_message(self, lang: str) -> email.mime.text.MIMEText:
+        """Return the email sent to recipients speaking `lang`, without
+        a To header."""
         reason = self.__class__.__name__
         if reason.endswith("Notification"):
             reason = reason[: -len("Notification")]
 
-        for recipient in self.get_recipients():
-            to, lang = recipient
-            msg = email.mime.text.MIMEText(self.get_body_fmt(lang), "plain", "utf-8")
-            msg["Subject"] = self.get_subject(lang)
-            msg["From"] = sender
-            msg["Reply-to"] = reply_to
-            msg["To"] = to
-            if self.get_cc():
-                msg["Cc"] = str.join(", ", self.get_cc())
-            msg["X-MPR-Reason"] = reason
-            msg["Date"] = email.utils.formatdate(localtime=True)
-
-            for key, value in self.get_headers().items():
-                msg[key] = value
-
-            # send email using smtplib; no local MTA required
-            server_addr = aurweb.config.get("notifications", "smtp-server")
-            server_port = aurweb.config.getint("notifications", "smtp-port")
-            use_ssl = aurweb.config.getboolean("notifications", "smtp-use-ssl")
-            use_starttls = aurweb.config.getboolean(
-                "notifications", "smtp-use-starttls"
-            )
-            user = aurweb.config.get("notifications", "smtp-user")
-            passwd = aurweb.config.get("notifications", "smtp-password")
+        msg = email.mime.text.MIMEText(self.get_body_fmt(lang), "plain", "utf-8")
+        msg["Subject"] = self.get_subject(lang)
+        msg["From"] = aurweb.config.get("notifications", "sender")
+        msg["Reply-to"] = aurweb.config.get("notifications", "reply-to")
+        if self.get_cc():
+            msg["Cc"] = str.join(", ", self.get_cc())
+        msg["X-MPR-Reason"] = reason
+        msg["Date"] = email.utils.formatdate(localtime=True)
 
-            classes = {
-                False: smtplib.SMTP,
-                True: smtplib.SMTP_SSL,
-            }
-            server = classes[use_ssl](server_addr, server_port)
+        for key, value in self.get_headers().items():
+            msg[key] = value
 
-            if use_starttls:
-                server.ehlo()
-                server.starttls()
-                server.ehlo()
+        return msg
 
-            if user and passwd:
-                server.login(user, passwd)
+    def get_messages(self) -> Iterator[Tuple[str, List[str], bytes]]:
+        """Yield the sender, envelope recipients and content of each
+        email this notification consists of.
 
-            server.set_debuglevel(0)
-            deliver_to = [to] + self.get_cc()
-            server.sendmail(sender, deliver_to, msg.as_bytes())
-            server.quit()
+        Recipients mostly share a few languages, so the email is
+        rendered once per language; only its To header differs between
+        recipients.
+        """
+        sender = aurweb.config.get("notifications", "sender")
+        cc = self.get_cc()
+        messages = {}
+
+        for to, lang in self.get_recipients():
+            if lang not in messages:
+                messages[lang] = self.get_message(lang)
+            msg = messages[lang]
+
+            del msg["To"]
+            msg["To"] = to
+            yield (sender, [to] + cc, msg.as_bytes())
+
+    def _send(self, mailer: Mailer) -> None:
+        # send email using smtplib; no local MTA required
+        for sender, deliver_to, msg in self.get_messages():
+            mailer.send(sender, deliver_to, msg)
+
+    def enqueue(self) -> None:
+        """Queue the notification for delivery by aurweb-notifyd."""
+        if self.get_digest_recipients():
+            mailqueue.add_to_digests(self, self.get_digest_recipients())
+        if self.get_recipients():
+            mailqueue.enqueue(self)
+
+    def send(self, mailer: Mailer = None) -> None:
+        """Send the notification to all of its recipients, except for
+        those who get it in their next digest.
+
+        :param mailer: Mailer to deliver through; by default, one is
+                       opened for this notification's recipients
+        """
+        if self.get_digest_recipients():
+            mailqueue.add_to_digests(self, self.get_digest_recipients())
 
-    def send(self) -> None:
         try:
-            self._send()
+            if mailer is not None:
+                self._send(mailer)
+            else:
+                with Mailer() as mailer:
+                    self._send(mailer)
         except OSError as exc:
             logger.error(
                 "Unable to emit notification due to an "
@@ -199,10 +230,10 @@ class CommentNotification(Notification):
                     User.Suspended == 0,
                 )
             )
-            .with_entities(User.Email, User.LangPreference)
+            .with_entities(User.Email, User.LangPreference, User.DigestNotify)
             .distinct()
         )
-        self._recipients = [(u.Email, u.LangPreference) for u in query]
+        self._recipients, self._digest_recipients = split_digest(query)
 
         pkgcomment = (
             db.query(PackageComment.Comments)
@@ -216,6 +247,9 @@ class CommentNotification(Notification):
     def get_recipients(self):
         return self._recipients
 
+    def get_digest_recipients(self):
+        return self._digest_recipients
+
     def get_subject(self, lang):
         return aurweb.l10n.translator.translate(
             "MPR Comment for {pkgbase}", lang
@@ -265,16 +299,19 @@ class UpdateNotification(Notification):
                     User.Suspended == 0,
                 )
             )
-            .with_entities(User.Email, User.LangPreference)
+            .with_entities(User.Email, User.LangPreference, User.DigestNotify)
             .distinct()
         )
-        self._recipients = [(u.Email, u.LangPreference) for u in query]
+        self._recipients, self._digest_recipients = split_digest(query)
 
         super().__init__()
 
     def get_recipients(self):
         return self._recipients
 
+    def get_digest_recipients(self):
+        return self._digest_recipients
+
     def get_subject(self, lang):
         return aurweb.l10n.translator.translate(
             "MPR Package Update: {pkgbase}", lang
@@ -324,10 +361,10 @@ class FlagNotification(Notification):
                 ),
             )
             .filter(and_(PackageBase.ID == pkgbase_id, User.Suspended == 0))
-            .with_entities(User.Email, User.LangPreference)
+            .with_entities(User.Email, User.LangPreference, User.DigestNotify)
             .distinct()
         )
-        self._recipients = [(u.Email, u.LangPreference) for u in query]
+        self._recipients, self._digest_recipients = split_digest(query)
 
         pkgbase = (
             db.query(PackageBase.FlaggerComment)
@@ -341,6 +378,9 @@ class FlagNotification(Notification):
     def get_recipients(self):
         return self._recipients
 
+    def get_digest_recipients(self):
+        return self._digest_recipients
+
     def get_subject(self, lang):
         return aurweb.l10n.translator.translate(
             "MPR Out-of-date Notification for {pkgbase}", lang
@@ -767,6 +807,28 @@ class TUVoteReminderNotification(Notification):
         return (aur_location + "/tu/?id=" + str(self._vote_id),)
 
 
+class DigestNotification(Notification):
+    def __init__(self, to, lang, events):
+        self._to = to
+        self._lang = lang
+        self._events = events
+
+    def get_recipients(self):
+        return [(self._to, self._lang)]
+
+    def get_subject(self, lang):
+        return aurweb.l10n.translator.translate("MPR Notification Digest", lang)
+
+    def get_body_fmt(self, lang):
+        # Each notification's body is formatted already, including its
+        # references.
+        sections = []
+        for payload in self._events:
+            event = mailqueue.loads(payload)
+            sections.append(event.get_subject(lang) + "\n\n" + event.get_body_fmt(lang))
+        return str.join("\n\n" + "=" * 70 + "\n\n", sections)
+
+
 def main():
     db.get_engine()
     action = sys.argv[1]
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Deliver queued email notifications, see aurweb.mailqueue.
+
+Up to [notifications] workers notifications are delivered at once, each
+worker thread over an SMTP connection of its own which it keeps open
+between notifications. Notifications which fail to be delivered are
+retried with an exponential backoff; recipients who were already
+emailed are not emailed again.
+"""
+import smtplib
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import aurweb.config
+from aurweb import logging, mailqueue
+from aurweb.smtp import Mailer
+
+logger = logging.get_logger(__name__)
+
+# Seconds to wait before polling an empty queue again.
+POLL_INTERVAL = 1.0
+
+
+class Worker:
+    def __init__(self):
+        self.local = threading.local()
+        self.mailers = []
+        self.lock = threading.Lock()
+
+    def mailer(self) -> Mailer:
+        """Return the calling thread's Mailer."""
+        mailer = getattr(self.local, "mailer", None)
+        if mailer is None:
+            mailer = self.local.mailer = Mailer()
+            with self.lock:
+                self.mailers.append(mailer)
+        return mailer
+
+    def close(self) -> None:
+        for mailer in self.mailers:
+            mailer.close()
+
+    def deliver(self, job_id: str) -> bool:
+        """Deliver job `job_id`.
+
+        :return: True if the job was delivered or dropped, False if it
+                 was scheduled to be retried
+        """
+        payload = mailqueue.payload(job_id)
+        if payload is None:
+            mailqueue.complete(job_id)
+            return True
+
+        delivered = mailqueue.progress(job_id)
+        try:
+            notification = mailqueue.loads(payload)
+            for i, (sender, to, msg) in enumerate(notification.get_messages()):
+                if i < delivered:
+                    continue
+                try:
+                    self.mailer().send(sender, to, msg)
+                except smtplib.SMTPRecipientsRefused as exc:
+                    # Retrying won't help; skip the recipient.
+                    logger.warning(f"Notification {job_id} refused: {exc}")
+                delivered = i + 1
+        except Exception:
+            logger.exception(f"Unable to deliver notification {job_id}.")
+            mailqueue.set_progress(job_id, delivered)
+            return not mailqueue.retry(job_id)
+
+        mailqueue.complete(job_id)
+        return True
+
+    def run(self, workers: int) -> None:
+        """Deliver jobs as they become due, `workers` at a time."""
+        running = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                mailqueue.recover()
+                for job_id in mailqueue.claim(workers - len(running)):
+                    running.add(pool.submit(self.deliver, job_id))
+
+                if running:
+                    _, running = wait(
+                        running, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED
+                    )
+                else:
+                    time.sleep(POLL_INTERVAL)
+
+
+def main():
+    workers = int(aurweb.config.get_with_fallback("notifications", "workers", 4))
+
+    worker = Worker()
+    try:
+        worker.run(workers)
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -56,7 +56,7 @@ async def oodcheck():
                         )
 
                     # Send a notification to the maintainer and comaintainers if needed.
-                    FlagNotification(pkgbase.Maintainer.ID, pkgbase.ID)
+                    FlagNotification(bot.ID, pkgbase.ID).enqueue()
 
 
 def main():
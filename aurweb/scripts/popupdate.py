@@ -1,14 +1,37 @@
 #!/usr/bin/env python3
-
+"""
+Update the popularity of package bases.
+
+A package base's popularity is the sum of the weights of its votes,
+where a vote's weight decays by DECAY per day since it was cast.
+Recalculating that from every vote is expensive, so it is instead kept
+up to date incrementally: PopularityScore holds the popularity as of
+PopularityTS, which add_vote() and remove_vote() adjust, and
+Popularity is decayed from it to the current time by decay(), which
+aurweb-popupdate runs by default.
+
+Votes which disappear without remove_vote(), like those of deleted
+users, are only accounted for by a full recalculation, which
+aurweb-popupdate --full and run_variable() do.
+"""
+import argparse
 from typing import List
 
 from sqlalchemy import and_, func
 from sqlalchemy.sql.functions import coalesce
 from sqlalchemy.sql.functions import sum as _sum
 
-from aurweb import db, time
+from aurweb import db, homepage, time
 from aurweb.models import PackageBase, PackageVote
 
+# Factor by which a vote's weight decays per day.
+DECAY = 0.98
+
+
+def weight(age: int) -> float:
+    """Return the weight of a vote cast `age` seconds ago."""
+    return DECAY ** (age / 86400)
+
 
 def run_variable(pkgbases: List[PackageBase] = []) -> None:
     """
@@ -33,7 +56,7 @@ def run_variable(pkgbases: List[PackageBase] = []) -> None:
     pop_subq = (
         db.get_session()
         .query(
-            coalesce(_sum(func.pow(0.98, (now - PackageVote.VoteTS) / 86400)), 0.0),
+            coalesce(_sum(func.pow(DECAY, (now - PackageVote.VoteTS) / 86400)), 0.0),
         )
         .select_from(PackageVote)
         .filter(
@@ -55,9 +78,11 @@ def run_variable(pkgbases: List[PackageBase] = []) -> None:
         query.update(
             {
                 "NumVotes": votes_subq.scalar_subquery(),
-                "Popularity": pop_subq.scalar_subquery(),
+                "PopularityScore": pop_subq.scalar_subquery(),
+                "PopularityTS": now,
             }
         )
+        query.update({"Popularity": PackageBase.PopularityScore})
 
 
 def run_single(pkgbase: PackageBase) -> None:
@@ -72,9 +97,81 @@ def run_single(pkgbase: PackageBase) -> None:
     db.refresh(pkgbase)
 
 
+def _adjust(pkgbase: PackageBase, votes: int, score: float, now: int) -> None:
+    """Add `votes` to the NumVotes and `score` to the popularity of
+    `pkgbase` as of `now`, then refresh `pkgbase`."""
+    with db.begin():
+        query = db.query(PackageBase).filter(PackageBase.ID == pkgbase.ID)
+        current = (
+            query.with_entities(PackageBase.PopularityScore, PackageBase.PopularityTS)
+            .with_for_update()
+            .one()
+        )
+        decayed = current.PopularityScore * weight(now - current.PopularityTS)
+        score = max(decayed + score, 0.0)
+        query.update(
+            {
+                "NumVotes": PackageBase.NumVotes + votes,
+                "PopularityScore": score,
+                "PopularityTS": now,
+                "Popularity": score,
+            }
+        )
+    db.refresh(pkgbase)
+
+
+def add_vote(pkgbase: PackageBase, vote_ts: int) -> None:
+    """Account for a vote on `pkgbase` cast at `vote_ts`.
+
+    :param pkgbase: Instance of db.PackageBase
+    :param vote_ts: VoteTS of the new PackageVote
+    """
+    now = time.utcnow()
+    _adjust(pkgbase, 1, weight(now - vote_ts), now)
+
+
+def remove_vote(pkgbase: PackageBase, vote_ts: int = None) -> None:
+    """Account for the removal of a vote on `pkgbase` cast at `vote_ts`.
+
+    :param pkgbase: Instance of db.PackageBase
+    :param vote_ts: VoteTS of the deleted PackageVote
+    """
+    now = time.utcnow()
+    score = weight(now - vote_ts) if vote_ts is not None else 0.0
+    _adjust(pkgbase, -1, -score, now)
+
+
+def decay() -> None:
+    """Decay the Popularity of every PackageBase to the current time."""
+    now = time.utcnow()
+    with db.begin():
+        db.query(PackageBase).filter(
+            and_(PackageBase.PopularityScore > 0, PackageBase.PopularityTS <= now)
+        ).update(
+            {
+                "Popularity": PackageBase.PopularityScore
+                * func.pow(DECAY, (now - PackageBase.PopularityTS) / 86400)
+            }
+        )
+
+
 def main():
+    parser = argparse.ArgumentParser(
+        description="Update the popularity of package bases."
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="recalculate NumVotes and popularity from every vote",
+    )
+    args = parser.parse_args()
+
     db.get_engine()
-    run_variable()
+    if args.full:
+        run_variable()
+    else:
+        decay()
+    homepage.refresh_popular()
 
 
 if __name__ == "__main__":
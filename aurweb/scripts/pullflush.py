@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+Add pending git pull counts to the database, see aurweb.pulls.
+"""
+from aurweb import db, pulls
+
+
+def main():
+    db.get_engine()
+    pulls.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 
-import sys
+import argparse
+import multiprocessing
+import os
+import threading
+from typing import Any, Dict, List, Tuple
 from xml.etree.ElementTree import Element
 
 import bleach
 import markdown
-from bs4 import BeautifulSoup
+from sqlalchemy import bindparam, select, update
 
-from aurweb import db, logging
+import aurweb.config
+from aurweb import db, logging, schema
 from aurweb.models import PackageComment
 
 logger = logging.get_logger(__name__)
@@ -68,31 +73,77 @@ class HeadingExtension(markdown.extensions.Extension):
         md.treeprocessors.register(HeadingTreeprocessor(md), "heading", 30)
 
 
-# Convert standard codeblocks into ones with clipboard copy links.
-# This would be a markdown extension, but it doesn't want to work there for some reason.
-def ClipboardOnCodeBlock(text):
-    soup = BeautifulSoup(text, "html.parser")
-    code_blocks = soup.find_all("pre")
+# Tags and attributes which rendered comments may contain.
+ALLOWED_TAGS = bleach.sanitizer.ALLOWED_TAGS + [
+    "p",
+    "pre",
+    "h4",
+    "h5",
+    "h6",
+    "br",
+    "hr",
+]
+ALLOWED_ATTRIBUTES = dict(bleach.sanitizer.ALLOWED_ATTRIBUTES, code=["class"])
 
-    for code_block in code_blocks:
-        with open("/aurweb/templates/svg/clipboard.svg", "r") as file:
-            clipboard_svg = BeautifulSoup(file.read(), "html.parser")
+# Number of comments rendered per task by render_all().
+BATCH_SIZE = 500
 
-        with open("/aurweb/templates/svg/check.svg", "r") as file:
-            check_svg = BeautifulSoup(file.read(), "html.parser")
 
-        code_block_wrapper = soup.new_tag("div")
-        code_block_wrapper["class"] = "code-block"
+def load_svg(name: str) -> str:
+    path = os.path.join(aurweb.config.mprweb_dir, "templates", "svg", f"{name}.svg")
+    with open(path) as f:
+        return f.read()
 
-        clipboard_icons = soup.new_tag("div")
-        clipboard_icons["class"] = "clipboard-icons"
-        clipboard_icons.append(clipboard_svg)
-        clipboard_icons.append(check_svg)
 
-        code_block.wrap(code_block_wrapper)
-        code_block.insert_before(clipboard_icons)
+class Renderer:
+    """
+    Renders comments' markdown to sanitized HTML.
+
+    Setting up markdown and bleach is far more expensive than rendering
+    a typical comment, so a Renderer is set up once and reset between
+    comments. A Renderer must only be used by one thread at a time; use
+    renderer() to get the calling thread's.
+    """
 
-    return str(soup)
+    def __init__(self):
+        self.markdown = markdown.Markdown(
+            extensions=[
+                "fenced_code",
+                LinkifyExtension(),
+                FlysprayLinksExtension(),
+                HeadingExtension(),
+            ]
+        )
+        self.cleaner = bleach.Cleaner(tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+
+        # Code blocks get links to copy them to the clipboard. This would
+        # be a markdown extension, but bleach would strip the markup.
+        # Sanitized HTML only contains <pre> tags without attributes, so
+        # they can be wrapped by replacing them.
+        self.code_block_open = (
+            '<div class="code-block"><div class="clipboard-icons">'
+            + load_svg("clipboard")
+            + load_svg("check")
+            + "</div><pre>"
+        )
+        self.code_block_close = "</pre></div>"
+
+    def render(self, text: str) -> str:
+        html = self.markdown.reset().convert(text)
+        html = self.cleaner.clean(html)
+        return html.replace("<pre>", self.code_block_open).replace(
+            "</pre>", self.code_block_close
+        )
+
+
+_local = threading.local()
+
+
+def renderer() -> Renderer:
+    """Return the calling thread's Renderer."""
+    if not hasattr(_local, "renderer"):
+        _local.renderer = Renderer()
+    return _local.renderer
 
 
 def save_rendered_comment(comment: PackageComment, html: str):
@@ -105,44 +156,71 @@ def update_comment_render_fastapi(comment: PackageComment) -> None:
 
 
 def update_comment_render(comment: PackageComment) -> None:
-    text = comment.Comments
-
-    html = markdown.markdown(
-        text,
-        extensions=[
-            "fenced_code",
-            LinkifyExtension(),
-            FlysprayLinksExtension(),
-            HeadingExtension(),
-        ],
-    )
+    html = renderer().render(comment.Comments)
+    save_rendered_comment(comment, html)
+    db.refresh(comment)
+
 
-    allowed_tags = bleach.sanitizer.ALLOWED_TAGS + [
-        "p",
-        "pre",
-        "h4",
-        "h5",
-        "h6",
-        "br",
-        "hr",
+def render_batch(batch: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+    return [
+        {"comment_id": comment_id, "html": renderer().render(text)}
+        for comment_id, text in batch
     ]
-    bleach.sanitizer.ALLOWED_ATTRIBUTES["code"] = ["class"]
 
-    html = bleach.clean(
-        html, tags=allowed_tags, attributes=bleach.sanitizer.ALLOWED_ATTRIBUTES
+
+def render_all(processes: int = None) -> int:
+    """Render every comment again, in a pool of `processes` processes.
+
+    Comments are read and written by this process; the pool only
+    renders them.
+
+    :return: Number of comments rendered
+    """
+    table = schema.PackageComments
+    query = select(table.c.ID, table.c.Comments).order_by(table.c.ID)
+    statement = (
+        update(table)
+        .where(table.c.ID == bindparam("comment_id"))
+        .values(RenderedComment=bindparam("html"))
     )
 
-    for func in [ClipboardOnCodeBlock]:
-        html = func(html)
+    count = 0
+    engine = db.get_engine()
+    with multiprocessing.Pool(processes) as pool:
+        with engine.connect() as reader, engine.connect() as writer:
+            rows = reader.execution_options(stream_results=True).execute(query)
+            batches = iter(
+                lambda: [tuple(row) for row in rows.fetchmany(BATCH_SIZE)], []
+            )
+            for rendered in pool.imap(render_batch, batches):
+                with writer.begin():
+                    writer.execute(statement, rendered)
+                count += len(rendered)
 
-    save_rendered_comment(comment, html)
-    db.refresh(comment)
+    return count
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Render package comments' markdown to HTML."
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("comment_id", type=int, nargs="?", help="comment to render")
+    target.add_argument("--all", action="store_true", help="render every comment")
+    parser.add_argument(
+        "-j", "--jobs", type=int, help="processes to render with (default: CPUs)"
+    )
+    args = parser.parse_args()
+
     db.get_engine()
-    comment_id = int(sys.argv[1])
-    comment = db.query(PackageComment).filter(PackageComment.ID == comment_id).first()
+    if args.all:
+        count = render_all(args.jobs)
+        logger.info(f"Rendered {count} comments.")
+        return
+
+    comment = (
+        db.query(PackageComment).filter(PackageComment.ID == args.comment_id).first()
+    )
     update_comment_render(comment)
 
 
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+Recompute the site-wide statistics snapshot, see aurweb.statistics.
+"""
+from aurweb import db, statistics
+
+
+def main():
+    db.get_engine()
+    statistics.update()
+
+
+if __name__ == "__main__":
+    main()
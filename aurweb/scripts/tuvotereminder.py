@@ -24,7 +24,7 @@ def main():
     )
     for voteinfo in query:
         notif = notify.TUVoteReminderNotification(voteinfo.ID)
-        notif.send()
+        notif.enqueue()
 
 
 if __name__ == "__main__":
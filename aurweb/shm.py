@@ -0,0 +1,102 @@
+"""
+Fixed-size hash tables in shared memory.
+
+A SharedTable stores small fixed-size records in an mmap()ed file,
+by default on tmpfs, so that every worker process on a host shares them
+without a network or database round trip. Records carry an expiry
+timestamp; expired records are treated as absent and their slots are
+reused lazily, so the table never needs to be swept.
+
+Updates to a record are atomic across processes: the range of slots a
+key can occupy is locked with a POSIX byte-range lock for the duration
+of the update. These locks are released by the kernel if the holding
+process dies.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from typing import Callable, Optional, Tuple
+
+# Directory shared memory tables are created in.
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+class SharedTable:
+    """
+    An open-addressed hash table of fixed-size records in shared memory.
+
+    Each slot holds a 64-bit key digest, an expiry timestamp and the
+    record's values, packed with the `struct` format `fmt`. A key is
+    stored in one of `probes` consecutive slots; when all of them are
+    in use, the record expiring soonest is evicted.
+
+    :param path: Path of the backing file
+    :param fmt: struct format of a record's values
+    :param slots: Number of slots in the table
+    :param probes: Number of slots a key may occupy
+    """
+
+    def __init__(self, path: str, fmt: str, slots: int = 65536, probes: int = 8):
+        self.path = path
+        self._struct = struct.Struct("=Qq" + fmt)
+        self._slots = slots
+        self._probes = probes
+
+        size = self._struct.size * slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._mmap = mmap.mmap(self._fd, size)
+
+    def close(self) -> None:
+        self._mmap.close()
+        os.close(self._fd)
+
+    def _digest(self, key: str) -> int:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # A zero digest marks an empty slot.
+        return int.from_bytes(digest, "little") or 1
+
+    def update(
+        self, key: str, now: int, fn: Callable[[Optional[Tuple]], Tuple[int, Tuple]]
+    ) -> Tuple:
+        """
+        Atomically update the record stored for `key`.
+
+        :param key: Record key
+        :param now: Current timestamp, used to expire records
+        :param fn: Called with the record's current values, or None if the
+                   record is absent or expired; returns (expires, values)
+        :return: The values stored
+        """
+        digest = self._digest(key)
+        first = digest % (self._slots - self._probes + 1)
+        size = self._struct.size
+        offset, length = first * size, self._probes * size
+
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset)
+        try:
+            target, current, soonest = None, None, None
+            for slot in range(first, first + self._probes):
+                record = self._struct.unpack_from(self._mmap, slot * size)
+                if record[0] == digest:
+                    target = slot
+                    if record[1] > now:
+                        current = record[2:]
+                    break
+                if soonest is None or record[1] < soonest[1]:
+                    soonest = (slot, record[1])
+
+            if target is None:
+                # Reuse an empty or expired slot, else evict the record
+                # expiring soonest.
+                target = soonest[0]
+
+            expires, values = fn(current)
+            self._struct.pack_into(self._mmap, target * size, digest, expires, *values)
+            return values
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset)
@@ -0,0 +1,104 @@
+"""
+Email delivery over a reusable SMTP connection.
+
+Opening an SMTP connection costs a TCP handshake, and often a TLS
+handshake and a login on top. A Mailer opens one connection on first
+use and delivers every message it is given over it, reconnecting when
+the server drops the connection (for instance after the number of
+messages it allows per connection).
+"""
+import smtplib
+from typing import List, Optional
+
+import aurweb.config
+from aurweb import logging
+
+logger = logging.get_logger(__name__)
+
+
+class Mailer:
+    """
+    Delivers messages over a single SMTP connection configured in the
+    [notifications] section.
+
+    A Mailer is meant to be used as a context manager; the connection
+    is closed on exit.
+    """
+
+    # Number of times delivery of a message is retried on a new
+    # connection after the previous one was lost.
+    retries = 1
+
+    def __init__(self):
+        self.server_addr = aurweb.config.get("notifications", "smtp-server")
+        self.server_port = aurweb.config.getint("notifications", "smtp-port")
+        self.use_ssl = aurweb.config.getboolean("notifications", "smtp-use-ssl")
+        self.use_starttls = aurweb.config.getboolean(
+            "notifications", "smtp-use-starttls"
+        )
+        self.user = aurweb.config.get("notifications", "smtp-user")
+        self.passwd = aurweb.config.get("notifications", "smtp-password")
+
+        self._server: Optional[smtplib.SMTP] = None
+
+    def __enter__(self) -> "Mailer":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _connect(self) -> smtplib.SMTP:
+        classes = {
+            False: smtplib.SMTP,
+            True: smtplib.SMTP_SSL,
+        }
+        server = classes[self.use_ssl](self.server_addr, self.server_port)
+
+        if self.use_starttls:
+            server.ehlo()
+            server.starttls()
+            server.ehlo()
+
+        if self.user and self.passwd:
+            server.login(self.user, self.passwd)
+
+        server.set_debuglevel(0)
+        return server
+
+    def close(self) -> None:
+        """Close the connection, if one is open."""
+        server, self._server = self._server, None
+        if server is None:
+            return
+
+        try:
+            server.quit()
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # The connection is gone either way.
+            server.close()
+
+    def send(self, sender: str, recipients: List[str], msg: bytes) -> None:
+        """Deliver `msg` from `sender` to `recipients`.
+
+        :raises OSError: If the message could not be delivered, including
+                         any smtplib.SMTPException
+        """
+        for _ in range(self.retries + 1):
+            if self._server is None:
+                self._server = self._connect()
+
+            try:
+                self._server.sendmail(sender, recipients, msg)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as exc:
+                error = exc
+            except smtplib.SMTPResponseException as exc:
+                # 421: The server is closing the connection.
+                if exc.smtp_code != 421:
+                    raise
+                error = exc
+
+            logger.warning(f"SMTP connection lost ({error}), reconnecting.")
+            self.close()
+
+        raise error
@@ -0,0 +1,132 @@
+"""
+Site-wide statistics snapshots.
+
+Counting packages, users and maintainers takes several aggregate queries
+over the largest tables. Rather than running them on every /about or
+/api/meta request, aurweb-statsupdate periodically computes a snapshot
+and stores it in Redis, and in the Statistics table as a fallback for
+when Redis has been flushed or restarted. Readers fetch the whole
+snapshot in a single round trip.
+
+A snapshot maps each name in FIELDS to an integer. `generated` holds the
+UTC timestamp it was computed at, so pages can show how fresh it is.
+"""
+from typing import Dict
+
+from sqlalchemy import case, distinct, func
+
+from aurweb import db, time
+from aurweb.models import Package, PackageBase, Statistic, User
+from aurweb.models.account_type import TRUSTED_USER_ID
+from aurweb.redis import redis_connection
+
+# Redis hash holding the current snapshot.
+REDIS_KEY = "statistics"
+
+FIELDS = (
+    "generated",
+    "packages",
+    "orphan_packages",
+    "package_commits",
+    "users",
+    "maintainers",
+    "trusted_users",
+    "packages_added_24h",
+    "packages_added_7d",
+    "packages_updated_7d",
+    "packages_updated_1y",
+    "packages_never_updated",
+    "users_added_24h",
+)
+
+DAY = 86400
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case([(condition, 1)], else_=0)), 0)
+
+
+def compute() -> Dict[str, int]:
+    """Compute a snapshot from the database."""
+    now = time.utcnow()
+    updated = PackageBase.ModifiedTS != PackageBase.SubmittedTS
+
+    pkgbases = (
+        db.query(PackageBase)
+        .with_entities(
+            _count_if(PackageBase.MaintainerUID.is_(None)).label("orphan_packages"),
+            func.coalesce(func.sum(PackageBase.NumCommits), 0).label("package_commits"),
+            func.count(distinct(PackageBase.MaintainerUID)).label("maintainers"),
+            _count_if(PackageBase.SubmittedTS >= now - DAY).label("packages_added_24h"),
+            _count_if(PackageBase.SubmittedTS >= now - 7 * DAY).label(
+                "packages_added_7d"
+            ),
+            _count_if(updated & (PackageBase.ModifiedTS >= now - 7 * DAY)).label(
+                "packages_updated_7d"
+            ),
+            _count_if(updated & (PackageBase.ModifiedTS >= now - 365 * DAY)).label(
+                "packages_updated_1y"
+            ),
+            _count_if(~updated).label("packages_never_updated"),
+        )
+        .one()
+    )
+
+    users = (
+        db.query(User)
+        .with_entities(
+            func.count(User.ID).label("users"),
+            _count_if(User.AccountTypeID == TRUSTED_USER_ID).label("trusted_users"),
+            _count_if(func.unix_timestamp(User.RegistrationTS) >= now - DAY).label(
+                "users_added_24h"
+            ),
+        )
+        .one()
+    )
+
+    snapshot = {"generated": now, "packages": db.query(Package).count()}
+    for row in (pkgbases, users):
+        snapshot.update({name: int(value) for name, value in row._asdict().items()})
+    return snapshot
+
+
+def _store_redis(snapshot: Dict[str, int]) -> None:
+    pipeline = redis_connection().pipeline()
+    pipeline.delete(REDIS_KEY)
+    pipeline.hset(REDIS_KEY, mapping=snapshot)
+    pipeline.execute()
+
+
+def update() -> Dict[str, int]:
+    """Compute a new snapshot and store it in Redis and the database."""
+    snapshot = compute()
+
+    with db.begin():
+        db.query(Statistic).delete()
+        for name, value in snapshot.items():
+            db.create(Statistic, Name=name, Value=value)
+
+    _store_redis(snapshot)
+    return snapshot
+
+
+def get() -> Dict[str, int]:
+    """Return the current snapshot.
+
+    The snapshot is read from Redis, falling back to the Statistics table
+    (and restoring Redis from it). If no snapshot has been stored yet, one
+    is computed on the spot.
+    """
+    redis = redis_connection()
+    snapshot = {
+        name.decode(): int(value) for name, value in redis.hgetall(REDIS_KEY).items()
+    }
+    if set(FIELDS) <= snapshot.keys():
+        return snapshot
+
+    snapshot = {record.Name: record.Value for record in db.query(Statistic)}
+    if set(FIELDS) <= snapshot.keys():
+        _store_redis(snapshot)
+        return snapshot
+
+    return update()
@@ -0,0 +1,100 @@
+"""
+Terms of Service acceptance tracking.
+
+The set of Terms and their revisions is cached process-wide and reduced
+to a short digest. When a user is found to have accepted every Term, that
+digest is remembered in their session; subsequent requests only compare
+the session marker against the current digest and do not touch the
+database until a new Term (or Term revision) is published.
+
+Changes made to Terms through the ORM in this process invalidate the
+cache immediately. Changes made elsewhere (other workers, manual SQL)
+are picked up once the cached digest is older than `TERMS_TTL` seconds.
+"""
+from sqlalchemy import event
+
+from aurweb import db, time
+from aurweb.models import AcceptedTerm, Term
+
+# Number of seconds a Terms digest is trusted before being reloaded.
+TERMS_TTL = 60
+
+# Session key used to store a user's accepted Terms marker.
+SESSION_KEY = "tos"
+
+# Module-private process-wide cache of the Terms digest.
+_digest = None
+_expires = 0
+
+
+def invalidate(*args, **kwargs) -> None:
+    """Drop the cached Terms digest; it is reloaded on next use."""
+    global _digest
+    _digest = None
+
+
+def digest() -> str:
+    """
+    Return a digest of all Terms and their current revisions.
+
+    :return: Digest string; empty if there are no Terms
+    """
+    global _digest, _expires
+
+    now = time.utcnow()
+    if _digest is None or now >= _expires:
+        records = (
+            db.query(Term).with_entities(Term.ID, Term.Revision).order_by(Term.ID)
+        ).all()
+        _digest = ",".join(f"{rec.ID}:{rec.Revision}" for rec in records)
+        _expires = now + TERMS_TTL
+
+    return _digest
+
+
+def has_unaccepted(user_id: int) -> bool:
+    """
+    Query the database for Terms `user_id` has not accepted at their
+    current revision.
+
+    :param user_id: User.ID
+    :return: Boolean indicating outstanding Terms
+    """
+    accepted = (
+        db.query(AcceptedTerm)
+        .join(Term, Term.ID == AcceptedTerm.TermsID)
+        .filter(AcceptedTerm.UsersID == user_id)
+        .filter(AcceptedTerm.Revision >= Term.Revision)
+    ).count()
+    return db.query(Term).count() > accepted
+
+
+def needs_acceptance(session: dict, user_id: int) -> bool:
+    """
+    Determine whether `user_id` has outstanding Terms to accept.
+
+    In the common case, this costs a comparison against the marker
+    stored in `session`. The database is only consulted when the Terms
+    digest has changed since the marker was stored.
+
+    :param session: Starlette session dictionary
+    :param user_id: User.ID
+    :return: Boolean indicating outstanding Terms
+    """
+    current = digest()
+    if not current:
+        return False
+
+    marker = f"{user_id}/{current}"
+    if session.get(SESSION_KEY) == marker:
+        return False
+
+    if has_unaccepted(user_id):
+        return True
+
+    session[SESSION_KEY] = marker
+    return False
+
+
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(Term, _event, invalidate)
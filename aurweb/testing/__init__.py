@@ -48,6 +48,7 @@ def setup_test_db(*args):
             models.PackageVote.__tablename__,
             models.Session.__tablename__,
             models.SSHPubKey.__tablename__,
+            models.Statistic.__tablename__,
             models.Term.__tablename__,
             models.TUVote.__tablename__,
             models.TUVoteInfo.__tablename__,
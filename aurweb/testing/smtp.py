@@ -1,4 +1,7 @@
-""" Fake SMTP clients that can be used for testing. """
+""" Fake SMTP clients and servers that can be used for testing. """
+import socketserver
+import threading
+import time
 
 
 class FakeSMTP:
@@ -41,3 +44,87 @@ class FakeSMTP_SSL(FakeSMTP):
     """A fake version of smtplib.SMTP_SSL used for testing."""
 
     use_ssl = True
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP to accept messages from smtplib."""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+
+        # Stands in for the cost of setting up a real connection.
+        time.sleep(sink.connect_delay)
+        self.reply("220 localhost SMTP sink")
+
+        count = 0
+        sender, recipients = None, []
+        while line := self.rfile.readline():
+            verb, _, arg = line.decode().rstrip("\r\n").partition(" ")
+            verb = verb.upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                if sink.max_messages and count >= sink.max_messages:
+                    self.reply("421 Too many messages")
+                    return
+                sender, recipients = arg, []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(arg)
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b"".join(iter(self.rfile.readline, b".\r\n"))
+                with sink.lock:
+                    sink.messages.append((sender, recipients, data))
+                count += 1
+                self.reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSink:
+    """A local SMTP server which keeps every message it is sent.
+
+    Unlike FakeSMTP, this lets smtplib talk to a real server, so that
+    connection handling and throughput can be tested.
+
+    :param max_messages: Messages accepted per connection before the
+                         sink closes it with a 421 reply
+    :param connect_delay: Seconds each new connection is delayed by
+    """
+
+    def __init__(self, max_messages: int = 0, connect_delay: float = 0.0):
+        self.max_messages = max_messages
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+
+        self._server = socketserver.ThreadingTCPServer(
+            ("127.0.0.1", 0), SMTPSinkHandler
+        )
+        self._server.daemon_threads = True
+        self._server.sink = self
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def __enter__(self) -> "SMTPSink":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,96 @@
+"""
+Keep aurweb-git-auth's key index (see aurweb.git.keyindex) in sync
+with the database.
+
+watch() is registered on aurweb's session. Whenever a committed
+transaction changed an SSH public key, or one of the User columns the
+index depends on, the index is rebuilt. Rebuilds are serialized with a
+lock next to the index, so that a rebuild never replaces the index
+with an older state of the database than the one it replaced.
+"""
+import fcntl
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from aurweb import logging, schema
+from aurweb.git import keyindex
+
+logger = logging.get_logger(__name__)
+
+# User columns the index depends on.
+USER_COLUMNS = {"Username", "Suspended", "Passwd", "AccountTypeID"}
+
+
+def rebuild(conn: Connection) -> None:
+    """Rebuild the index from the database, if it is enabled."""
+    index = keyindex.path()
+    if index is None:
+        return
+
+    keys, users = schema.SSHPubKeys, schema.Users
+    query = (
+        select(keys.c.PubKey, users.c.Username, users.c.AccountTypeID)
+        .select_from(keys.join(users))
+        .where(users.c.Suspended == 0, users.c.Passwd != "")
+    )
+
+    with open(f"{index}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        entries = []
+        for pubkey, username, account_type_id in conn.execute(query):
+            keytype, _, keytext = pubkey.partition(" ")
+            entries.append((keytype, keytext, username, account_type_id > 1))
+        keyindex.write(index, entries)
+
+
+def _table(instance) -> object:
+    return getattr(instance, "__table__", None)
+
+
+def _affects_index(session: Session) -> bool:
+    for instance in session.deleted:
+        if _table(instance) in (schema.SSHPubKeys, schema.Users):
+            return True
+
+    for instance in session.new:
+        if _table(instance) is schema.SSHPubKeys:
+            return True
+
+    for instance in session.dirty:
+        if _table(instance) is schema.SSHPubKeys:
+            return True
+        if _table(instance) is schema.Users:
+            attrs = inspect(instance).attrs
+            if any(attrs[name].history.has_changes() for name in USER_COLUMNS):
+                return True
+
+    return False
+
+
+def watch(session: Session) -> None:
+    """Rebuild the index after `session` commits changes to it."""
+
+    @event.listens_for(session, "after_flush")
+    def after_flush(session: Session, flush_context) -> None:
+        if _affects_index(session):
+            session.info["rebuild_keys_index"] = True
+
+    @event.listens_for(session, "after_commit")
+    def after_commit(session: Session) -> None:
+        if not session.info.pop("rebuild_keys_index", False):
+            return
+
+        # The session can't emit SQL here; use a connection of its own.
+        # The transaction has been committed either way, so failures
+        # are only logged; the next rebuild picks the change up.
+        try:
+            with session.get_bind().connect() as conn:
+                rebuild(conn)
+        except Exception:
+            logger.exception("Failed to rebuild the SSH key index.")
+
+    @event.listens_for(session, "after_rollback")
+    def after_rollback(session: Session) -> None:
+        session.info.pop("rebuild_keys_index", None)
@@ -20,6 +20,7 @@ def simple(
     CN: bool = False,
     UN: bool = False,
     ON: bool = False,
+    DN: bool = False,
     S: bool = False,
     user: models.User = None,
     **kwargs,
@@ -39,6 +40,7 @@ def simple(
         user.CommentNotify = strtobool(CN)
         user.UpdateNotify = strtobool(UN)
         user.OwnershipNotify = strtobool(ON)
+        user.DigestNotify = strtobool(DN)
 
 
 def language(
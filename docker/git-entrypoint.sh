@@ -26,6 +26,10 @@ EOF
 # Make sure the Git directory is writable by the 'mpr' user.
 chown mpr /aurweb/aur.git -R
 
+# Build the SSH key index, when enabled. Until it exists,
+# aurweb-git-auth looks keys up in the database.
+aurweb-keyindex || true
+
 # Setup SSH Keys.
 ssh-keygen -A
 
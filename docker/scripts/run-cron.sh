@@ -5,7 +5,9 @@ cd /aurweb
 aurweb-mkpkglists --extended
 aurweb-pkgmaint
 aurweb-usermaint
-aurweb-popupdate
+aurweb-popupdate --full
+aurweb-statsupdate
+aurweb-pullflush
 aurweb-tuvotereminder
 aurweb-oodcheck
 
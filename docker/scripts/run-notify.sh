@@ -0,0 +1,3 @@
+#!/bin/bash
+cd /aurweb
+exec aurweb-notifyd
@@ -0,0 +1,32 @@
+"""Add commit counts to package bases
+
+Revision ID: 4a4ea7f8bd1c
+Revises: 237e8c21b8ba
+Create Date: 2026-10-19 02:58:10.113482
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "4a4ea7f8bd1c"
+down_revision = "237e8c21b8ba"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "PackageBases",
+        sa.Column(
+            "NumCommits",
+            mysql.BIGINT(unsigned=True),
+            nullable=False,
+            server_default=sa.text("0"),
+        ),
+    )
+
+
+def downgrade():
+    op.drop_column("PackageBases", "NumCommits")
@@ -0,0 +1,49 @@
+"""Add incremental popularity to package bases
+
+Revision ID: 5e8a3f21c6d4
+Revises: 9b2e4c7a1d35
+Create Date: 2026-10-19 09:12:47.118204
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "5e8a3f21c6d4"
+down_revision = "9b2e4c7a1d35"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "PackageBases",
+        sa.Column(
+            "PopularityScore",
+            mysql.DOUBLE(),
+            nullable=False,
+            server_default=sa.text("0"),
+        ),
+    )
+    op.add_column(
+        "PackageBases",
+        sa.Column(
+            "PopularityTS",
+            mysql.BIGINT(unsigned=True),
+            nullable=False,
+            server_default=sa.text("0"),
+        ),
+    )
+
+    # Popularity was recalculated by aurweb-popupdate minutes ago at
+    # most; aurweb-popupdate --full makes the scores exact again.
+    op.execute(
+        "UPDATE PackageBases "
+        "SET PopularityScore = Popularity, PopularityTS = UNIX_TIMESTAMP()"
+    )
+
+
+def downgrade():
+    op.drop_column("PackageBases", "PopularityTS")
+    op.drop_column("PackageBases", "PopularityScore")
@@ -0,0 +1,32 @@
+"""Add notification digests to users
+
+Revision ID: 9b2e4c7a1d35
+Revises: c3f1d4a2b8e7
+Create Date: 2026-10-19 03:41:12.503318
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "9b2e4c7a1d35"
+down_revision = "c3f1d4a2b8e7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "Users",
+        sa.Column(
+            "DigestNotify",
+            mysql.TINYINT(display_width=1),
+            nullable=False,
+            server_default=sa.text("0"),
+        ),
+    )
+
+
+def downgrade():
+    op.drop_column("Users", "DigestNotify")
@@ -0,0 +1,32 @@
+"""Add Statistics table
+
+Revision ID: c3f1d4a2b8e7
+Revises: 4a4ea7f8bd1c
+Create Date: 2026-10-19 03:24:41.905127
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = "c3f1d4a2b8e7"
+down_revision = "4a4ea7f8bd1c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "Statistics",
+        sa.Column("Name", sa.String(length=64), nullable=False),
+        sa.Column("Value", mysql.BIGINT(unsigned=True), nullable=False),
+        sa.PrimaryKeyConstraint("Name"),
+        mysql_charset="utf8mb4",
+        mysql_collate="utf8mb4_general_ci",
+        mysql_engine="InnoDB",
+    )
+
+
+def downgrade():
+    op.drop_table("Statistics")
@@ -21,10 +21,13 @@ from aurweb.models.account_type import (
     AccountType,
 )
 from aurweb.models.ban import Ban
+from aurweb.models.package_base import PackageBase
+from aurweb.models.package_vote import PackageVote
 from aurweb.models.session import Session
 from aurweb.models.ssh_pub_key import SSHPubKey, get_fingerprint
 from aurweb.models.term import Term
 from aurweb.models.user import User
+from aurweb.scripts import popupdate
 from aurweb.testing.requests import Request
 
 logger = logging.get_logger(__name__)
@@ -1247,3 +1250,24 @@ def test_accounts_unauthorized(client: TestClient, user: User):
         resp = request.get("/accounts", cookies=cookies, allow_redirects=False)
     assert resp.status_code == int(HTTPStatus.SEE_OTHER)
     assert resp.headers.get("location") == "/"
+
+
+def test_account_delete_removes_votes(client: TestClient, user: User):
+    now = time.utcnow()
+    with db.begin():
+        voter = create_user("voter")
+        pkgbase = create(PackageBase, Name="pkg", SubmittedTS=now, ModifiedTS=now)
+        for u in (user, voter):
+            create(PackageVote, User=u, PackageBase=pkgbase, VoteTS=now)
+    popupdate.run_single(pkgbase)
+    assert pkgbase.NumVotes == 2
+
+    cookies = {"AURSID": voter.login(Request(), "testPassword")}
+    data = {"passwd": "testPassword", "confirm": True}
+    with client as request:
+        resp = request.post("/account/voter/delete", data=data, cookies=cookies)
+    assert resp.status_code == int(HTTPStatus.SEE_OTHER)
+
+    db.refresh(pkgbase)
+    assert pkgbase.NumVotes == 1
+    assert float(pkgbase.Popularity) == pytest.approx(1.0, abs=1e-4)
@@ -0,0 +1,104 @@
+from http import HTTPStatus
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aurweb import asgi, db, time
+from aurweb.models import PackageBase, PackageComment, User
+from aurweb.models.account_type import USER_ID
+from aurweb.routers import api
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    return
+
+
+@pytest.fixture
+def client() -> TestClient:
+    yield TestClient(app=asgi.app)
+
+
+@pytest.fixture
+def user() -> User:
+    with db.begin():
+        user = db.create(
+            User,
+            Username="test",
+            Email="test@makedeb.org",
+            Passwd="testPassword",
+            AccountTypeID=USER_ID,
+        )
+    yield user
+
+
+@pytest.fixture
+def comments(user: User) -> list:
+    now = time.utcnow()
+    with db.begin():
+        pkgbase = db.create(PackageBase, Name="pkg", SubmittedTS=now, ModifiedTS=now)
+        comments = [
+            db.create(
+                PackageComment,
+                User=user,
+                PackageBase=pkgbase,
+                Comments=f"Comment {i}",
+                RenderedComment=f"<p>Comment {i}</p>",
+                CommentTS=now - 10 + i,
+            )
+            for i in range(10)
+        ]
+    yield comments
+
+
+def list_comments(client: TestClient, **params) -> list:
+    with client as request:
+        resp = request.get("/api/list-comments/pkg", params=params)
+    assert resp.status_code == int(HTTPStatus.OK)
+    assert resp.headers["Content-Type"] == "application/json"
+    return resp.json()
+
+
+def test_list_comments(client: TestClient, comments: list):
+    data = list_comments(client)
+    assert [c["msg"] for c in data] == [f"Comment {i}" for i in range(10)]
+    assert data[0] == {
+        "id": comments[0].ID,
+        "date": comments[0].CommentTS,
+        "msg": "Comment 0",
+        "msg_rendered": "<p>Comment 0</p>",
+        "user": "test",
+    }
+
+
+def test_list_comments_empty(client: TestClient, comments: list):
+    assert list_comments(client, after=comments[-1].ID) == []
+
+
+def test_list_comments_pages(client: TestClient, comments: list):
+    # Follow the cursor through the comments, three at a time.
+    pages, after = [], 0
+    while data := list_comments(client, after=after, limit=3):
+        pages.append([c["msg"] for c in data])
+        after = data[-1]["id"]
+
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    assert sum(pages, []) == [f"Comment {i}" for i in range(10)]
+
+
+def test_list_comments_limit_capped(client: TestClient, comments: list):
+    with mock.patch.object(api, "MAX_COMMENTS", 4):
+        assert len(list_comments(client, limit=100)) == 4
+        assert len(list_comments(client)) == 4
+
+
+def test_list_comments_since(client: TestClient, comments: list):
+    data = list_comments(client, since=comments[7].CommentTS)
+    assert [c["msg"] for c in data] == ["Comment 7", "Comment 8", "Comment 9"]
+
+
+def test_list_comments_deleted_user(client: TestClient, user: User, comments: list):
+    with db.begin():
+        db.delete(user)
+    assert {c["user"] for c in list_comments(client)} == {None}
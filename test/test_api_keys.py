@@ -0,0 +1,87 @@
+from unittest import mock
+
+import pytest
+
+from aurweb import db, time
+from aurweb.auth import api_keys
+from aurweb.models.account_type import USER_ID
+from aurweb.models.api_key import ApiKey
+from aurweb.models.user import User
+from aurweb.redis import redis_connection
+
+API_KEY = "test-api-key"
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    redis_connection().delete(api_keys._cache_key(api_keys.hash_api_key(API_KEY)))
+    return
+
+
+@pytest.fixture
+def user() -> User:
+    with db.begin():
+        user = db.create(
+            User,
+            Username="test",
+            Email="test@makedeb.org",
+            Passwd="testPassword",
+            AccountTypeID=USER_ID,
+        )
+    yield user
+
+
+def create_api_key(user: User, expire_ts: int = None) -> ApiKey:
+    with db.begin():
+        api_key = db.create(
+            ApiKey,
+            UserID=user.ID,
+            KeyHash=api_keys.hash_api_key(API_KEY),
+            ExpireTS=expire_ts,
+        )
+    return api_key
+
+
+def test_get_user_invalid_key(user: User):
+    assert api_keys.get_user(API_KEY) is None
+
+
+def test_get_user_cached(user: User):
+    create_api_key(user)
+    assert api_keys.get_user(API_KEY) == user
+
+    cache_key = api_keys._cache_key(api_keys.hash_api_key(API_KEY))
+    redis = redis_connection()
+    assert int(redis.get(cache_key)) == user.ID
+    assert 0 < redis.ttl(cache_key) <= api_keys.API_KEY_TTL
+
+    # Cached principals are resolved without querying ApiKeys.
+    with mock.patch("aurweb.db.query") as query:
+        assert api_keys.get_user(API_KEY) == user
+    query.assert_not_called()
+
+
+def test_get_user_expire_ts(user: User):
+    create_api_key(user, expire_ts=time.utcnow() + 10)
+    assert api_keys.get_user(API_KEY) == user
+
+    # The cache never outlives the key.
+    cache_key = api_keys._cache_key(api_keys.hash_api_key(API_KEY))
+    assert redis_connection().ttl(cache_key) <= 10
+
+
+def test_get_user_expired(user: User):
+    create_api_key(user, expire_ts=time.utcnow() - 1)
+    assert api_keys.get_user(API_KEY) is None
+
+
+def test_invalidate(user: User):
+    api_key = create_api_key(user)
+    assert api_keys.get_user(API_KEY) == user
+
+    key_hash = api_key.KeyHash
+    with db.begin():
+        db.delete(api_key)
+    api_keys.invalidate(key_hash)
+
+    assert api_keys.get_user(API_KEY) is None
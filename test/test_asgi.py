@@ -73,3 +73,17 @@ def test_internal_server_error(setup: None, caplog: pytest.LogCaptureFixture):
         with TestClient(app=aurweb.asgi.app) as request:
             resp = request.get("/internal_server_error")
     assert resp.status_code == int(http.HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+def test_runtime_error(setup: None):
+    @aurweb.asgi.app.get("/runtime_error")
+    async def runtime_error(request: fastapi.Request):
+        raise RuntimeError("test runtime error")
+
+    with TestClient(app=aurweb.asgi.app) as request:
+        resp = request.get("/runtime_error")
+    assert resp.status_code == int(http.HTTPStatus.INTERNAL_SERVER_ERROR)
+    assert resp.json() == {"error": "test runtime error"}
+
+    # Security headers are added to error responses as well.
+    assert resp.headers.get("X-Frame-Options") == "SAMEORIGIN"
@@ -0,0 +1,53 @@
+from typing import List
+from unittest import mock
+
+import pygit2
+import pytest
+
+from aurweb import db, time
+from aurweb.models import PackageBase
+from aurweb.scripts import commitcount
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    return
+
+
+@pytest.fixture
+def pkgbases() -> List[PackageBase]:
+    now = time.utcnow()
+    with db.begin():
+        output = [
+            db.create(PackageBase, Name=f"pkg_{i}", SubmittedTS=now, ModifiedTS=now)
+            for i in range(3)
+        ]
+    yield output
+
+
+def make_commits(path: str, count: int) -> None:
+    repo = pygit2.init_repository(path, bare=True)
+    signature = pygit2.Signature("Foo Bar", "test@example.com")
+    tree = repo.TreeBuilder().write()
+
+    parents = []
+    for i in range(count):
+        commit = repo.create_commit(
+            "refs/heads/master", signature, signature, f"Commit {i}", tree, parents
+        )
+        parents = [commit]
+
+
+def test_commitcount(tmp_path, pkgbases: List[PackageBase]):
+    # pkg_0 has two commits, pkg_1 has an empty repository and pkg_2 has
+    # no repository at all.
+    make_commits(str(tmp_path / "pkg_0"), 2)
+    pygit2.init_repository(str(tmp_path / "pkg_1"), bare=True)
+
+    with db.begin():
+        pkgbases[1].NumCommits = 5
+
+    with mock.patch("aurweb.config.git_repo_path", str(tmp_path)):
+        commitcount.main()
+
+    assert [pkgbase.NumCommits for pkgbase in pkgbases] == [2, 0, 0]
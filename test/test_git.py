@@ -160,6 +160,7 @@ def test_basic_push():
         .first()
     )
     assert pkgbase is not None
+    assert pkgbase.NumCommits == 1
 
     pkgname = (
         db.query(models.Package)
@@ -0,0 +1,79 @@
+import base64
+from unittest import mock
+
+import pytest
+
+from aurweb import db
+from aurweb.git import auth, keyindex
+from aurweb.models import SSHPubKey, User
+from aurweb.models.account_type import TRUSTED_USER_ID, USER_ID
+
+KEYTEXT = base64.b64encode(
+    b"\x00\x00\x00\x0bssh-ed25519\x00\x00\x00\x20" + bytes(range(32))
+).decode()
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    return
+
+
+def create_user(account_type_id: int = USER_ID, suspended: bool = False) -> User:
+    with db.begin():
+        user = db.create(
+            User,
+            Username="test",
+            Email="test@makedeb.org",
+            Passwd="testPassword",
+            AccountTypeID=account_type_id,
+            Suspended=suspended,
+        )
+        db.create(
+            SSHPubKey,
+            User=user,
+            Fingerprint="testFingerprint",
+            PubKey=f"ssh-ed25519 {KEYTEXT}",
+        )
+    return user
+
+
+def run_auth(keytext: str = KEYTEXT):
+    with mock.patch("sys.argv", ["aurweb-git-auth", "ssh-ed25519", keytext]):
+        auth.main()
+
+
+def test_auth(capsys):
+    create_user()
+    run_auth()
+
+    line = capsys.readouterr().out
+    assert line.startswith('command="AUR_USER=test AUR_PRIVILEGED=0 ')
+    assert line.rstrip().endswith(f"restrict ssh-ed25519 {KEYTEXT}")
+
+
+def test_auth_privileged(capsys):
+    create_user(account_type_id=TRUSTED_USER_ID)
+    run_auth()
+    assert "AUR_PRIVILEGED=1" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("suspended,keytext", [(True, KEYTEXT), (False, "unknown")])
+def test_auth_rejected(suspended: bool, keytext: str):
+    create_user(suspended=suspended)
+    with pytest.raises(SystemExit):
+        run_auth(keytext)
+
+
+def test_auth_keys_index(capsys, tmp_path):
+    index = str(tmp_path / "keys-index")
+    keyindex.write(index, [("ssh-ed25519", KEYTEXT, "indexed", True)])
+
+    # Keys are looked up in the index, when there is one.
+    with mock.patch("aurweb.git.keyindex.path", return_value=index):
+        with mock.patch("aurweb.git.auth.lookup_db") as lookup_db:
+            run_auth()
+            with pytest.raises(SystemExit):
+                run_auth("unknown")
+    lookup_db.assert_not_called()
+
+    assert "AUR_USER=indexed AUR_PRIVILEGED=1 " in capsys.readouterr().out
@@ -0,0 +1,95 @@
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aurweb import asgi, db, pulls, time
+from aurweb.models import PackageBase
+from aurweb.redis import redis_connection
+from aurweb.routers import pkgbase as pkgbase_router
+
+
+class Upstream(BaseHTTPRequestHandler):
+    """A Smartgit stand-in which echoes POST bodies back in chunks and
+    answers GET requests with their path and query."""
+
+    def do_GET(self):
+        body = self.path.encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-git-upload-pack-advertisement")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(HTTPStatus.ACCEPTED)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(body), 4096):
+            chunk = body[i : i + 4096]
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    redis_connection().delete(pulls.REDIS_KEY, pulls.FLUSH_KEY)
+    return
+
+
+@pytest.fixture
+def upstream() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    with mock.patch.object(pkgbase_router, "CLONE_UPSTREAM", url):
+        yield url
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client() -> TestClient:
+    yield TestClient(app=asgi.app)
+
+
+@pytest.fixture
+def pkgbase() -> PackageBase:
+    now = time.utcnow()
+    with db.begin():
+        pkgbase = db.create(PackageBase, Name="pkg", SubmittedTS=now, ModifiedTS=now)
+    yield pkgbase
+
+
+def test_clone_info_refs(client: TestClient, upstream: str, pkgbase: PackageBase):
+    with client as request:
+        resp = request.get("/pkg.git/info/refs", params={"service": "git-upload-pack"})
+
+    assert resp.status_code == int(HTTPStatus.OK)
+    assert resp.text == "/pkg.git/info/refs?service=git-upload-pack"
+    assert resp.headers["Content-Type"] == "application/x-git-upload-pack-advertisement"
+
+    # The pull is counted in Redis until the next flush.
+    assert pkgbase.NumGitPulls == 0
+    assert pulls.pending(pkgbase.ID) == 1
+
+
+def test_clone_upload_pack_streamed(client: TestClient, upstream: str):
+    # Bodies larger than a chunk are streamed through both ways, and the
+    # upstream status is passed on.
+    body = bytes(range(256)) * 1024
+    with client as request:
+        resp = request.post("/pkg.git/git-upload-pack", data=body)
+
+    assert resp.status_code == int(HTTPStatus.ACCEPTED)
+    assert resp.content == body
@@ -0,0 +1,108 @@
+from datetime import datetime
+from unittest import mock
+
+import pytest
+
+from aurweb import db, exceptions, time
+from aurweb.git import serve
+from aurweb.models import Ban, PackageBase, PackageComaintainer, User
+from aurweb.models.account_type import USER_ID
+
+REMOTE_ADDR = "127.0.0.1"
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    return
+
+
+def create_user(username: str) -> User:
+    with db.begin():
+        user = db.create(
+            User,
+            Username=username,
+            Email=f"{username}@makedeb.org",
+            Passwd="testPassword",
+            AccountTypeID=USER_ID,
+        )
+    return user
+
+
+@pytest.fixture
+def user() -> User:
+    yield create_user("test")
+
+
+@pytest.fixture
+def pkgbase(user: User) -> PackageBase:
+    now = time.utcnow()
+    with db.begin():
+        pkgbase = db.create(
+            PackageBase,
+            Name="pkg",
+            Maintainer=user,
+            SubmittedTS=now,
+            ModifiedTS=now,
+        )
+    yield pkgbase
+
+
+def ban():
+    with db.begin():
+        db.create(Ban, IPAddress=REMOTE_ADDR, BanTS=datetime.utcnow())
+
+
+def test_lookup_access(user: User, pkgbase: PackageBase):
+    access = serve.lookup_access(REMOTE_ADDR, user.Username, "pkg")
+    assert (access.banned, access.pkgbase_id, access.can_write) == (
+        False,
+        pkgbase.ID,
+        True,
+    )
+
+    # Users who don't maintain the package base can't write to it,
+    # unless they co-maintain it.
+    other = create_user("other")
+    assert not serve.lookup_access(REMOTE_ADDR, other.Username, "pkg").can_write
+
+    with db.begin():
+        db.create(PackageComaintainer, PackageBase=pkgbase, User=other, Priority=1)
+    assert serve.lookup_access(REMOTE_ADDR, other.Username, "pkg").can_write
+
+    # Package bases that don't exist.
+    access = serve.lookup_access(REMOTE_ADDR, user.Username, "missing")
+    assert access.pkgbase_id is None
+    assert not access.can_write
+
+    ban()
+    assert serve.lookup_access(REMOTE_ADDR, user.Username).banned
+
+
+def test_serve_banned(user: User):
+    ban()
+    with pytest.raises(exceptions.BannedException):
+        serve.serve(
+            "git-upload-pack", ["git-upload-pack", "pkg"], "test", False, REMOTE_ADDR
+        )
+
+    # Banned logins are not logged.
+    db.refresh(user)
+    assert user.LastSSHLogin == 0
+
+
+def test_serve_permission_denied(user: User, pkgbase: PackageBase):
+    create_user("other")
+    with pytest.raises(exceptions.PermissionDeniedException):
+        serve.serve(
+            "git", ["git", "receive-pack", "/pkg.git"], "other", False, REMOTE_ADDR
+        )
+
+
+def test_serve_logs_login(user: User):
+    with mock.patch("time.time", return_value=1234):
+        with pytest.raises(exceptions.InvalidArgumentsException):
+            serve.serve("help", ["help"], "test", False, REMOTE_ADDR)
+
+    db.refresh(user)
+    assert user.LastSSHLogin == 1234
+    assert user.LastSSHLoginIPAddress == REMOTE_ADDR
@@ -0,0 +1,277 @@
+from unittest import mock
+
+import pygit2
+import pytest
+from makedeb_srcinfo import SrcinfoParser
+from sqlalchemy import event
+
+from aurweb import db, time
+from aurweb.git.update import lint_srcinfo, read_object_headers, save_metadata
+from aurweb.models import (
+    License,
+    Package,
+    PackageBase,
+    PackageDependency,
+    PackageLicense,
+    PackageRelation,
+    PackageSource,
+    User,
+)
+from aurweb.models.account_type import USER_ID
+from aurweb.models.dependency_type import DEPENDS_ID, MAKEDEPENDS_ID
+from aurweb.models.relation_type import PROVIDES_ID
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    return
+
+
+@pytest.fixture
+def user() -> User:
+    with db.begin():
+        user = db.create(
+            User,
+            Username="test",
+            Email="test@makedeb.org",
+            Passwd="testPassword",
+            AccountTypeID=USER_ID,
+        )
+    yield user
+
+
+@pytest.fixture
+def pkgbase(user: User) -> PackageBase:
+    now = time.utcnow()
+    with db.begin():
+        pkgbase = db.create(
+            PackageBase,
+            Name="testpkg",
+            Maintainer=user,
+            SubmittedTS=now,
+            ModifiedTS=now,
+        )
+    yield pkgbase
+
+
+def make_srcinfo(version: str, *lines: str) -> SrcinfoParser:
+    return SrcinfoParser(
+        "\n".join(
+            [
+                "pkgbase = testpkg",
+                "pkgname = testpkg",
+                "pkgname = testpkg-extra",
+                f"pkgver = {version}",
+                "pkgrel = 1",
+                "pkgdesc = Test package",
+                "arch = any",
+                *lines,
+            ]
+        )
+    )
+
+
+def test_save_metadata(user: User, pkgbase: PackageBase):
+    srcinfo = make_srcinfo(
+        "1",
+        "license = MIT",
+        "license = MIT",
+        "license = GPL3",
+        "depends = dep1>=1.0: needed",
+        "focal_makedepends = dep2",
+        "provides = rel1",
+        "source = https://example.com/source",
+    )
+    save_metadata(srcinfo, user)
+
+    packages = db.query(Package).filter(Package.PackageBaseID == pkgbase.ID).all()
+    assert {pkg.Name for pkg in packages} == {"testpkg", "testpkg-extra"}
+    assert {pkg.Version for pkg in packages} == {"1-1"}
+
+    for pkg in packages:
+        deps = pkg.package_dependencies.order_by(PackageDependency.DepTypeID).all()
+        assert [(d.DepTypeID, d.DepName) for d in deps] == [
+            (DEPENDS_ID, "dep1"),
+            (MAKEDEPENDS_ID, "dep2"),
+        ]
+        assert deps[0].DepCondition == ">=1.0"
+        assert deps[0].DepDesc == "needed"
+        assert deps[1].DepDist == "focal"
+
+        rels = pkg.package_relations.all()
+        assert [(r.RelTypeID, r.RelName) for r in rels] == [(PROVIDES_ID, "rel1")]
+
+        sources = db.query(PackageSource).filter(PackageSource.PackageID == pkg.ID)
+        assert [s.Source for s in sources] == ["https://example.com/source"]
+
+        licenses = pkg.package_licenses.all()
+        assert sorted(lic.License.Name for lic in licenses) == ["GPL3", "MIT"]
+
+    # Licenses are shared between packages.
+    assert db.query(License).count() == 2
+
+
+def test_save_metadata_replaces(user: User, pkgbase: PackageBase):
+    save_metadata(make_srcinfo("1", "license = MIT", "depends = dep1"), user)
+    save_metadata(make_srcinfo("2", "license = MIT", "conflicts = rel1"), user)
+
+    assert db.query(Package).count() == 2
+    assert {pkg.Version for pkg in db.query(Package)} == {"2-1"}
+    assert db.query(PackageDependency).count() == 0
+    assert db.query(PackageRelation).count() == 2
+    assert db.query(PackageLicense).count() == 2
+    assert db.query(License).count() == 1
+
+
+def test_save_metadata_license_case(user: User, pkgbase: PackageBase):
+    save_metadata(make_srcinfo("1", "license = MIT"), user)
+
+    # Licenses differing only in case are the same license.
+    save_metadata(make_srcinfo("2", "license = mit", "license = Mit"), user)
+    assert [lic.Name for lic in db.query(License)] == ["MIT"]
+    assert db.query(PackageLicense).count() == 2
+    assert {pkg.Version for pkg in db.query(Package)} == {"2-1"}
+
+
+def test_save_metadata_atomic(user: User, pkgbase: PackageBase):
+    save_metadata(make_srcinfo("1", "depends = dep1"), user)
+
+    # A failure part way through leaves the previous metadata in place.
+    with mock.patch(
+        "aurweb.git.update.get_license_ids", side_effect=RuntimeError("error")
+    ):
+        with pytest.raises(RuntimeError):
+            save_metadata(make_srcinfo("2", "depends = dep2"), user)
+
+    assert {pkg.Version for pkg in db.query(Package)} == {"1-1"}
+    assert {dep.DepName for dep in db.query(PackageDependency)} == {"dep1"}
+
+
+def test_save_metadata_keeps_package_ids(user: User, pkgbase: PackageBase):
+    save_metadata(make_srcinfo("1", "depends = dep1", "depends = dep2"), user)
+    ids = {pkg.Name: pkg.ID for pkg in db.query(Package)}
+    dep_ids = {(d.PackageID, d.DepName) for d in db.query(PackageDependency)}
+
+    save_metadata(make_srcinfo("2", "depends = dep1", "depends = dep3"), user)
+    assert {pkg.Name: pkg.ID for pkg in db.query(Package)} == ids
+    assert {pkg.Version for pkg in db.query(Package)} == {"2-1"}
+    assert {(d.PackageID, d.DepName) for d in db.query(PackageDependency)} == {
+        (package_id, name) for package_id, _ in dep_ids for name in ("dep1", "dep3")
+    }
+
+
+def test_save_metadata_unchanged(user: User, pkgbase: PackageBase):
+    srcinfo = make_srcinfo("1", "license = MIT", "depends = dep1")
+    save_metadata(srcinfo, user)
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.split()[0].upper())
+
+    # Nothing but the package base is written when metadata is unchanged.
+    engine = db.get_engine()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        save_metadata(srcinfo, user)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert "INSERT" not in statements
+    assert "DELETE" not in statements
+    assert statements.count("UPDATE") <= 1
+
+
+def test_save_metadata_case(user: User, pkgbase: PackageBase):
+    save_metadata(
+        make_srcinfo(
+            "1",
+            "depends = python-Foo",
+            "depends = python-foo",
+            "source = Foo.patch",
+            "source = foo.patch",
+        ),
+        user,
+    )
+
+    # Dropping a row doesn't drop the one differing from it only in case.
+    save_metadata(make_srcinfo("2", "depends = python-Foo", "source = Foo.patch"), user)
+    for pkg in db.query(Package):
+        deps = pkg.package_dependencies.all()
+        assert [d.DepName for d in deps] == ["python-Foo"]
+        sources = db.query(PackageSource).filter(PackageSource.PackageID == pkg.ID)
+        assert [s.Source for s in sources] == ["Foo.patch"]
+
+
+def test_save_metadata_removed_pkgname(user: User, pkgbase: PackageBase):
+    save_metadata(make_srcinfo("1", "depends = dep1"), user)
+    srcinfo = SrcinfoParser(
+        "\n".join(
+            [
+                "pkgbase = testpkg",
+                "pkgname = testpkg",
+                "pkgver = 1",
+                "pkgrel = 1",
+                "pkgdesc = Test package",
+                "arch = any",
+                "depends = dep1",
+            ]
+        )
+    )
+    save_metadata(srcinfo, user)
+
+    assert [pkg.Name for pkg in db.query(Package)] == ["testpkg"]
+    assert db.query(PackageDependency).count() == 1
+
+
+def test_read_object_headers(tmp_path):
+    repo = pygit2.init_repository(str(tmp_path), bare=True)
+    blob = repo.create_blob(b"x" * 5000)
+    tree = repo.TreeBuilder().write()
+
+    headers = read_object_headers(repo, [blob.hex, tree.hex, "1" * 40])
+    assert headers == {blob.hex: ("blob", 5000), tree.hex: ("tree", 0)}
+
+
+def test_lint_srcinfo():
+    srcinfo, error, required_files = lint_srcinfo(
+        "\n".join(
+            [
+                "pkgbase = testpkg",
+                "pkgname = testpkg",
+                "pkgver = 1",
+                "pkgrel = 1",
+                "pkgdesc = Test package",
+                "arch = any",
+                "postinst = ./testpkg.postinst",
+                "source = testpkg.patch",
+                "source = https://example.com/source",
+            ]
+        )
+    )
+    assert error is None
+    assert srcinfo.get_variable("pkgbase")[0] == "testpkg"
+    assert required_files == [
+        ("postinst", "./testpkg.postinst", "testpkg.postinst"),
+        ("source", "testpkg.patch", "testpkg.patch"),
+    ]
+
+
+def test_lint_srcinfo_errors():
+    assert lint_srcinfo("pkgname = testpkg")[1] == (
+        "Couldn't find required 'pkgbase' variable."
+    )
+
+    error = lint_srcinfo(
+        "\n".join(
+            [
+                "pkgbase = testpkg",
+                "pkgname = TestPkg",
+                "pkgver = 1",
+                "pkgrel = 1",
+                "pkgdesc = Test package",
+                "arch = any",
+            ]
+        )
+    )[1]
+    assert error == "Invalid pkgname TestPkg."
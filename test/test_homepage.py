@@ -1,15 +1,17 @@
 from http import HTTPStatus
+from unittest import mock
 
 import pytest
 from fastapi.testclient import TestClient
 
-from aurweb import db, time
+from aurweb import db, homepage, time
 from aurweb.asgi import app
 from aurweb.models.account_type import USER_ID
 from aurweb.models.package import Package
 from aurweb.models.package_base import PackageBase
 from aurweb.models.user import User
 from aurweb.redis import redis_connection
+from aurweb.scripts import popupdate
 
 client = TestClient(app)
 
@@ -61,6 +63,8 @@ def redis():
             "year_old_updated",
             "never_updated",
             "package_updates",
+            homepage.UPDATES_KEY,
+            homepage.POPULAR_KEY,
         ):
             if redis.get(key) is not None:
                 redis.delete(key)
@@ -111,7 +115,44 @@ def packages(user):
     yield pkgs
 
 
-def test_homepage():
+def test_homepage(redis):
     with client as request:
         response = request.get("/")
     assert response.status_code == int(HTTPStatus.OK)
+
+
+def test_homepage_updates(redis, packages):
+    with client as request:
+        response = request.get("/")
+    assert response.status_code == int(HTTPStatus.OK)
+
+    # The ten most recently modified package bases are listed, newest first.
+    expected = [f"pkg_{i}" for i in range(49, 39, -1)]
+    assert [pkg["Name"] for pkg in homepage.package_updates()] == expected
+    assert "pkg_49" in response.text
+
+    # Cached until invalidated.
+    with db.begin():
+        packages[0].PackageBase.ModifiedTS = time.utcnow() + 100
+    assert homepage.package_updates()[0]["Name"] == "pkg_49"
+
+    homepage.invalidate_updates()
+    assert homepage.package_updates()[0]["Name"] == "pkg_0"
+
+
+def test_homepage_popular(redis, packages):
+    with db.begin():
+        packages[0].PackageBase.Popularity = 2.0
+        packages[1].PackageBase.Popularity = 1.0
+        packages[1].PackageBase.Maintainer = None
+
+    # Orphans are never recommended.
+    popular = [pkg["Name"] for pkg in homepage.popular_packages()]
+    assert popular[0] == "pkg_0"
+    assert "pkg_1" not in popular
+    assert len(popular) == 10
+
+    # Refreshed by popupdate, which recalculates popularity from votes.
+    with mock.patch("sys.argv", ["aurweb-popupdate", "--full"]):
+        popupdate.main()
+    assert homepage.popular_packages()[0]["Name"] != "pkg_0"
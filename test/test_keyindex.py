@@ -0,0 +1,88 @@
+import base64
+from unittest import mock
+
+import pytest
+
+from aurweb import db
+from aurweb.git import keyindex
+from aurweb.models import SSHPubKey, User
+from aurweb.models.account_type import TRUSTED_USER_ID, USER_ID
+
+KEYTEXT = base64.b64encode(
+    b"\x00\x00\x00\x0bssh-ed25519\x00\x00\x00\x20" + bytes(range(32))
+).decode()
+
+# SHA256 fingerprint of KEYTEXT, as printed by `ssh-keygen -l`.
+FINGERPRINT = "ZkAslGjFiUHdGf/WUL8rQvkib4PTvQatUV0OUQSncCA"
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    return
+
+
+@pytest.fixture
+def index(tmp_path) -> str:
+    path = str(tmp_path / "keys-index")
+    with mock.patch("aurweb.git.keyindex.path", return_value=path):
+        yield path
+
+
+@pytest.fixture
+def user(index: str) -> User:
+    with db.begin():
+        user = db.create(
+            User,
+            Username="test",
+            Email="test@makedeb.org",
+            Passwd="testPassword",
+            AccountTypeID=USER_ID,
+        )
+        db.create(
+            SSHPubKey,
+            User=user,
+            Fingerprint=FINGERPRINT,
+            PubKey=f"ssh-ed25519 {KEYTEXT}",
+        )
+    yield user
+
+
+def test_fingerprint():
+    assert keyindex.fingerprint(KEYTEXT) == FINGERPRINT
+    assert keyindex.fingerprint("not base64!") is None
+
+
+def test_write_lookup(tmp_path):
+    index = str(tmp_path / "keys-index")
+    keyindex.write(index, [("ssh-ed25519", KEYTEXT, "test", False)])
+
+    assert keyindex.lookup(index, "ssh-ed25519", KEYTEXT) == ("test", False)
+
+    # Keys only match along with their type.
+    assert keyindex.lookup(index, "ssh-rsa", KEYTEXT) is None
+    assert keyindex.lookup(index, "ssh-ed25519", KEYTEXT[:-8] + "AAAAAAA=") is None
+
+
+def test_rebuilt_on_key_changes(index: str, user: User):
+    assert keyindex.lookup(index, "ssh-ed25519", KEYTEXT) == ("test", False)
+
+    with db.begin():
+        db.delete(user.ssh_pub_key)
+    assert keyindex.lookup(index, "ssh-ed25519", KEYTEXT) is None
+
+
+def test_rebuilt_on_user_changes(index: str, user: User):
+    with db.begin():
+        user.AccountTypeID = TRUSTED_USER_ID
+    assert keyindex.lookup(index, "ssh-ed25519", KEYTEXT) == ("test", True)
+
+    with db.begin():
+        user.Suspended = True
+    assert keyindex.lookup(index, "ssh-ed25519", KEYTEXT) is None
+
+
+def test_not_rebuilt_on_other_changes(index: str, user: User):
+    with mock.patch("aurweb.users.ssh_keys.rebuild") as rebuild:
+        with db.begin():
+            user.LastLogin = 1234
+    rebuild.assert_not_called()
@@ -0,0 +1,194 @@
+import smtplib
+import time
+from unittest import mock
+
+import pytest
+
+from aurweb import mailqueue
+from aurweb.redis import redis_connection
+from aurweb.scripts import notifyd
+from aurweb.scripts.notify import Notification
+from aurweb.smtp import Mailer
+from aurweb.testing.smtp import SMTPSink
+
+
+class TestNotification(Notification):
+    __test__ = False
+
+    def __init__(self, recipients, subject="Subject", digest_recipients=()):
+        self._recipients = recipients
+        self._digest_recipients = list(digest_recipients)
+        self._subject = subject
+
+    def get_recipients(self):
+        return self._recipients
+
+    def get_digest_recipients(self):
+        return self._digest_recipients
+
+    def get_subject(self, lang):
+        return self._subject
+
+    def get_body(self, lang):
+        return f"Body in {lang}."
+
+
+@pytest.fixture(autouse=True)
+def setup():
+    keys = (
+        mailqueue.JOBS_KEY,
+        mailqueue.QUEUE_KEY,
+        mailqueue.CLAIMED_KEY,
+        mailqueue.PROGRESS_KEY,
+        mailqueue.ATTEMPTS_KEY,
+        mailqueue.DIGEST_EVENTS_KEY,
+        mailqueue.DIGEST_RECIPIENTS_KEY,
+        mailqueue.DIGEST_KEY_PREFIX + "en\tdigest@localhost",
+    )
+    redis_connection().delete(*keys)
+    yield
+    redis_connection().delete(*keys)
+
+
+@pytest.fixture
+def sink() -> SMTPSink:
+    with SMTPSink() as sink:
+
+        class SinkMailer(Mailer):
+            def __init__(self):
+                super().__init__()
+                self.server_addr, self.server_port = "127.0.0.1", sink.port
+
+        with mock.patch.object(notifyd, "Mailer", SinkMailer):
+            yield sink
+
+
+def test_dumps_loads():
+    notif = TestNotification([("user@localhost", "de")])
+    loaded = mailqueue.loads(mailqueue.dumps(notif))
+
+    assert isinstance(loaded, TestNotification)
+    assert loaded.get_recipients() == [["user@localhost", "de"]]
+    assert loaded.get_body_fmt("de") == notif.get_body_fmt("de")
+
+
+def test_loads_not_a_notification():
+    payload = '{"class": "aurweb.smtp:Mailer", "state": {}}'
+    with pytest.raises(TypeError):
+        mailqueue.loads(payload)
+
+
+def test_enqueue_deduplicates():
+    TestNotification([("a@localhost", "en")]).enqueue()
+    assert not mailqueue.enqueue(TestNotification([("a@localhost", "en")]))
+    TestNotification([("b@localhost", "en")]).enqueue()
+
+    assert mailqueue.size() == 2
+    jobs = mailqueue.claim(10)
+    assert len(jobs) == 2
+    assert mailqueue.claim(10) == []
+
+
+def test_worker_delivers(sink: SMTPSink):
+    recipients = [(f"user{i}@localhost", "en") for i in range(5)]
+    TestNotification(recipients).enqueue()
+    TestNotification(recipients, subject="Other").enqueue()
+
+    worker = notifyd.Worker()
+    for job_id in mailqueue.claim(10):
+        assert worker.deliver(job_id)
+    worker.close()
+
+    assert len(sink.messages) == 10
+    assert sink.connections == 1
+    assert mailqueue.size() == 0
+
+
+def test_worker_retries(sink: SMTPSink):
+    recipients = [(f"user{i}@localhost", "en") for i in range(3)]
+    TestNotification(recipients).enqueue()
+    (job_id,) = mailqueue.claim(1)
+
+    # Fail on the second recipient.
+    send = notifyd.Mailer.send
+    calls = []
+
+    def flaky_send(self, sender, to, msg):
+        calls.append(to)
+        if len(calls) == 2:
+            raise smtplib.SMTPServerDisconnected("Gone")
+        return send(self, sender, to, msg)
+
+    worker = notifyd.Worker()
+    with mock.patch.object(notifyd.Mailer, "send", flaky_send):
+        assert not worker.deliver(job_id)
+    assert mailqueue.progress(job_id) == 1
+
+    # The job is due again after the backoff.
+    assert mailqueue.claim(1) == []
+    due = redis_connection().zscore(mailqueue.QUEUE_KEY, job_id)
+    assert due == pytest.approx(time.time() + mailqueue.BACKOFF, abs=5)
+
+    redis_connection().zadd(mailqueue.QUEUE_KEY, {job_id: 0})
+    assert mailqueue.claim(1) == [job_id]
+    assert worker.deliver(job_id)
+    worker.close()
+
+    # The first recipient was not emailed twice.
+    assert [to for _, to, _ in sink.messages] == [
+        ["TO:<user0@localhost>"],
+        ["TO:<user1@localhost>"],
+        ["TO:<user2@localhost>"],
+    ]
+    assert mailqueue.size() == 0
+
+
+def test_worker_drops_after_max_attempts(sink: SMTPSink):
+    TestNotification([("user@localhost", "en")]).enqueue()
+    (job_id,) = mailqueue.claim(1)
+
+    redis_connection().hset(mailqueue.ATTEMPTS_KEY, job_id, mailqueue.MAX_ATTEMPTS - 1)
+    worker = notifyd.Worker()
+    with mock.patch.object(notifyd.Mailer, "send", side_effect=OSError("Down")):
+        assert worker.deliver(job_id)
+
+    assert mailqueue.size() == 0
+    assert sink.messages == []
+
+
+def test_recover():
+    TestNotification([("user@localhost", "en")]).enqueue()
+    (job_id,) = mailqueue.claim(1)
+    assert mailqueue.recover() == 0
+
+    claimed_at = time.time() - mailqueue.CLAIM_TIMEOUT - 1
+    redis_connection().zadd(mailqueue.CLAIMED_KEY, {job_id: claimed_at})
+    assert mailqueue.recover() == 1
+    assert mailqueue.claim(1) == [job_id]
+
+
+def test_digests(sink: SMTPSink):
+    digest = [("digest@localhost", "en")]
+    TestNotification([], subject="First", digest_recipients=digest).enqueue()
+    TestNotification(
+        [("user@localhost", "en")], subject="Second", digest_recipients=digest
+    ).enqueue()
+
+    # Only the recipient who doesn't get digests is emailed right away.
+    assert mailqueue.size() == 1
+    assert mailqueue.collect_digests() == 1
+    assert mailqueue.size() == 2
+    assert mailqueue.collect_digests() == 0
+
+    worker = notifyd.Worker()
+    for job_id in mailqueue.claim(10):
+        assert worker.deliver(job_id)
+    worker.close()
+
+    messages = {to[0]: data.decode() for _, to, data in sink.messages}
+    assert set(messages) == {"TO:<user@localhost>", "TO:<digest@localhost>"}
+    assert "Subject: MPR Notification Digest" in messages["TO:<digest@localhost>"]
+
+    redis = redis_connection()
+    assert not redis.exists(mailqueue.DIGEST_EVENTS_KEY)
+    assert not redis.exists(mailqueue.DIGEST_RECIPIENTS_KEY)
@@ -0,0 +1,87 @@
+import email
+
+from aurweb import db, mailqueue, time
+from aurweb.models import PackageBase, PackageNotification, User
+from aurweb.models.account_type import USER_ID
+from aurweb.scripts.notify import DigestNotification, Notification, UpdateNotification
+
+
+class LangNotification(Notification):
+    def __init__(self, recipients):
+        self._recipients = recipients
+        self.rendered = []
+
+    def get_recipients(self):
+        return self._recipients
+
+    def get_subject(self, lang):
+        return f"Subject in {lang}"
+
+    def get_body(self, lang):
+        self.rendered.append(lang)
+        return f"Body in {lang}."
+
+    def get_cc(self):
+        return ["cc@localhost"]
+
+
+def test_messages_rendered_once_per_language():
+    recipients = [(f"user{i}@localhost", ("en", "de")[i % 2]) for i in range(100)]
+    notif = LangNotification(recipients)
+
+    messages = list(notif.get_messages())
+    assert notif.rendered == ["en", "de"]
+
+    assert len(messages) == 100
+    for (to, lang), (_, deliver_to, data) in zip(recipients, messages):
+        assert deliver_to == [to, "cc@localhost"]
+
+        msg = email.message_from_bytes(data)
+        assert msg.get_all("To") == [to]
+        assert msg["Subject"] == f"Subject in {lang}"
+        assert msg["Cc"] == "cc@localhost"
+        assert msg["X-MPR-Reason"] == "Lang"
+        assert msg.get_payload(decode=True).decode() == f"Body in {lang}."
+
+
+def test_digest_notification():
+    events = [
+        mailqueue.dumps(LangNotification([])),
+        mailqueue.dumps(LangNotification([])),
+    ]
+    notif = DigestNotification("user@localhost", "de", events)
+
+    assert notif.get_recipients() == [("user@localhost", "de")]
+    body = notif.get_body_fmt("de")
+    assert body.count("Subject in de\n\nBody in de.") == 2
+
+
+def test_update_notification_digest(db_test):
+    users = []
+    with db.begin():
+        for i, digest in enumerate((False, False, True)):
+            users.append(
+                db.create(
+                    User,
+                    Username=f"user{i}",
+                    Email=f"user{i}@makedeb.org",
+                    Passwd="testPassword",
+                    AccountTypeID=USER_ID,
+                    UpdateNotify=1,
+                    DigestNotify=digest,
+                )
+            )
+        now = time.utcnow()
+        pkgbase = db.create(
+            PackageBase,
+            Name="pkg",
+            Maintainer=users[0],
+            SubmittedTS=now,
+            ModifiedTS=now,
+        )
+        for user in users:
+            db.create(PackageNotification, PackageBase=pkgbase, User=user)
+
+    notif = UpdateNotification(users[0].ID, pkgbase.ID)
+    assert notif.get_recipients() == [("user1@makedeb.org", "en")]
+    assert notif.get_digest_recipients() == [("user2@makedeb.org", "en")]
@@ -0,0 +1,192 @@
+from http import HTTPStatus
+from typing import List
+from unittest import mock
+
+import orjson
+import pygit2
+import pytest
+from fastapi.testclient import TestClient
+
+from aurweb import asgi, db, time
+from aurweb.models import Package, PackageBase
+from aurweb.pkgbase import git as pkgbasegit
+from aurweb.redis import redis_connection
+
+DAY = 86400
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    redis_connection().delete(pkgbasegit._stats_key("pkg"))
+    return
+
+
+@pytest.fixture
+def client() -> TestClient:
+    yield TestClient(app=asgi.app)
+
+
+@pytest.fixture
+def repo(tmp_path) -> pygit2.Repository:
+    with mock.patch("aurweb.config.git_repo_path", str(tmp_path)):
+        pygit2.init_repository(str(tmp_path / "pkg"), bare=True)
+        yield pkgbasegit.open_repository("pkg")
+
+
+def commit(
+    repo: pygit2.Repository, author: str, days_ago: int, parents: List = None
+) -> str:
+    """Create a commit made `days_ago` days ago on top of `parents`,
+    defaulting to HEAD, and point master at it."""
+    if parents is None:
+        parents = [] if repo.head_is_unborn else [repo.head.target]
+    timestamp = time.utcnow() - days_ago * DAY
+    signature = pygit2.Signature(author, "test@example.com", timestamp, 0)
+    tree = repo.TreeBuilder().write()
+    oid = repo.create_commit(None, signature, signature, "msg", tree, parents)
+    repo.references.create("refs/heads/master", oid, force=True)
+    return oid.hex
+
+
+def test_commit_stats(repo: pygit2.Repository):
+    commit(repo, "Foo", 400)
+    commit(repo, "Bar", 100)
+    commit(repo, "Foo", 20)
+    head = commit(repo, "Foo", 1)
+
+    stats = pkgbasegit.commit_stats("pkg", repo, head)
+    assert stats == {
+        "total": 4,
+        "committers": {"Bar": 1, "Foo": 3},
+        "past_week_commits": 1,
+        "past_month_commits": 2,
+        "past_year_commits": 3,
+    }
+
+    # Only commit times within the longest period are cached.
+    cached = orjson.loads(redis_connection().get(pkgbasegit._stats_key("pkg")))
+    assert cached["head"] == head
+    assert len(cached["times"]) == 3
+
+
+def test_commit_stats_cached(repo: pygit2.Repository):
+    head = commit(repo, "Foo", 1)
+    pkgbasegit.commit_stats("pkg", repo, head)
+
+    with mock.patch("aurweb.pkgbase.git._walk") as walk:
+        assert pkgbasegit.commit_stats("pkg", repo, head)["total"] == 1
+    walk.assert_not_called()
+
+
+def test_commit_stats_incremental(repo: pygit2.Repository):
+    head = commit(repo, "Foo", 1)
+    pkgbasegit.update_commit_stats("pkg", repo, head)
+
+    # Tamper with the cached total; a fast-forward only adds the new
+    # commits to it.
+    redis = redis_connection()
+    key = pkgbasegit._stats_key("pkg")
+    cached = orjson.loads(redis.get(key))
+    redis.set(key, orjson.dumps(dict(cached, total=100)))
+
+    commit(repo, "Bar", 0)
+    head = commit(repo, "Bar", 0)
+    stats = pkgbasegit.commit_stats("pkg", repo, head)
+    assert stats["total"] == 102
+    assert stats["committers"] == {"Bar": 2, "Foo": 1}
+    assert stats["past_week_commits"] == 3
+
+
+def test_commit_stats_rewritten(repo: pygit2.Repository):
+    root = commit(repo, "Foo", 3)
+    commit(repo, "Foo", 2)
+    head = commit(repo, "Foo", 1)
+    pkgbasegit.update_commit_stats("pkg", repo, head)
+
+    # A history rewritten to no longer contain the cached HEAD is
+    # walked in full.
+    head = commit(repo, "Bar", 0, parents=[pygit2.Oid(hex=root)])
+    stats = pkgbasegit.commit_stats("pkg", repo, head)
+    assert stats["total"] == 2
+    assert stats["committers"] == {"Bar": 1, "Foo": 1}
+
+
+def test_git_info_paginated(client: TestClient, repo: pygit2.Repository):
+    now = time.utcnow()
+    with db.begin():
+        pkgbase = db.create(PackageBase, Name="pkg", SubmittedTS=now, ModifiedTS=now)
+        db.create(Package, PackageBase=pkgbase, Name="pkg", Version="1.0-1")
+
+    for i in range(12):
+        commit(repo, "Foo", 0)
+
+    with client as request:
+        resp = request.get("/pkgbase/pkg/git", params={"O": 10, "PP": 10})
+    assert resp.status_code == int(HTTPStatus.OK)
+
+    # The commit log lists the last page of commits, while statistics
+    # cover the whole history.
+    assert resp.text.count("/pkgbase/pkg/git/commit/") == 2
+    assert "Foo (12)" in resp.text
+
+
+def test_find_commit(repo: pygit2.Repository):
+    root = commit(repo, "Foo", 1)
+    head = commit(repo, "Foo", 0)
+    branch = repo.head.target
+
+    assert pkgbasegit.find_commit(repo, branch, head).id.hex == head
+    assert pkgbasegit.find_commit(repo, branch, root[:10]).id.hex == root
+
+    # Commits not on the branch are not served.
+    other = commit(repo, "Bar", 0, parents=[])
+    assert pkgbasegit.find_commit(repo, branch, other) is None
+
+    # Neither are other objects or invalid hashes.
+    tree = repo.get(head).tree_id.hex
+    assert pkgbasegit.find_commit(repo, branch, tree) is None
+    assert pkgbasegit.find_commit(repo, branch, "not-a-hash") is None
+    assert pkgbasegit.find_commit(repo, branch, "0" * 40) is None
+
+
+def test_commit_diff(repo: pygit2.Repository):
+    root = repo.get(commit(repo, "Foo", 1))
+    assert pkgbasegit.commit_diff(repo, root) == "No diff found."
+
+    signature = pygit2.Signature("Foo", "test@example.com")
+    builder = repo.TreeBuilder()
+    builder.insert(
+        "PKGBUILD", repo.create_blob(b"pkgname=pkg\n"), pygit2.GIT_FILEMODE_BLOB
+    )
+    oid = repo.create_commit(
+        "refs/heads/master", signature, signature, "msg", builder.write(), [root.id]
+    )
+    head = repo.get(oid)
+    redis_connection().delete(pkgbasegit._diff_key(oid.hex))
+
+    diff = pkgbasegit.commit_diff(repo, head)
+    assert "+pkgname=pkg" in diff
+
+    # Diffs are served from the cache once rendered.
+    with mock.patch.object(repo, "diff") as repo_diff:
+        assert pkgbasegit.commit_diff(repo, head) == diff
+    repo_diff.assert_not_called()
+
+
+def test_open_repository_pooled(repo: pygit2.Repository):
+    commit(repo, "Foo", 0)
+    repo = pkgbasegit.open_repository("pkg")
+    assert pkgbasegit.open_repository("pkg") is repo
+
+    # Handles are reopened once the branch has moved.
+    commit(repo, "Foo", 0)
+    assert pkgbasegit.open_repository("pkg") is not repo
+
+
+def test_open_repository_evicted(tmp_path, repo: pygit2.Repository):
+    pygit2.init_repository(str(tmp_path / "other"), bare=True)
+
+    with mock.patch("aurweb.pkgbase.git.POOL_SIZE", 1):
+        repo = pkgbasegit.open_repository("pkg")
+        pkgbasegit.open_repository("other")
+        assert pkgbasegit.open_repository("pkg") is not repo
@@ -1,5 +1,10 @@
+from unittest import mock
+
 import pytest
 
+from aurweb import db, time
+from aurweb.models import PackageBase, PackageVote, User
+from aurweb.models.account_type import USER_ID
 from aurweb.scripts import popupdate
 
 
@@ -8,5 +13,82 @@ def setup(db_test):
     return
 
 
+@pytest.fixture
+def users() -> list:
+    with db.begin():
+        users = [
+            db.create(
+                User,
+                Username=f"user{i}",
+                Email=f"user{i}@makedeb.org",
+                Passwd="testPassword",
+                AccountTypeID=USER_ID,
+            )
+            for i in range(5)
+        ]
+    yield users
+
+
+@pytest.fixture
+def pkgbase() -> PackageBase:
+    now = time.utcnow()
+    with db.begin():
+        pkgbase = db.create(PackageBase, Name="pkg", SubmittedTS=now, ModifiedTS=now)
+    yield pkgbase
+
+
+def run_main(args: list = []):
+    with mock.patch("sys.argv", ["aurweb-popupdate"] + args):
+        popupdate.main()
+
+
+def recalculated(pkgbase: PackageBase) -> tuple:
+    """Return NumVotes and Popularity of `pkgbase` recalculated from its votes."""
+    popupdate.run_single(pkgbase)
+    return pkgbase.NumVotes, float(pkgbase.PopularityScore)
+
+
 def test_popupdate():
-    popupdate.main()
+    run_main()
+    run_main(["--full"])
+
+
+def test_incremental_matches_full(users: list, pkgbase: PackageBase):
+    now = time.utcnow()
+    votes = {}
+
+    # Votes cast over the past few weeks, as if aurweb-popupdate kept
+    # up with them.
+    for i, user in enumerate(users):
+        vote_ts = now - (len(users) - i) * 7 * 86400
+        with db.begin():
+            votes[user] = db.create(
+                PackageVote, User=user, PackageBase=pkgbase, VoteTS=vote_ts
+            )
+        popupdate.add_vote(pkgbase, vote_ts)
+    incremental = (pkgbase.NumVotes, float(pkgbase.PopularityScore))
+    assert incremental == pytest.approx(recalculated(pkgbase))
+
+    for user in users[1:3]:
+        vote_ts = votes[user].VoteTS
+        with db.begin():
+            db.delete(votes[user])
+        popupdate.remove_vote(pkgbase, vote_ts)
+    incremental = (pkgbase.NumVotes, float(pkgbase.PopularityScore))
+    assert incremental[0] == 3
+    assert incremental == pytest.approx(recalculated(pkgbase))
+
+
+def test_decay(users: list, pkgbase: PackageBase):
+    now = time.utcnow()
+    with db.begin():
+        db.create(PackageVote, User=users[0], PackageBase=pkgbase, VoteTS=now)
+    popupdate.add_vote(pkgbase, now)
+    assert float(pkgbase.Popularity) == pytest.approx(1.0)
+
+    # Ten days later, the vote's weight has decayed.
+    with mock.patch("aurweb.time.utcnow", return_value=now + 10 * 86400):
+        run_main()
+    db.refresh(pkgbase)
+    assert float(pkgbase.Popularity) == pytest.approx(0.98**10, abs=1e-6)
+    assert float(pkgbase.PopularityScore) == pytest.approx(1.0)
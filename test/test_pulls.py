@@ -0,0 +1,72 @@
+from typing import List
+
+import pytest
+
+from aurweb import db, pulls, time
+from aurweb.models import PackageBase
+from aurweb.redis import redis_connection
+from aurweb.scripts import pullflush
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    redis_connection().delete(pulls.REDIS_KEY, pulls.FLUSH_KEY)
+    return
+
+
+@pytest.fixture
+def pkgbases() -> List[PackageBase]:
+    now = time.utcnow()
+    with db.begin():
+        output = [
+            db.create(PackageBase, Name=f"pkg_{i}", SubmittedTS=now, ModifiedTS=now)
+            for i in range(3)
+        ]
+    yield output
+
+
+def test_count(pkgbases: List[PackageBase]):
+    with db.begin():
+        pkgbases[0].NumGitPulls = 5
+
+    pulls.increment(pkgbases[0].ID)
+    pulls.increment(pkgbases[0].ID)
+    assert pulls.pending(pkgbases[0].ID) == 2
+    assert pulls.count(pkgbases[0]) == 7
+    assert pulls.count(pkgbases[1]) == 0
+
+
+def test_flush(pkgbases: List[PackageBase]):
+    with db.begin():
+        pkgbases[0].NumGitPulls = 5
+
+    for pkgbase in (pkgbases[0], pkgbases[1], pkgbases[1]):
+        pulls.increment(pkgbase.ID)
+
+    pullflush.main()
+    db.refresh(pkgbases[0])
+    db.refresh(pkgbases[1])
+
+    assert [pkgbase.NumGitPulls for pkgbase in pkgbases] == [6, 2, 0]
+    assert [pulls.pending(pkgbase.ID) for pkgbase in pkgbases] == [0, 0, 0]
+    assert pulls.count(pkgbases[0]) == 6
+
+    # Nothing is pending anymore.
+    assert pulls.flush() == 0
+
+
+def test_flush_leftover(pkgbases: List[PackageBase]):
+    # Counts left behind by a failed flush still count, and are
+    # flushed first.
+    redis_connection().hset(pulls.FLUSH_KEY, pkgbases[0].ID, 3)
+    pulls.increment(pkgbases[0].ID)
+    assert pulls.count(pkgbases[0]) == 4
+
+    assert pulls.flush() == 1
+    db.refresh(pkgbases[0])
+    assert pkgbases[0].NumGitPulls == 3
+    assert pulls.pending(pkgbases[0].ID) == 1
+
+    assert pulls.flush() == 1
+    db.refresh(pkgbases[0])
+    assert pkgbases[0].NumGitPulls == 4
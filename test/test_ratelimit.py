@@ -7,6 +7,7 @@ from aurweb import config, db, logging
 from aurweb.models import ApiRateLimit
 from aurweb.ratelimit import check_ratelimit
 from aurweb.redis import redis_connection
+from aurweb.shm import SharedTable
 from aurweb.testing.requests import Request
 
 logger = logging.get_logger(__name__)
@@ -124,3 +125,76 @@ def test_ratelimit_db(
 
     # Should be good to go again!
     assert not check_ratelimit(request)
+
+
+config_get_with_fallback = config.get_with_fallback
+
+
+def mock_config_get_with_fallback(section: str, key: str, fallback):
+    if section == "ratelimit" and key == "rpc_search_request_limit":
+        return "2"
+    return config_get_with_fallback(section, key, fallback)
+
+
+@mock.patch("aurweb.config.getint", side_effect=mock_config_getint)
+@mock.patch("aurweb.config.getboolean", side_effect=mock_config_getboolean(1))
+@mock.patch(
+    "aurweb.config.get_with_fallback", side_effect=mock_config_get_with_fallback
+)
+def test_ratelimit_redis_endpoint(
+    get_with_fallback: mock.MagicMock,
+    getboolean: mock.MagicMock,
+    getint: mock.MagicMock,
+    pipeline: Pipeline,
+):
+    request = Request()
+    host = request.client.host
+    pipeline.delete(f"ratelimit-ws:rpc_search:{host}")
+    pipeline.delete(f"ratelimit:rpc_search:{host}")
+    pipeline.execute()
+
+    # The endpoint limit of 2 is reached before the global limit of 4.
+    for i in range(2):
+        assert not check_ratelimit(request, "rpc_search")
+    assert check_ratelimit(request, "rpc_search")
+
+    # Endpoints without a configured limit only count against the global one.
+    assert not check_ratelimit(request, "rpc_info")
+    assert check_ratelimit(request, "rpc_info")
+
+    pipeline.delete(f"ratelimit-ws:rpc_search:{host}")
+    pipeline.delete(f"ratelimit:rpc_search:{host}")
+    pipeline.execute()
+
+
+def mock_config_get_with_fallback_shm(section: str, key: str, fallback):
+    if section == "ratelimit" and key == "shared_memory":
+        return "1"
+    return mock_config_get_with_fallback(section, key, fallback)
+
+
+@mock.patch("aurweb.config.getint", side_effect=mock_config_getint)
+@mock.patch("aurweb.config.getboolean", side_effect=mock_config_getboolean(0))
+@mock.patch(
+    "aurweb.config.get_with_fallback", side_effect=mock_config_get_with_fallback_shm
+)
+def test_ratelimit_shm(
+    get_with_fallback: mock.MagicMock,
+    getboolean: mock.MagicMock,
+    getint: mock.MagicMock,
+    tmp_path,
+):
+    table = SharedTable(str(tmp_path / "ratelimit"), "qII", slots=64)
+    request = Request()
+
+    with mock.patch("aurweb.ratelimit._table", table):
+        for i in range(2):
+            assert not check_ratelimit(request, "rpc_search")
+        assert check_ratelimit(request, "rpc_search")
+
+        assert not check_ratelimit(request, "rpc_info")
+        assert check_ratelimit(request, "rpc_info")
+
+    # The database is not used.
+    assert not db.query(ApiRateLimit).count()
+    table.close()
@@ -167,3 +167,28 @@ def test_lower_headings(user: User, pkgbase: PackageBase):
 <h6>Six</h6>\
 """
     assert comment.RenderedComment == expected
+
+
+def test_render_all(user: User, pkgbase: PackageBase):
+    comments = [
+        create_comment(user, pkgbase, f"Comment *{i}*", False) for i in range(5)
+    ]
+
+    with mock.patch.object(rendercomment, "BATCH_SIZE", 2):
+        args = ["aurweb-rendercomment", "--all", "--jobs", "2"]
+        with mock.patch("sys.argv", args):
+            rendercomment.main()
+
+    for i, comment in enumerate(comments):
+        db.refresh(comment)
+        assert comment.RenderedComment == f"<p>Comment <em>{i}</em></p>"
+
+
+def test_code_block_clipboard(user: User, pkgbase: PackageBase):
+    text = "```\nmake\n```"
+    comment = create_comment(user, pkgbase, text)
+
+    html = comment.RenderedComment
+    assert html.startswith('<div class="code-block"><div class="clipboard-icons">')
+    assert html.endswith("</div><pre><code>make\n</code></pre></div>")
+    assert html.count("<svg") == 2
@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+
+import pytest
+
+from aurweb.shm import SharedTable
+
+
+@pytest.fixture
+def table(tmp_path) -> SharedTable:
+    table = SharedTable(os.path.join(tmp_path, "table"), "I", slots=64, probes=4)
+    yield table
+    table.close()
+
+
+def increment(record):
+    (count,) = record or (0,)
+    return (100, (count + 1,))
+
+
+def test_shared_table_update(table: SharedTable):
+    assert table.update("a", 0, increment) == (1,)
+    assert table.update("a", 0, increment) == (2,)
+    assert table.update("b", 0, increment) == (1,)
+
+
+def test_shared_table_expiry(table: SharedTable):
+    assert table.update("a", 0, increment) == (1,)
+
+    # The record expires at 100; it's treated as absent from then on.
+    assert table.update("a", 99, increment) == (2,)
+    assert table.update("a", 100, increment) == (1,)
+
+
+def test_shared_table_eviction(table: SharedTable):
+    # With more keys than slots, records expiring soonest are evicted
+    # and the table keeps accepting updates.
+    for i in range(256):
+        assert table.update(str(i), 0, increment) == (1,)
+
+
+def _increment_many(path: str) -> None:
+    table = SharedTable(path, "I", slots=64, probes=4)
+    for i in range(500):
+        table.update("a", 0, increment)
+    table.close()
+
+
+def test_shared_table_processes(table: SharedTable):
+    procs = [
+        multiprocessing.Process(target=_increment_many, args=(table.path,))
+        for i in range(4)
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+
+    # Every update made by every process was applied atomically.
+    assert table.update("a", 0, increment) == (2001,)
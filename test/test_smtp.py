@@ -0,0 +1,96 @@
+import smtplib
+import time
+from unittest import mock
+
+import pytest
+
+from aurweb.smtp import Mailer
+from aurweb.testing.smtp import FakeSMTP, SMTPSink
+
+SENDER = "notify@localhost"
+
+
+def message(i: int) -> bytes:
+    return f"Subject: Test {i}\r\n\r\nBody {i}\r\n".encode()
+
+
+def mailer_for(sink: SMTPSink) -> Mailer:
+    mailer = Mailer()
+    mailer.server_addr = "127.0.0.1"
+    mailer.server_port = sink.port
+    return mailer
+
+
+def test_mailer_reuses_connection():
+    with SMTPSink() as sink:
+        with mailer_for(sink) as mailer:
+            for i in range(10):
+                mailer.send(SENDER, [f"user{i}@localhost"], message(i))
+
+    assert sink.connections == 1
+    assert len(sink.messages) == 10
+    assert sink.messages[3][1] == ["TO:<user3@localhost>"]
+
+
+def test_mailer_reconnects():
+    # The sink hangs up with a 421 reply after every third message.
+    with SMTPSink(max_messages=3) as sink:
+        with mailer_for(sink) as mailer:
+            for i in range(10):
+                mailer.send(SENDER, [f"user{i}@localhost"], message(i))
+
+    assert sink.connections == 4
+    assert len(sink.messages) == 10
+
+
+def test_mailer_reconnect_fails():
+    with SMTPSink(max_messages=1) as sink:
+        mailer = mailer_for(sink)
+        mailer.retries = 0
+        mailer.send(SENDER, ["user0@localhost"], message(0))
+        with pytest.raises(smtplib.SMTPSenderRefused):
+            mailer.send(SENDER, ["user1@localhost"], message(1))
+        mailer.close()
+
+    assert len(sink.messages) == 1
+
+
+def test_mailer_login_once():
+    smtp = FakeSMTP()
+    mailer = Mailer()
+    mailer.use_starttls = True
+    mailer.user, mailer.passwd = "user", "passwd"
+    with mock.patch("smtplib.SMTP", return_value=smtp):
+        with mailer:
+            for i in range(5):
+                mailer.send(SENDER, ["user@localhost"], message(i))
+
+    assert smtp.starttls_enabled
+    assert smtp.ehlo_count == 2
+    assert (smtp.user, smtp.passwd) == ("user", "passwd")
+    assert smtp.count == 5
+    assert smtp.quit_count == 1
+
+
+def test_mailer_throughput():
+    # With a connection setup cost like that of a TLS handshake and
+    # login, delivering over one connection beats a connection per
+    # message by far.
+    count, delay = 20, 0.01
+    with SMTPSink(connect_delay=delay) as sink:
+        start = time.monotonic()
+        for i in range(count):
+            with mailer_for(sink) as mailer:
+                mailer.send(SENDER, ["user@localhost"], message(i))
+        separate = time.monotonic() - start
+
+        start = time.monotonic()
+        with mailer_for(sink) as mailer:
+            for i in range(count):
+                mailer.send(SENDER, ["user@localhost"], message(i))
+        reused = time.monotonic() - start
+
+    assert sink.connections == count + 1
+    assert len(sink.messages) == count * 2
+    assert separate >= count * delay
+    assert reused < separate / 2
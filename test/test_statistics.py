@@ -0,0 +1,122 @@
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+from aurweb import db, statistics, time
+from aurweb.asgi import app
+from aurweb.models import Package, PackageBase, Statistic, User
+from aurweb.models.account_type import TRUSTED_USER_ID, USER_ID
+from aurweb.redis import redis_connection
+from aurweb.scripts import statsupdate
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    redis_connection().delete(statistics.REDIS_KEY)
+    yield
+    redis_connection().delete(statistics.REDIS_KEY)
+
+
+@pytest.fixture
+def client() -> TestClient:
+    yield TestClient(app=app)
+
+
+@pytest.fixture
+def users():
+    with db.begin():
+        output = [
+            db.create(
+                User,
+                Username=f"user{i}",
+                Email=f"user{i}@makedeb.org",
+                Passwd="testPassword",
+                AccountTypeID=account_type,
+            )
+            for i, account_type in enumerate((USER_ID, TRUSTED_USER_ID))
+        ]
+    yield output
+
+
+@pytest.fixture
+def packages(users):
+    now = time.utcnow()
+    with db.begin():
+        # A new package base, one updated a month ago and an old orphan.
+        for name, submitted, modified, maintainer in (
+            ("new", now, now, users[0]),
+            ("updated", now - 86400 * 60, now - 86400 * 30, users[0]),
+            ("orphan", now - 86400 * 400, now - 86400 * 400, None),
+        ):
+            pkgbase = db.create(
+                PackageBase,
+                Name=name,
+                SubmittedTS=submitted,
+                ModifiedTS=modified,
+                Maintainer=maintainer,
+                NumCommits=2,
+            )
+            db.create(Package, PackageBase=pkgbase, Name=name, Version="1.0")
+
+
+def test_compute(packages):
+    snapshot = statistics.compute()
+    assert set(snapshot) == set(statistics.FIELDS)
+    assert snapshot["packages"] == 3
+    assert snapshot["orphan_packages"] == 1
+    assert snapshot["package_commits"] == 6
+    assert snapshot["users"] == 2
+    assert snapshot["maintainers"] == 1
+    assert snapshot["trusted_users"] == 1
+    assert snapshot["packages_added_24h"] == 1
+    assert snapshot["packages_added_7d"] == 1
+    assert snapshot["packages_updated_7d"] == 0
+    assert snapshot["packages_updated_1y"] == 1
+    assert snapshot["packages_never_updated"] == 2
+    assert snapshot["users_added_24h"] == 2
+
+
+def test_get_computes_missing_snapshot(packages):
+    snapshot = statistics.get()
+    assert snapshot["packages"] == 3
+    assert db.query(Statistic).count() == len(statistics.FIELDS)
+    assert redis_connection().exists(statistics.REDIS_KEY)
+
+
+def test_get_cached(packages):
+    statsupdate.main()
+    snapshot = statistics.get()
+
+    # Snapshots are served as stored until the next update.
+    with db.begin():
+        db.delete(db.query(Package).first())
+    assert statistics.get() == snapshot
+
+    statsupdate.main()
+    assert statistics.get()["packages"] == 2
+
+
+def test_get_database_fallback(packages):
+    snapshot = statistics.update()
+
+    redis = redis_connection()
+    redis.delete(statistics.REDIS_KEY)
+    assert statistics.get() == snapshot
+
+    # Redis is restored from the database.
+    assert redis.exists(statistics.REDIS_KEY)
+
+
+def test_about(client: TestClient, packages):
+    with client as request:
+        resp = request.get("/about")
+    assert resp.status_code == int(HTTPStatus.OK)
+    assert "Last updated" in resp.text
+
+
+def test_api_meta(client: TestClient, packages):
+    with client as request:
+        resp = request.get("/api/meta")
+    assert resp.status_code == int(HTTPStatus.OK)
+    assert resp.json()["statistics"] == statistics.get()
@@ -0,0 +1,79 @@
+from unittest import mock
+
+import pytest
+
+from aurweb import db, terms
+from aurweb.models.accepted_term import AcceptedTerm
+from aurweb.models.account_type import USER_ID
+from aurweb.models.term import Term
+from aurweb.models.user import User
+
+
+@pytest.fixture(autouse=True)
+def setup(db_test):
+    terms.invalidate()
+    return
+
+
+@pytest.fixture
+def user() -> User:
+    with db.begin():
+        user = db.create(
+            User,
+            Username="test",
+            Email="test@makedeb.org",
+            Passwd="testPassword",
+            AccountTypeID=USER_ID,
+        )
+    yield user
+
+
+@pytest.fixture
+def term() -> Term:
+    with db.begin():
+        term = db.create(Term, Description="Test term", URL="https://test.term")
+    yield term
+
+
+def test_digest_no_terms():
+    assert terms.digest() == str()
+
+
+def test_digest_invalidated_on_change(term: Term):
+    assert terms.digest() == f"{term.ID}:1"
+
+    with db.begin():
+        term.Revision = 2
+    assert terms.digest() == f"{term.ID}:2"
+
+
+def test_needs_acceptance_no_terms(user: User):
+    session = dict()
+    assert not terms.needs_acceptance(session, user.ID)
+    assert terms.SESSION_KEY not in session
+
+
+def test_needs_acceptance(user: User, term: Term):
+    session = dict()
+    assert terms.needs_acceptance(session, user.ID)
+    assert terms.SESSION_KEY not in session
+
+    with db.begin():
+        accepted = db.create(AcceptedTerm, User=user, Term=term, Revision=1)
+    assert not terms.needs_acceptance(session, user.ID)
+    assert session.get(terms.SESSION_KEY) == f"{user.ID}/{term.ID}:1"
+
+    # With the marker in place, the database is no longer consulted.
+    with mock.patch("aurweb.terms.has_unaccepted") as has_unaccepted:
+        assert not terms.needs_acceptance(session, user.ID)
+    has_unaccepted.assert_not_called()
+
+    # Publishing a new revision requires acceptance again.
+    with db.begin():
+        term.Revision = 2
+    assert terms.needs_acceptance(session, user.ID)
+
+    with db.begin():
+        accepted.Revision = 2
+    assert not terms.needs_acceptance(session, user.ID)
+    assert session.get(terms.SESSION_KEY) == f"{user.ID}/{term.ID}:2"